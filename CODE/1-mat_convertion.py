@@ -1,41 +1,90 @@
 import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import wfdb
 import scipy.io as sio
-import numpy as np
 
-input_dir = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\PHYSIONET RAW DATA\training-a"
-output_dir = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\MATLAB DATA"
+import metrics
+import profiling
+from split_manifest import MAT_DATA_DIR
+from channel_index import (
+    RAW_DATA_DIR, default_index_path, load_channel_index, eligible_records, record_channels, extract_ecg_pcg,
+)
 
-os.makedirs(output_dir, exist_ok=True)
+# ============================================================
+# CONFIGURATION
+# ============================================================
+# Same directories the pipeline, the segment scripts and log_run.py read
+input_dir = RAW_DATA_DIR
+output_dir = MAT_DATA_DIR
 
-skipped_records = []
+# Header-only inventory of the raw records (see channel_index.py)
+index_path = default_index_path(input_dir)
 
-for file in os.listdir(input_dir):
-    if file.endswith(".hea"):
-        record_name = file.replace(".hea", "")
-        record_path = os.path.join(input_dir, record_name)
+# Completed records, keyed by the mtime/size of their .hea/.dat sources
+manifest_path = os.path.join(output_dir, "conversion_manifest.json")
+
+N_WORKERS = os.cpu_count() or 1
+
+
+# ============================================================
+# MANIFEST
+# ============================================================
+def source_signature(record_path):
+    """mtime + size of the WFDB source files of one record."""
+    signature = {}
+    for ext in (".hea", ".dat"):
+        path = record_path + ext
+        if os.path.exists(path):
+            st = os.stat(path)
+            signature[ext] = [st.st_mtime_ns, st.st_size]
+    return signature
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    # write-then-rename so an interrupted run never leaves a torn manifest
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
 
-        record = wfdb.rdrecord(record_path)
-        signals = record.p_signal
-        fs = record.fs
-        channel_names = record.sig_name
-
-        # --- check availability ---
-        if "ECG" not in channel_names or "PCG" not in channel_names:
-            skipped_records.append(record_name)
-            print(f"Skipping {record_name}: channels = {channel_names}")
-            continue
 
-        ecg = signals[:, channel_names.index("ECG")]
-        ecg = ecg.astype(np.float32)
+def is_up_to_date(entry, signature, output_dir):
+    if entry is None or entry.get("source") != signature:
+        return False
+    return os.path.exists(os.path.join(output_dir, entry["record"] + ".mat"))
 
-        pcg = signals[:, channel_names.index("PCG")]
 
-        pcg = pcg.astype(np.float32)
-        pcg /= np.max(np.abs(pcg))
+# ============================================================
+# CONVERSION (one record, runs inside a worker process)
+# ============================================================
+def convert_record(record_name, input_dir, output_dir):
+    start = time.perf_counter()
+    record_path = os.path.join(input_dir, record_name)
 
+    bytes_in = sum(size for _, size in source_signature(record_path).values())
+    with profiling.section("wfdb_read", bytes_in=bytes_in):
+        record = wfdb.rdrecord(record_path)
+    signals = record.p_signal
+    fs = record.fs
+    channel_names = record.sig_name
+
+    # Channel availability was already checked against the channel index
+    ecg, pcg = extract_ecg_pcg(signals, channel_names)
+
+    out_path = os.path.join(output_dir, record_name + ".mat")
+    with profiling.section("savemat") as io:
         sio.savemat(
-            os.path.join(output_dir, record_name + ".mat"),
+            out_path,
             {
                 "ecg": ecg,
                 "pcg": pcg,
@@ -43,7 +92,114 @@ for file in os.listdir(input_dir):
                 "channels": channel_names,
             },
         )
+        io["bytes_out"] = os.path.getsize(out_path)
+
+    return {
+        "record": record_name,
+        "fs": fs,
+        "bytes_in": bytes_in,
+        "seconds": time.perf_counter() - start,
+        "profile": profiling.drain(),
+    }
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def main():
+    os.makedirs(output_dir, exist_ok=True)
+
+    index = load_channel_index(input_dir, index_path)
+    manifest = load_manifest(manifest_path)
+
+    # --- check availability (headers only, nothing decoded) ---
+    eligible = eligible_records(index)
+    skipped_records = sorted(set(index["record"]) - set(eligible))
+
+    for _, row in index[~index["record"].isin(eligible)].iterrows():
+        print(f"Skipping {row['record']}: channels = {record_channels(row)}")
+
+    pending = {}
+    unchanged = 0
+
+    for record_name in eligible:
+        signature = source_signature(os.path.join(input_dir, record_name))
+
+        if is_up_to_date(manifest.get(record_name), signature, output_dir):
+            unchanged += 1
+            continue
+
+        pending[record_name] = signature
+
+    print(f"{len(pending)} records to convert, {unchanged} unchanged (workers: {N_WORKERS})")
+
+    converted = 0
+    bytes_in = 0
+    failed = []
+
+    t0 = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=N_WORKERS) as pool:
+        futures = {
+            pool.submit(convert_record, name, input_dir, output_dir): name
+            for name in pending
+        }
+
+        for future in as_completed(futures):
+            record_name = futures[future]
+
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Failed {record_name}: {e}")
+                failed.append(record_name)
+                continue
+
+            converted += 1
+            bytes_in += result["bytes_in"]
+            profiling.merge(result["profile"])
+            print(f"{record_name}: converted in {result['seconds'] * 1000:.1f} ms")
+
+            manifest[record_name] = {
+                "record": record_name,
+                "source": pending[record_name],
+                "fs": result["fs"],
+            }
+            save_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - t0
+
+    print("Conversion finished")
+    print(f"Converted {converted} records, {unchanged} unchanged")
+    print(f"Skipped {len(skipped_records)} records without ECG+PCG")
+
+    if elapsed > 0 and converted > 0:
+        print(
+            f"Throughput: {converted / elapsed:.2f} records/s, "
+            f"{bytes_in / 1e6 / elapsed:.2f} MB/s "
+            f"({elapsed:.1f} s wall)"
+        )
+
+    profiling.print_summary("Profile (all workers)")
+    profiling.emit_profile("mat", workers=N_WORKERS)
+
+    # fs of unchanged records comes from the manifest, so nothing is re-read
+    fs_values = sorted({manifest[r]["fs"] for r in eligible if "fs" in manifest.get(r, {})})
+
+    metrics.emit(
+        "mat", "summary",
+        output_dir=output_dir,
+        records=converted + unchanged,
+        converted=converted,
+        unchanged=unchanged,
+        failed=sorted(failed),
+        skipped=skipped_records,
+        fs_values=fs_values,
+        seconds=elapsed,
+        records_per_s=converted / max(elapsed, 1e-9),
+        mb_per_s=bytes_in / 1e6 / max(elapsed, 1e-9),
+    )
 
-print("Conversion finished")
-print(f"Skipped {len(skipped_records)} records without ECG+PCG")
 
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import os
-import shutil
+import sys
 import pandas as pd
-from sklearn.model_selection import train_test_split
+
+import metrics
+from split_manifest import (
+    TEST_SIZE, N_FOLDS, load_manifest, save_manifest, pin_split, update_manifest,
+    write_label_csvs, link_split, split_summary,
+)
 
 # ----------------------------
 # Paths
@@ -9,53 +14,59 @@ from sklearn.model_selection import train_test_split
 mat_dir = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\2-MATLAB DATA"
 labels_csv = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\2-MATLAB DATA\LABELS.csv"
 
-output_base = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\SPLIT_DATA"
-train_dir = os.path.join(output_base, "train")
-test_dir = os.path.join(output_base, "test")
+output_base = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\3-SPLIT_DATA"
+manifest_csv = os.path.join(output_base, "split_manifest.csv")
 
-os.makedirs(train_dir, exist_ok=True)
-os.makedirs(test_dir, exist_ok=True)
+train_labels_csv = os.path.join(output_base, "train_labels.csv")
+test_labels_csv = os.path.join(output_base, "test_labels.csv")
 
-# ----------------------------
-# Load labels
-# ----------------------------
-labels_df = pd.read_csv(labels_csv)
+# "hardlink": also fill train/ and test/ with links to the .mat files
+# (for the older notebook cells); None: records stay referenced in place
+LINK_MODE = sys.argv[1] if len(sys.argv) > 1 else None
 
 # ----------------------------
-# Stratified split (70–30)
+# Load labels + manifest
 # ----------------------------
-train_df, test_df = train_test_split(
-    labels_df,
-    test_size=0.30,
-    random_state=42,
-    stratify=labels_df["label"]
-)
+labels_df = pd.read_csv(labels_csv, dtype={"record": str})
+
+manifest = load_manifest(manifest_csv)
+if manifest is None and os.path.exists(train_labels_csv) and os.path.exists(test_labels_csv):
+    # First run with a manifest: keep the earlier 70–30 split as it was
+    manifest = pin_split(train_labels_csv, test_labels_csv, mat_dir)
+    print(f"Pinned existing split: {len(manifest)} records")
 
 # ----------------------------
-# Copy MAT files
+# Hash-based split (new records only; existing ones never move)
 # ----------------------------
-def copy_files(df, destination):
-    for _, row in df.iterrows():
-        mat_file = row["record"] + ".mat"
-        src = os.path.join(mat_dir, mat_file)
-        dst = os.path.join(destination, mat_file)
+manifest, new_records = update_manifest(manifest, labels_df, mat_dir)
+
+missing = [r for r, src in zip(manifest["record"], manifest["source"]) if not os.path.exists(src)]
+for record in missing:
+    print(f"Missing file: {record}.mat")
 
-        if os.path.exists(src):
-            shutil.copy(src, dst)
-        else:
-            print(f"Missing file: {mat_file}")
+save_manifest(manifest, manifest_csv)
+write_label_csvs(manifest, output_base)
 
-copy_files(train_df, train_dir)
-copy_files(test_df, test_dir)
+if LINK_MODE == "hardlink":
+    print(f"Hardlinked {link_split(manifest, output_base)} new .mat files")
 
 # ----------------------------
-# Save split labels
+# Summary
 # ----------------------------
-train_df.to_csv(os.path.join(output_base, "train_labels.csv"), index=False)
-test_df.to_csv(os.path.join(output_base, "test_labels.csv"), index=False)
+summary = split_summary(manifest)
+
+metrics.emit(
+    "split", "summary",
+    test_size=TEST_SIZE,
+    n_folds=N_FOLDS,
+    new_records=new_records,
+    missing=missing,
+    **summary,
+)
 
-print("✅ 70–30 stratified train–test split completed")
-print(f"Train samples: {len(train_df)}")
-print(f"Test samples: {len(test_df)}")
-print(train_df["label"].value_counts(normalize=True))
-print(test_df["label"].value_counts(normalize=True))
\ No newline at end of file
+print(f"✅ Split manifest updated: {len(new_records)} new records, {len(manifest)} total")
+print(f"Train samples: {summary['train']}")
+print(f"Test samples: {summary['test']}")
+print(f"Train labels: {summary['train_labels']}")
+print(f"Test labels: {summary['test_labels']}")
+print(f"Folds (train records): {summary['folds']}")
@@ -0,0 +1,523 @@
+import os
+import time
+import hashlib
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.amp import autocast, GradScaler
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score, confusion_matrix, classification_report
+
+import metrics
+import profiling
+from models import VARIANTS, SCALOGRAM_VARIANTS, build_model, model_inputs
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+MODEL_DIR = "/content/drive/MyDrive/ECG-PCG PROJECT UPGRADED/MODELS"
+STATE_FILE = "ablation_state.pt"
+
+N_THREADS = os.cpu_count() or 1
+
+# Settings of the 7-ablation_model training cells
+CONFIG = {
+    "variants": SCALOGRAM_VARIANTS,
+    "lr": 1e-4,
+    "epochs": 50,
+    "patience": 5,
+    # Speed settings (results stay comparable, see DEVICE SETUP below)
+    "precision": "auto",        # "auto", "bf16", "fp16" or "fp32"
+    "channels_last": True,
+    "compile": False,           # torch.compile the models (the first epoch pays for compiling)
+    "threads": N_THREADS,       # CPU intra-op threads
+    "interop_threads": 2,       # CPU inter-op threads
+    "resume": True,             # continue an unfinished run of the same setup from STATE_FILE
+}
+
+MODALITIES = ("ecg", "pcg")
+
+
+# ============================================================
+# SHARED PASS
+# ============================================================
+# The notebook trains and evaluates each variant in its own loop over
+# the same loaders, so every batch is read and decoded three times and
+# the single-modality loops throw half of it away. Here one loop feeds
+# every variant still training: each batch is loaded once, only the
+# modalities some active variant needs are decoded and moved to the
+# device, and each model then takes its own optimizer step.
+
+
+# ============================================================
+# DEVICE SETUP
+# ============================================================
+# The notebook cells hard-code autocast(device_type="cuda") + GradScaler:
+# on a CPU node that autocast is a no-op and everything runs in fp32.
+# "auto" picks bf16 autocast on CPUs with native bf16 (AVX512-BF16 /
+# AMX) and fp16 + GradScaler on CUDA. bf16 keeps fp32's exponent range,
+# so it needs no loss scaling. channels_last is the layout oneDNN and
+# cuDNN convolutions run fastest in; weights and inputs both use it.
+
+
+def cpu_bf16_supported():
+    """oneDNN with native bf16 kernels; False (fp32) whenever that can't be determined."""
+    if not torch.backends.mkldnn.is_available():
+        return False
+    try:
+        # No public check for the bf16 ISA yet; torch builds without it raise
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def amp_dtype(device, precision="auto"):
+    """Autocast dtype for device and precision; None: fp32, no autocast."""
+    if precision == "auto":
+        if device.type == "cuda":
+            return torch.float16
+        return torch.bfloat16 if cpu_bf16_supported() else None
+    dtypes = {"bf16": torch.bfloat16, "fp16": torch.float16, "fp32": None}
+    if precision not in dtypes:
+        raise ValueError(f"Unknown precision: {precision}")
+    return dtypes[precision]
+
+
+def set_threads(threads=N_THREADS, interop_threads=CONFIG["interop_threads"]):
+    """Intra-op and inter-op thread counts; returns the ones in effect."""
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # The inter-op pool can only be sized before its first use in the process
+        pass
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def data_identity(loader):
+    """sha1 of the item names and labels a loader serves (len only for datasets without names)."""
+    dataset = loader.dataset
+    digest = hashlib.sha1()
+    names = getattr(dataset, "names", None)
+    labels = getattr(dataset, "labels", None)
+    if names is None or labels is None:
+        digest.update(str(len(dataset)).encode("utf-8"))
+    else:
+        digest.update("\n".join(names).encode("utf-8"))
+        digest.update(np.asarray(labels, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def set_modalities(dataset, modalities):
+    """
+    Limits decoding to modalities on the dataset a loader reads, looking
+    through Subset-style wrappers (.dataset) for the one that has them.
+    """
+    while not hasattr(dataset, "modalities") and hasattr(dataset, "dataset"):
+        dataset = dataset.dataset
+    if hasattr(dataset, "modalities"):
+        dataset.modalities = modalities
+
+
+def needed_modalities(variants):
+    return tuple(m for m in MODALITIES if any(m in model_inputs(v) for v in variants))
+
+
+def binary_metrics(y, probs, full=False):
+    """acc / f1 / auc as validate(); full=True: the test_model() keys."""
+    y, probs = np.asarray(y), np.asarray(probs)
+    preds = (probs > 0.5).astype(np.float32)
+
+    if not full:
+        return {
+            "acc": accuracy_score(y, preds),
+            "f1": f1_score(y, preds),
+            "auc": roc_auc_score(y, probs),
+        }
+    return {
+        "Accuracy": accuracy_score(y, preds),
+        "F1": f1_score(y, preds),
+        "AUC": roc_auc_score(y, probs),
+        "ConfusionMatrix": confusion_matrix(y, preds),
+        "Report": classification_report(y, preds, digits=4),
+    }
+
+
+class AblationRunner:
+    """
+    Trains / evaluates several VARIANTS (models.py) in one pass per epoch.
+
+    Every variant keeps its own model, optimizer, scaler, best AUC and
+    patience counter, so results match running the notebook loops one
+    after the other; a variant that stops early simply leaves the pass
+    (and once no variant needs a modality, it is no longer loaded).
+
+    fit() saves the whole training state to STATE_FILE after every epoch
+    and, with resume, continues from it after an interruption. Only an
+    unfinished run with the same setup (variants, lr, pos_weight, epochs,
+    patience, train/val data) is resumed; anything else starts fresh.
+    """
+
+    def __init__(
+        self, variants=None, device=None, pos_weight=None, lr=CONFIG["lr"], model_dir=MODEL_DIR,
+        precision=CONFIG["precision"], channels_last=CONFIG["channels_last"], compile=CONFIG["compile"],
+        threads=CONFIG["threads"], interop_threads=CONFIG["interop_threads"],
+    ):
+        self.variants = list(variants or CONFIG["variants"])
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.model_dir = model_dir
+        self.lr = lr
+        self.pos_weight = None if pos_weight is None else float(pos_weight)
+
+        self.threads = set_threads(threads, interop_threads) if self.device.type == "cpu" else None
+        self.amp_dtype = amp_dtype(self.device, precision)
+        self.memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        self.compiled = compile
+
+        self.models = {v: build_model(v).to(self.device, memory_format=self.memory_format) for v in self.variants}
+        # Forward passes go through the compiled modules; weights are saved from self.models
+        self.forward = {v: torch.compile(m) if compile else m for v, m in self.models.items()}
+        self.optimizers = {v: torch.optim.Adam(m.parameters(), lr=lr) for v, m in self.models.items()}
+        self.scalers = {
+            v: GradScaler(self.device.type, enabled=self.amp_dtype == torch.float16) for v in self.variants
+        }
+        self.criterion = nn.BCEWithLogitsLoss(
+            pos_weight=None if pos_weight is None else torch.as_tensor([pos_weight], dtype=torch.float32).to(self.device)
+        )
+
+        self.active = list(self.variants)
+        self.best_auc = {v: 0.0 for v in self.variants}
+        self.bad_epochs = {v: 0 for v in self.variants}
+        self.history = {v: [] for v in self.variants}
+        self.io = {"batches": 0, "images": 0, "images_separate": 0, "bytes": 0, "seconds": 0.0}
+        self.epochs_done = 0
+
+    def settings(self):
+        """Device, precision, layout and threads in use (printed and logged with every epoch)."""
+        return {
+            "device": self.device.type,
+            "precision": str(self.amp_dtype).replace("torch.", "") if self.amp_dtype else "float32",
+            "channels_last": self.memory_format == torch.channels_last,
+            "compile": self.compiled,
+            "threads": self.threads[0] if self.threads else None,
+            "interop_threads": self.threads[1] if self.threads else None,
+        }
+
+    # ---------------- data ----------------
+    def _batches(self, loader, variants):
+        """(inputs on device, y on device) with only the modalities variants need."""
+        modalities = needed_modalities(variants)
+        set_modalities(loader.dataset, modalities)
+
+        t0 = time.perf_counter()
+        for ecg, pcg, y in loader:
+            batch = {"ecg": ecg, "pcg": pcg}
+            # channels_last only exists for 4D image batches; waveforms stay as they are
+            inputs = {
+                m: batch[m].to(
+                    self.device, non_blocking=True,
+                    memory_format=self.memory_format if batch[m].dim() == 4 else torch.preserve_format,
+                )
+                for m in modalities
+            }
+
+            self.io["batches"] += 1
+            self.io["images"] += len(y) * len(modalities)
+            # Separate notebook loops: both images, once per variant
+            self.io["images_separate"] += len(y) * len(MODALITIES) * len(variants)
+            self.io["bytes"] += sum(x.nbytes for x in inputs.values())
+            self.io["seconds"] += time.perf_counter() - t0
+
+            yield inputs, y.to(self.device)
+            t0 = time.perf_counter()
+
+    def _logits(self, variant, inputs):
+        model = self.forward[variant]
+        # On CUDA this times the kernel launches, not the kernels (no sync)
+        with profiling.section("forward"), autocast(
+            device_type=self.device.type, dtype=self.amp_dtype, enabled=self.amp_dtype is not None
+        ):
+            logits = model(*[inputs[m] for m in model_inputs(variant)]).view(-1)
+        # Loss and sigmoid in fp32
+        return logits.float()
+
+    # ---------------- training ----------------
+    def train_one_epoch(self, loader):
+        variants = list(self.active)
+        for v in variants:
+            self.models[v].train()
+
+        total_loss = {v: 0.0 for v in variants}
+        n_batches = 0
+        n_samples = 0
+
+        t0 = time.perf_counter()
+        for inputs, y in self._batches(loader, variants):
+            for v in variants:
+                self.optimizers[v].zero_grad()
+                loss = self.criterion(self._logits(v, inputs), y)
+
+                self.scalers[v].scale(loss).backward()
+                self.scalers[v].step(self.optimizers[v])
+                self.scalers[v].update()
+
+                total_loss[v] += loss.item()
+            n_batches += 1
+            n_samples += len(y)
+
+        seconds = time.perf_counter() - t0
+        # Images through the models: each variant sees one per input modality
+        images = n_samples * sum(len(model_inputs(v)) for v in variants)
+        self.epoch_stats = {
+            "samples": n_samples,
+            "images": images,
+            "seconds": seconds,
+            "images_per_s": images / max(seconds, 1e-9),
+        }
+        return {v: total_loss[v] / max(n_batches, 1) for v in variants}
+
+    @torch.no_grad()
+    def predict(self, loader, variants=None):
+        """Sigmoid outputs of every variant from one pass, plus the targets."""
+        variants = list(variants or self.variants)
+        for v in variants:
+            self.models[v].eval()
+
+        probs = {v: [] for v in variants}
+        targets = []
+
+        for inputs, y in self._batches(loader, variants):
+            for v in variants:
+                probs[v].append(torch.sigmoid(self._logits(v, inputs).float()).cpu().numpy())
+            targets.append(y.cpu().numpy())
+
+        return {v: np.concatenate(p) for v, p in probs.items()}, np.concatenate(targets)
+
+    def validate(self, loader, variants=None):
+        probs, y = self.predict(loader, variants)
+        return {v: binary_metrics(y, p) for v, p in probs.items()}
+
+    def checkpoint_path(self, variant):
+        return os.path.join(self.model_dir, VARIANTS[variant][2])
+
+    # ---------------- checkpoint / resume ----------------
+    def state_path(self):
+        return os.path.join(self.model_dir, STATE_FILE)
+
+    def run_setup(self, train_loader, val_loader, epochs, patience):
+        """What a resumed run must share with the one that wrote the state."""
+        return {
+            "variants": self.variants,
+            "lr": self.lr,
+            "pos_weight": self.pos_weight,
+            "epochs": epochs,
+            "patience": patience,
+            "train_data": data_identity(train_loader),
+            "val_data": data_identity(val_loader),
+        }
+
+    def save_state(self, setup, finished=False):
+        """
+        Models, optimizers, scalers, early-stopping counters and RNG after
+        epochs_done (atomic). finished marks a completed run, which is
+        never resumed.
+        """
+        state = {
+            "setup": setup,
+            "finished": finished,
+            "epochs_done": self.epochs_done,
+            "variants": self.variants,
+            "active": self.active,
+            "best_auc": self.best_auc,
+            "bad_epochs": self.bad_epochs,
+            "history": self.history,
+            "models": {v: m.state_dict() for v, m in self.models.items()},
+            "optimizers": {v: o.state_dict() for v, o in self.optimizers.items()},
+            "scalers": {v: s.state_dict() for v, s in self.scalers.items()},
+            # Shuffling and dropout draw from the global generator
+            "rng": torch.get_rng_state(),
+        }
+        path = self.state_path()
+        tmp_path = path + ".tmp"
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path)
+
+    def load_state(self, setup):
+        """
+        Restores save_state() if it is an unfinished run of setup; returns
+        the number of epochs already done (0 if nothing to resume).
+        """
+        path = self.state_path()
+        if not os.path.exists(path):
+            return 0
+
+        # Our own file; the history holds numpy scalars. Loaded on the CPU:
+        # set_rng_state needs a CPU ByteTensor, load_state_dict moves the rest
+        state = torch.load(path, map_location="cpu", weights_only=False)
+        if state.get("finished", True):
+            print(f"Not resuming: {path} is a finished run, starting fresh")
+            return 0
+        changed = [k for k in setup if state.get("setup", {}).get(k) != setup[k]]
+        if changed:
+            print(f"Not resuming: {path} was trained with different {', '.join(changed)}, starting fresh")
+            return 0
+
+        for v in self.variants:
+            self.models[v].load_state_dict(state["models"][v])
+            self.optimizers[v].load_state_dict(state["optimizers"][v])
+            self.scalers[v].load_state_dict(state["scalers"][v])
+        self.active = state["active"]
+        self.best_auc = state["best_auc"]
+        self.bad_epochs = state["bad_epochs"]
+        self.history = state["history"]
+        torch.set_rng_state(state["rng"])
+
+        self.epochs_done = state["epochs_done"]
+        return self.epochs_done
+
+    def fit(self, train_loader, val_loader, epochs=CONFIG["epochs"], patience=CONFIG["patience"], resume=CONFIG["resume"]):
+        """
+        Early stopping on val AUC per variant, best weights saved as in the
+        notebook. resume: continue from state_path() if a run with the
+        same setup was cut short; a finished or different run is not
+        resumed.
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+
+        settings = self.settings()
+        setup = self.run_setup(train_loader, val_loader, epochs, patience)
+        print(" | ".join(f"{k}: {v}" for k, v in settings.items() if v is not None))
+        if resume and self.load_state(setup):
+            print(f"Resuming after epoch {self.epochs_done} ({', '.join(self.active) or 'all variants stopped'})")
+
+        for epoch in range(self.epochs_done, epochs):
+            if not self.active:
+                break
+
+            # On-the-fly augmentation (augmentation.AugmentCollate): new, reproducible variants per epoch
+            if hasattr(train_loader.collate_fn, "set_epoch"):
+                train_loader.collate_fn.set_epoch(epoch)
+            train_loss = self.train_one_epoch(train_loader)
+            val_metrics = self.validate(val_loader, self.active)
+
+            for v in list(self.active):
+                scores = val_metrics[v]
+                self.history[v].append({"epoch": epoch + 1, "train_loss": train_loss[v], **scores})
+
+                if scores["auc"] > self.best_auc[v]:
+                    self.best_auc[v] = scores["auc"]
+                    self.bad_epochs[v] = 0
+                    torch.save(self.models[v].state_dict(), self.checkpoint_path(v))
+                else:
+                    self.bad_epochs[v] += 1
+
+                print(
+                    f"Epoch {epoch+1:02d} | {v:8s} | "
+                    f"Train Loss: {train_loss[v]:.4f} | "
+                    f"Val Acc: {scores['acc']:.4f} | "
+                    f"Val F1: {scores['f1']:.4f} | "
+                    f"Val AUC: {scores['auc']:.4f}"
+                )
+
+                if self.bad_epochs[v] >= patience:
+                    print(f"Early stopping {v} at epoch {epoch+1}")
+                    self.active.remove(v)
+
+            stats = self.epoch_stats
+            print(
+                f"Epoch {epoch+1:02d} | {stats['images']} images in {stats['seconds']:.1f} s "
+                f"({stats['images_per_s']:.1f} images/s)"
+            )
+            metrics.emit(
+                "ablation", "epoch",
+                epoch=epoch + 1,
+                train_loss=train_loss,
+                val_auc={v: val_metrics[v]["auc"] for v in val_metrics},
+                **stats, **settings,
+            )
+
+            self.epochs_done = epoch + 1
+            self.save_state(setup)
+
+        self.save_state(setup, finished=True)
+        return self.history
+
+    # ---------------- testing ----------------
+    def load_best(self):
+        for v in self.variants:
+            self.models[v].load_state_dict(torch.load(self.checkpoint_path(v), map_location=self.device))
+
+    def test(self, loader, variants=None):
+        probs, y = self.predict(loader, variants)
+        return {v: binary_metrics(y, p, full=True) for v, p in probs.items()}
+
+    def io_report(self):
+        separate = max(self.io["images_separate"], 1)
+        return {
+            **self.io,
+            "io_reduction": separate / max(self.io["images"], 1),
+        }
+
+
+def print_results(results):
+    print(f"{'variant':10s} {'Accuracy':>9s} {'F1':>8s} {'AUC':>8s}")
+    for v, m in results.items():
+        print(f"{v:10s} {m['Accuracy']:9.4f} {m['F1']:8.4f} {m['AUC']:8.4f}")
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+    import pandas as pd
+    from augmentation import augmented_loader, base_ids
+    from scalogram_dataset import CachedScalogramDataset, ScalogramTransform, batch_loader
+    from signal_store import SignalStore
+
+    if len(sys.argv) < 6:
+        print("Usage: python ablation.py <scalogram_dir> <train_segment_store> <train_csv> <val_csv> <test_csv> [model_dir] [epochs]")
+        sys.exit(1)
+
+    scalogram_dir, train_segments, train_csv, val_csv, test_csv = sys.argv[1:6]
+    model_dir = sys.argv[6] if len(sys.argv) > 6 else MODEL_DIR
+    epochs = int(sys.argv[7]) if len(sys.argv) > 7 else CONFIG["epochs"]
+
+    def dataset(split, csv):
+        return CachedScalogramDataset(
+            os.path.join(scalogram_dir, split, "ecg"), os.path.join(scalogram_dir, split, "pcg"), csv
+        )
+
+    # Train: the original segments of train_csv, augmented and turned into
+    # scalograms batch by batch (nothing materialised on disk)
+    train_df = pd.read_csv(train_csv)
+    train_ids = base_ids(train_df[[c for c in train_df.columns if c != "label"][0]].astype(str))
+    train_loader = augmented_loader(SignalStore(train_segments), train_ids, ScalogramTransform(), batch_size=16)
+    val_loader = batch_loader(dataset("train", val_csv), batch_size=16)
+    test_loader = batch_loader(dataset("test", test_csv), batch_size=16)
+
+    # Class weights from TRAIN data only
+    labels = train_loader.dataset.labels
+    pos_weight = float((labels == 0).sum() / max((labels == 1).sum(), 1))
+
+    runner = AblationRunner(pos_weight=pos_weight, model_dir=model_dir)
+
+    t0 = time.perf_counter()
+    runner.fit(train_loader, val_loader, epochs=epochs)
+    runner.load_best()
+    results = runner.test(test_loader)
+    seconds = time.perf_counter() - t0
+
+    io = runner.io_report()
+    metrics.emit_model_metrics("ablation", results, split="test", epochs=epochs)
+    metrics.emit("ablation", "io", seconds=seconds, **io)
+    profiling.emit_profile("ablation")
+
+    print("\n✅ Ablation complete")
+    print_results(results)
+    print(
+        f"\nLoaded {io['images']} images in {io['batches']} batches ({io['bytes'] / 2**20:.0f} MiB to device, "
+        f"{io['seconds']:.1f} s loading) | separate loops: {io['images_separate']} images "
+        f"({io['io_reduction']:.1f}× more) | total {seconds:.1f} s"
+    )
+    profiling.print_summary()
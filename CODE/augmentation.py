@@ -0,0 +1,221 @@
+import hashlib
+
+import numpy as np
+
+# ============================================================
+# AUGMENTATION SETTINGS (same values as 5-train_augmentation)
+# ============================================================
+AUG_TYPES = ("orig", "noise", "scale", "mix")
+
+ECG_NOISE_REL = 0.01            # σ = 1% of the segment's ECG std
+PCG_NOISE = 0.02                # σ (PCG is amplitude-normalised)
+
+ECG_SCALE_RANGE = (0.9, 1.1)
+PCG_SCALE_RANGE = (0.85, 1.15)
+
+MAX_SHIFT_SEC = 0.05            # PCG temporal shift, ±50 ms
+
+AUG_SEED = 42
+
+
+# ============================================================
+# COUNTER-BASED RANDOM STREAMS
+# ============================================================
+def variant_rng(segment_id, aug_type, seed=AUG_SEED, epoch=0):
+    """
+    Independent Philox stream for one (segment_id, aug_type, seed[, epoch]).
+
+    The stream depends only on that key, never on global state or on
+    which process draws it, so any variant can be recomputed bit-exactly
+    on demand instead of being stored.
+    """
+    key = f"{seed}|{epoch}|{segment_id}|{aug_type}".encode("utf-8")
+    digest = hashlib.sha256(key).digest()
+    return np.random.Generator(np.random.Philox(key=int.from_bytes(digest[:16], "little")))
+
+
+def _draw(rng, n_rows, draw):
+    """
+    rng is one Generator for the whole batch or a sequence with one
+    Generator per row; draw(generator, k) returns k rows of values.
+    """
+    if isinstance(rng, np.random.Generator):
+        return draw(rng, n_rows)
+    return np.concatenate([draw(r, 1) for r in rng])
+
+
+# ============================================================
+# BATCHED AUGMENTATION FUNCTIONS
+# ============================================================
+# All functions take (batch, samples) arrays and draw one random
+# parameter per row, so a whole batch is augmented in a few array ops.
+# rng: a Generator, or one Generator per row (see variant_rng).
+
+def add_gaussian_noise(signals, noise_level, rng):
+    """noise_level: scalar or one σ per row."""
+    signals = np.atleast_2d(signals)
+    level = np.broadcast_to(np.asarray(noise_level, dtype=signals.dtype), (signals.shape[0],))
+    noise = _draw(rng, signals.shape[0], lambda r, k: r.standard_normal((k, signals.shape[1]), dtype=np.float32))
+    return signals + noise * level[:, None]
+
+
+def amplitude_scaling(signals, scale_range, rng):
+    signals = np.atleast_2d(signals)
+    scale = _draw(rng, signals.shape[0], lambda r, k: r.uniform(*scale_range, size=(k, 1))).astype(signals.dtype)
+    return signals * scale
+
+
+def time_shift(signals, max_shift_samples, rng):
+    """Shift each row by an integer in [-max, max), zero-padding the gap."""
+    signals = np.atleast_2d(signals)
+    n = signals.shape[1]
+
+    shift = _draw(rng, signals.shape[0], lambda r, k: r.integers(-max_shift_samples, max_shift_samples, size=k))
+
+    src = np.arange(n)[None, :] - shift[:, None]
+    valid = (src >= 0) & (src < n)
+    shifted = np.take_along_axis(signals, np.clip(src, 0, n - 1), axis=1)
+    return np.where(valid, shifted, 0).astype(signals.dtype)
+
+
+def augment_batch(ecg, pcg, aug_type, fs, rng):
+    """One augmentation type over a (batch, samples) ECG/PCG pair."""
+    ecg = np.atleast_2d(np.asarray(ecg, dtype=np.float32))
+    pcg = np.atleast_2d(np.asarray(pcg, dtype=np.float32))
+
+    if aug_type == "orig":
+        return ecg, pcg
+
+    if aug_type == "noise":
+        ecg_noise = ECG_NOISE_REL * np.std(ecg, axis=1)
+        return add_gaussian_noise(ecg, ecg_noise, rng), add_gaussian_noise(pcg, PCG_NOISE, rng)
+
+    if aug_type == "scale":
+        return amplitude_scaling(ecg, ECG_SCALE_RANGE, rng), amplitude_scaling(pcg, PCG_SCALE_RANGE, rng)
+
+    if aug_type == "mix":
+        ecg_noise = ECG_NOISE_REL * np.std(ecg, axis=1)
+        ecg_ns = amplitude_scaling(add_gaussian_noise(ecg, ecg_noise, rng), ECG_SCALE_RANGE, rng)
+        pcg_ns = amplitude_scaling(add_gaussian_noise(pcg, PCG_NOISE, rng), PCG_SCALE_RANGE, rng)
+        pcg_ns = time_shift(pcg_ns, int(MAX_SHIFT_SEC * fs), rng)
+        return ecg_ns, pcg_ns
+
+    raise ValueError(f"Unknown augmentation: {aug_type}")
+
+
+def base_id(item_id):
+    """Segment id of an augmented item id (<segment_id>_<aug_type>), or item_id itself."""
+    for aug_type in AUG_TYPES:
+        if item_id.endswith("_" + aug_type):
+            return item_id[:-len(aug_type) - 1]
+    return item_id
+
+
+def base_ids(item_ids):
+    """Segment ids of a list of (possibly augmented) item ids, once each, in order."""
+    return list(dict.fromkeys(base_id(str(k)) for k in item_ids))
+
+
+def augment_variant(segment_id, ecg, pcg, aug_type, fs, seed=AUG_SEED, epoch=0):
+    """
+    One augmented variant, recomputed from its key alone. Gives the same
+    samples whether it runs here, in a DataLoader worker or in a batch
+    of AugmentCollate, so variants need not be written to disk.
+    """
+    rng = variant_rng(segment_id, aug_type, seed, epoch)
+    ecg, pcg = augment_batch(ecg, pcg, aug_type, fs, rng)
+    return ecg[0], pcg[0]
+
+
+# ============================================================
+# ON-THE-FLY TRAINING DATA
+# ============================================================
+class AugmentedSegmentDataset:
+    """
+    Map-style dataset over a segment source (SignalStore or SegmentIndex):
+    every segment appears once per augmentation type, and nothing is
+    written to disk. Items are raw (ecg, pcg, aug_type, label, segment_id);
+    the augmentation itself happens batch-wise in AugmentCollate.
+    names / labels ({0,1}) list the items as the materialised store would
+    (<segment_id>_<aug_type>), for pos_weight and ablation.data_identity.
+    """
+
+    def __init__(self, segments, aug_types=AUG_TYPES, ids=None):
+        self.segments = segments
+        self.aug_types = tuple(aug_types)
+        self.ids = list(ids) if ids is not None else segments.ids
+
+        segment_labels = np.array([segments.meta(k)["label"] for k in self.ids], dtype=np.float32)
+        self.names = [f"{k}_{a}" for k in self.ids for a in self.aug_types]
+        self.labels = np.repeat((segment_labels + 1) / 2, len(self.aug_types))   # {-1,+1} → {0,1}
+
+    def __len__(self):
+        return len(self.ids) * len(self.aug_types)
+
+    def __getitem__(self, idx):
+        segment_id = self.ids[idx // len(self.aug_types)]
+        aug_type = self.aug_types[idx % len(self.aug_types)]
+
+        ecg, pcg, _ = self.segments[segment_id]
+        label = self.segments.meta(segment_id)["label"]
+
+        return np.asarray(ecg), np.asarray(pcg), aug_type, label, segment_id
+
+
+class AugmentCollate:
+    """
+    collate_fn that stacks a batch and augments it in place.
+
+    Every row draws from its own variant_rng(segment_id, aug_type, seed,
+    epoch) stream, so a row is bit-identical to augment_variant() for the
+    same key, whatever batch, shuffle order or worker it lands in.
+    Call set_epoch() before each epoch to draw new variants.
+    transform: optional callable (ecg, pcg) -> (ecg, pcg) on the
+    augmented numpy batch (e.g. a batched scalogram transform).
+    """
+
+    def __init__(self, fs, seed=AUG_SEED, transform=None):
+        self.fs = fs
+        self.seed = seed
+        self.epoch = 0
+        self.transform = transform
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __call__(self, batch):
+        import torch
+
+        ecg = np.stack([b[0] for b in batch]).astype(np.float32)
+        pcg = np.stack([b[1] for b in batch]).astype(np.float32)
+        aug_types = np.array([b[2] for b in batch])
+        labels = np.array([b[3] for b in batch], dtype=np.float32)
+        segment_ids = [b[4] for b in batch]
+
+        for aug_type in AUG_TYPES[1:]:
+            rows = np.flatnonzero(aug_types == aug_type)
+            if len(rows):
+                rngs = [variant_rng(segment_ids[i], aug_type, self.seed, self.epoch) for i in rows]
+                ecg[rows], pcg[rows] = augment_batch(ecg[rows], pcg[rows], aug_type, self.fs, rngs)
+
+        if self.transform is not None:
+            ecg, pcg = self.transform(ecg, pcg)
+
+        label = (labels + 1) / 2   # {-1,+1} → {0,1}
+        return torch.from_numpy(ecg), torch.from_numpy(pcg), torch.from_numpy(label)
+
+
+def augmented_loader(segments, ids=None, transform=None, batch_size=16, seed=AUG_SEED, num_workers=0):
+    """
+    Shuffled training DataLoader: AugmentedSegmentDataset + AugmentCollate
+    over the original segments. The trainer calls collate_fn.set_epoch
+    (AblationRunner.fit does) so every epoch draws new variants.
+    """
+    from torch.utils.data import DataLoader
+
+    dataset = AugmentedSegmentDataset(segments, ids=ids)
+    fs = segments[dataset.ids[0]][2]
+    return DataLoader(
+        dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers,
+        collate_fn=AugmentCollate(fs, seed, transform),
+    )
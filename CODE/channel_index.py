@@ -0,0 +1,143 @@
+import os
+import time
+
+import wfdb
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+RAW_DATA_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\1-PHYSIONET RAW DATA\training-a"
+
+INDEX_NAME = "channel_index.csv"
+
+CHANNEL_SEP = ";"
+
+
+# ============================================================
+# HEADER-ONLY PRE-SCAN
+# ============================================================
+def default_index_path(raw_dir):
+    return os.path.join(raw_dir, INDEX_NAME)
+
+
+def build_channel_index(raw_dir, index_path=None):
+    """
+    Reads only the .hea headers of every WFDB record in raw_dir and
+    writes one row per record: record, channels, fs, n_samples, duration.
+    """
+    index_path = index_path or default_index_path(raw_dir)
+
+    rows = []
+    unreadable = []
+
+    for file in sorted(os.listdir(raw_dir)):
+        if not file.endswith(".hea"):
+            continue
+
+        record_id = file.replace(".hea", "")
+
+        try:
+            header = wfdb.rdheader(os.path.join(raw_dir, record_id))
+        except Exception:
+            unreadable.append(record_id)
+            continue
+
+        channels = list(header.sig_name or [])
+        n_samples = int(header.sig_len or 0)
+        fs = float(header.fs)
+
+        rows.append({
+            "record": record_id,
+            "channels": CHANNEL_SEP.join(channels),
+            "has_ecg": "ECG" in channels,
+            "has_pcg": "PCG" in channels,
+            "fs": fs,
+            "n_samples": n_samples,
+            "duration": n_samples / fs if fs else 0.0,
+        })
+
+    index = pd.DataFrame(
+        rows,
+        columns=["record", "channels", "has_ecg", "has_pcg", "fs", "n_samples", "duration"],
+    )
+
+    if index_path.endswith(".parquet"):
+        index.to_parquet(index_path, index=False)
+    else:
+        index.to_csv(index_path, index=False)
+
+    if unreadable:
+        print(f"Unreadable headers: {', '.join(unreadable)}")
+
+    return index
+
+
+def is_stale(raw_dir, index_path):
+    """True if a header was added, removed or modified after the index was written."""
+    if not os.path.exists(index_path):
+        return True
+
+    index_mtime = os.path.getmtime(index_path)
+    headers = [f for f in os.listdir(raw_dir) if f.endswith(".hea")]
+
+    for file in headers:
+        if os.path.getmtime(os.path.join(raw_dir, file)) > index_mtime:
+            return True
+
+    indexed = set(read_index(index_path)["record"])
+    return indexed != {f.replace(".hea", "") for f in headers}
+
+
+def read_index(index_path):
+    if index_path.endswith(".parquet"):
+        return pd.read_parquet(index_path)
+    return pd.read_csv(index_path, dtype={"record": str, "channels": str}, keep_default_na=False)
+
+
+def load_channel_index(raw_dir, index_path=None, rebuild=False):
+    """Returns the channel index, (re)building it only if missing or stale."""
+    index_path = index_path or default_index_path(raw_dir)
+
+    if rebuild or is_stale(raw_dir, index_path):
+        return build_channel_index(raw_dir, index_path)
+
+    return read_index(index_path)
+
+
+def record_channels(index_row):
+    if not index_row["channels"]:
+        return []
+    return index_row["channels"].split(CHANNEL_SEP)
+
+
+def eligible_records(index):
+    """Records carrying both an ECG and a PCG channel."""
+    return index.loc[index["has_ecg"] & index["has_pcg"], "record"].tolist()
+
+
+def extract_ecg_pcg(signals, channel_names):
+    """
+    ECG and PCG columns of a WFDB p_signal as float32; PCG scaled to
+    max |x| = 1 (as written to the .mat files).
+    """
+    ecg = signals[:, channel_names.index("ECG")].astype(np.float32)
+
+    pcg = signals[:, channel_names.index("PCG")].astype(np.float32)
+    pcg /= np.max(np.abs(pcg))
+
+    return ecg, pcg
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    index = build_channel_index(RAW_DATA_DIR)
+    elapsed = time.perf_counter() - t0
+
+    print(f"✅ Channel index written to: {default_index_path(RAW_DATA_DIR)}")
+    print(f"Records indexed: {len(index)} ({elapsed:.2f} s)")
+    print(f"ECG + PCG records: {len(eligible_records(index))}")
@@ -0,0 +1,187 @@
+import re
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader, Sampler
+
+import metrics
+import profiling
+from ablation import binary_metrics, set_modalities
+from models import model_inputs
+from scalogram_dataset import CachedScalogramDataset
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+POOLING = ("mean", "max", "vote")
+THRESHOLD = 0.5
+BATCH_SIZE = 64
+
+# a0001_seg003, a0001_seg003_orig, ... -> a0001
+_RECORD_RE = re.compile(r"^(.*?)_seg\d+")
+
+
+def record_of(name):
+    m = _RECORD_RE.match(name)
+    return m.group(1) if m else name
+
+
+# ============================================================
+# RECORD-GROUPED BATCHES
+# ============================================================
+class RecordBatchSampler(Sampler):
+    """
+    Index batches holding whole records: records are packed in order
+    until the next one would overflow batch_size (a record longer than
+    batch_size gets batches of its own).
+    """
+
+    def __init__(self, record_ids, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        codes, self.groups = np.unique(np.asarray(record_ids), return_inverse=True)
+        order = np.argsort(self.groups, kind="stable")
+        bounds = np.flatnonzero(np.diff(self.groups[order])) + 1
+        self.records = np.split(order, bounds)
+
+    def __iter__(self):
+        batch = []
+        for idx in self.records:
+            if batch and len(batch) + len(idx) > self.batch_size:
+                yield batch
+                batch = []
+            if len(idx) > self.batch_size:
+                for a in range(0, len(idx), self.batch_size):
+                    yield idx[a:a + self.batch_size].tolist()
+                continue
+            batch.extend(idx.tolist())
+        if batch:
+            yield batch
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+# ============================================================
+# POOLING (vectorised over all records)
+# ============================================================
+def pool(probs, groups, method="mean", threshold=THRESHOLD):
+    """Per-record score from segment probabilities; groups: record code per segment."""
+    n = groups.max() + 1
+    counts = np.bincount(groups, minlength=n)
+
+    if method == "mean":
+        return np.bincount(groups, weights=probs, minlength=n) / counts
+    if method == "max":
+        out = np.full(n, -np.inf)
+        np.maximum.at(out, groups, probs)
+        return out
+    if method == "vote":
+        return np.bincount(groups, weights=(probs > threshold), minlength=n) / counts
+    raise ValueError(f"Unknown pooling: {method}")
+
+
+# ============================================================
+# EVALUATION ENGINE
+# ============================================================
+def _loader(dataset, sampler, num_workers):
+    # The cached dataset gathers a whole index list at once
+    if isinstance(dataset, CachedScalogramDataset):
+        return DataLoader(dataset, sampler=sampler, batch_size=None, num_workers=num_workers)
+    return DataLoader(dataset, batch_sampler=sampler, num_workers=num_workers)
+
+
+@torch.no_grad()
+def predict_segments(models, dataset, batch_size=BATCH_SIZE, device="cpu", num_workers=0):
+    """
+    Probabilities of every model for every segment from one pass, written
+    into preallocated arrays in dataset order. models: {variant: model}.
+    Returns (probs {variant: (n,)}, targets (n,), record ids (n,)).
+    """
+    n = len(dataset)
+    records = np.array([record_of(name) for name in dataset.names])
+    sampler = RecordBatchSampler(records, batch_size)
+
+    probs = {v: np.empty(n, dtype=np.float32) for v in models}
+    targets = np.empty(n, dtype=np.float32)
+
+    needed = {m for v in models for m in model_inputs(v)}
+    set_modalities(dataset, tuple(m for m in ("ecg", "pcg") if m in needed))
+
+    for v, model in models.items():
+        model.eval()
+
+    for idx, (ecg, pcg, y) in zip(sampler, _loader(dataset, sampler, num_workers)):
+        batch = {"ecg": ecg.to(device), "pcg": pcg.to(device)}
+        idx = np.asarray(idx)
+        targets[idx] = y.numpy()
+
+        for v, model in models.items():
+            with profiling.section("forward"):
+                logits = model(*[batch[m] for m in model_inputs(v)])
+            probs[v][idx] = torch.sigmoid(logits.float()).view(-1).cpu().numpy()
+
+    return probs, targets, records
+
+
+def evaluate(models, dataset, pooling=POOLING, threshold=THRESHOLD, batch_size=BATCH_SIZE, device="cpu", num_workers=0):
+    """
+    Segment metrics plus record-level metrics for each pooling method.
+    Returns ({variant: {"segment": metrics, "<pooling>": metrics}},
+    per-record DataFrame with the pooled scores).
+    """
+    probs, targets, records = predict_segments(models, dataset, batch_size, device, num_workers)
+
+    codes, groups = np.unique(records, return_inverse=True)
+    first = np.zeros(len(codes), dtype=np.int64)
+    first[groups[::-1]] = np.arange(len(groups))[::-1]
+    record_targets = targets[first]
+
+    table = pd.DataFrame({
+        "record": codes,
+        "label": record_targets,
+        "n_segments": np.bincount(groups),
+    })
+
+    results = {}
+    for v, p in probs.items():
+        results[v] = {"segment": binary_metrics(targets, p, full=True)}
+        for method in pooling:
+            scores = pool(p, groups, method, threshold)
+            table[f"{v}_{method}"] = scores
+            results[v][method] = binary_metrics(record_targets, scores, full=True)
+
+    return results, table
+
+
+def print_evaluation(results):
+    print(f"{'variant':10s} {'level':8s} {'Accuracy':>9s} {'F1':>8s} {'AUC':>8s}")
+    for v, levels in results.items():
+        for level, m in levels.items():
+            print(f"{v:10s} {level:8s} {m['Accuracy']:9.4f} {m['F1']:8.4f} {m['AUC']:8.4f}")
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+    from inference import load_model
+
+    if len(sys.argv) < 5:
+        print("Usage: python evaluation.py <ecg_dir> <pcg_dir> <test_label_csv> <variant=checkpoint> [variant=checkpoint ...]")
+        sys.exit(1)
+
+    ecg_dir, pcg_dir, label_csv = sys.argv[1:4]
+    models = {}
+    for arg in sys.argv[4:]:
+        variant, checkpoint = arg.split("=", 1)
+        models[variant] = load_model(checkpoint, variant)
+
+    results, table = evaluate(models, CachedScalogramDataset(ecg_dir, pcg_dir, label_csv))
+    for level in ["segment", *POOLING]:
+        metrics.emit_model_metrics("evaluation", {v: r[level] for v, r in results.items()}, level=level, records=len(table))
+
+    print("\n✅ Evaluation (segment + record level)")
+    print_evaluation(results)
+    print(f"\n{len(table)} records, {table['n_segments'].sum()} segments")
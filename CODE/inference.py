@@ -0,0 +1,254 @@
+import os
+import copy
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+from sklearn.metrics import roc_auc_score
+
+from models import VARIANTS, build_model, model_inputs, input_shape
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+MODEL_DIR = "/content/drive/MyDrive/ECG-PCG PROJECT UPGRADED/MODELS"
+EXPORT_DIR = os.path.join(MODEL_DIR, "EXPORT")
+
+BENCH_BATCH = 16
+N_THREADS = os.cpu_count() or 1
+
+QUANT_BACKEND = "x86"
+CALIBRATION_BATCHES = 8
+
+# Conv stacks quantized per variant; pooling, concat and classifier stay fp32
+QUANT_MODULES = {
+    "fusion": ["ecg.features", "pcg.features"],
+    "ecg_only": ["features"],
+    "pcg_only": ["features"],
+    "fusion_1d": ["ecg.features", "pcg.features"],
+}
+
+# Conv → BatchNorm pairs fold_batchnorm folds (2D scalogram and 1D waveform models)
+FOLDABLE = ((nn.Conv2d, nn.BatchNorm2d), (nn.Conv1d, nn.BatchNorm1d))
+
+
+# ============================================================
+# CPU INFERENCE
+# ============================================================
+# Everything here runs fp32/int8 on CPU: no autocast, no GradScaler, so
+# the deployment box needs no CUDA build.
+
+
+def load_model(checkpoint=None, variant="fusion"):
+    model = build_model(variant)
+    if checkpoint is not None:
+        model.load_state_dict(torch.load(checkpoint, map_location="cpu"))
+    return model.eval()
+
+
+def example_inputs(variant="fusion", batch_size=1):
+    return tuple(torch.randn(batch_size, *input_shape(variant)) for _ in model_inputs(variant))
+
+
+def batch_inputs(ecg, pcg, variant="fusion"):
+    batch = {"ecg": ecg, "pcg": pcg}
+    return tuple(batch[m] for m in model_inputs(variant))
+
+
+def fold_batchnorm(model):
+    """Copy of model with every Conv2d → BatchNorm2d / Conv1d → BatchNorm1d pair folded into the conv (eval only)."""
+    model = copy.deepcopy(model).eval()
+
+    for module in model.modules():
+        if not isinstance(module, nn.Sequential):
+            continue
+        layers = list(module)
+        for i in range(len(layers) - 1):
+            if any(isinstance(layers[i], conv) and isinstance(layers[i + 1], bn) for conv, bn in FOLDABLE):
+                module[i] = fuse_conv_bn_eval(layers[i], layers[i + 1])
+                module[i + 1] = nn.Identity()
+
+    return model
+
+
+def calibration_batches(loader, variant="fusion", n_batches=CALIBRATION_BATCHES):
+    batches = []
+    for ecg, pcg, _ in loader:
+        batches.append(batch_inputs(ecg, pcg, variant))
+        if len(batches) >= n_batches:
+            break
+    return batches
+
+
+@torch.no_grad()
+def quantize_int8(model, calibration, variant="fusion", backend=QUANT_BACKEND):
+    """
+    Static post-training int8 quantization of the conv stacks (FX graph
+    mode): Conv+BN+ReLU are fused, activations calibrated on a few real
+    batches. calibration: list of input tuples (see calibration_batches).
+    """
+    from torch.ao.quantization import QConfigMapping, get_default_qconfig
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    torch.backends.quantized.engine = backend
+    qconfig = get_default_qconfig(backend)
+
+    mapping = QConfigMapping()
+    for name in QUANT_MODULES[variant]:
+        mapping.set_module_name(name, qconfig)
+
+    prepared = prepare_fx(copy.deepcopy(model).eval(), mapping, calibration[0])
+    for inputs in calibration:
+        prepared(*inputs)
+
+    return convert_fx(prepared)
+
+
+# ============================================================
+# EXPORT
+# ============================================================
+@torch.no_grad()
+def export_torchscript(model, path, variant="fusion"):
+    """Traced + frozen TorchScript module (loads with torch.jit.load, no Python classes needed)."""
+    traced = torch.jit.trace(model.eval(), example_inputs(variant))
+    traced = torch.jit.freeze(traced)
+    traced.save(path)
+    return traced
+
+
+def export_onnx(model, path, variant="fusion", opset=17):
+    """ONNX graph with a dynamic batch axis; inputs named as the modalities. Needs the onnx package."""
+    names = list(model_inputs(variant))
+    torch.onnx.export(
+        model.eval(), example_inputs(variant), path,
+        input_names=names,
+        output_names=["logit"],
+        dynamic_axes={n: {0: "batch"} for n in names + ["logit"]},
+        opset_version=opset,
+        dynamo=False,
+    )
+    return path
+
+
+class OnnxModel:
+    """onnxruntime session called like the torch model (tensors in, logits tensor out)."""
+
+    def __init__(self, path, n_threads=N_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = n_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def eval(self):
+        return self
+
+    def __call__(self, *inputs):
+        feeds = {name: x.numpy() for name, x in zip(self.input_names, inputs)}
+        return torch.from_numpy(self.session.run(None, feeds)[0])
+
+
+# ============================================================
+# EVALUATION + BENCHMARK
+# ============================================================
+@torch.no_grad()
+def predict_probs(model, loader, variant="fusion"):
+    probs, targets = [], []
+    for ecg, pcg, y in loader:
+        logits = model(*batch_inputs(ecg, pcg, variant))
+        probs.append(torch.sigmoid(logits.float()).view(-1).numpy())
+        targets.append(y.numpy())
+    return np.concatenate(probs), np.concatenate(targets)
+
+
+def auc_parity(models, loader, variant="fusion", reference="fp32"):
+    """Test AUC of each model and its largest probability deviation from the reference."""
+    outputs = {name: predict_probs(m, loader, variant) for name, m in models.items()}
+    ref_probs = outputs[reference][0]
+
+    results = {}
+    for name, (probs, y) in outputs.items():
+        results[name] = {
+            "auc": roc_auc_score(y, probs),
+            "auc_delta": roc_auc_score(y, probs) - roc_auc_score(y, ref_probs),
+            "max_prob_diff": float(np.abs(probs - ref_probs).max()),
+            "pred_agreement": float(((probs > 0.5) == (ref_probs > 0.5)).mean()),
+        }
+    return results
+
+
+@torch.no_grad()
+def benchmark_cpu(model, variant="fusion", batch_size=BENCH_BATCH, n_iter=20, warmup=3, n_threads=N_THREADS):
+    """Latency per ECG+PCG pair at batch 1, and throughput at batch_size."""
+    torch.set_num_threads(n_threads)
+
+    def timed(inputs, n):
+        for _ in range(warmup):
+            model(*inputs)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            model(*inputs)
+        return (time.perf_counter() - t0) / n
+
+    single = timed(example_inputs(variant, 1), n_iter)
+    batched = timed(example_inputs(variant, batch_size), max(n_iter // 4, 1))
+
+    return {
+        "ms_per_pair": 1000 * single,
+        "pairs_per_s": batch_size / batched,
+        "batch_size": batch_size,
+        "threads": n_threads,
+    }
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+    from scalogram_dataset import CachedScalogramDataset, batch_loader
+
+    if len(sys.argv) < 5:
+        print("Usage: python inference.py <checkpoint> <ecg_dir> <pcg_dir> <test_label_csv> [export_dir] [variant]")
+        sys.exit(1)
+
+    checkpoint, ecg_dir, pcg_dir, label_csv = sys.argv[1:5]
+    export_dir = sys.argv[5] if len(sys.argv) > 5 else EXPORT_DIR
+    variant = sys.argv[6] if len(sys.argv) > 6 else "fusion"
+    os.makedirs(export_dir, exist_ok=True)
+
+    loader = batch_loader(CachedScalogramDataset(ecg_dir, pcg_dir, label_csv), batch_size=BENCH_BATCH)
+
+    fp32 = load_model(checkpoint, variant)
+    folded = fold_batchnorm(fp32)
+    int8 = quantize_int8(fp32, calibration_batches(loader, variant), variant)
+
+    candidates = {
+        "fp32": fp32,
+        "bn_folded": folded,
+        "int8": int8,
+        "torchscript": export_torchscript(folded, os.path.join(export_dir, f"{variant}_fp32.pt"), variant),
+        "torchscript_int8": export_torchscript(int8, os.path.join(export_dir, f"{variant}_int8.pt"), variant),
+    }
+
+    try:
+        onnx_path = export_onnx(folded, os.path.join(export_dir, f"{variant}_fp32.onnx"), variant)
+        candidates["onnx"] = OnnxModel(onnx_path)
+    except (ImportError, torch.onnx.OnnxExporterError) as e:
+        print(f"ONNX skipped: {e}")
+
+    parity = auc_parity(candidates, loader, variant)
+
+    print(f"\n✅ CPU inference ({VARIANTS[variant][0].__name__}, {N_THREADS} threads)")
+    print(f"{'model':18s} {'ms/pair':>8s} {'pairs/s':>8s} {'AUC':>7s} {'ΔAUC':>8s} {'max|Δp|':>8s} {'agree':>6s}")
+    for name, model in candidates.items():
+        bench = benchmark_cpu(model, variant)
+        p = parity[name]
+        print(
+            f"{name:18s} {bench['ms_per_pair']:8.1f} {bench['pairs_per_s']:8.1f} "
+            f"{p['auc']:7.4f} {p['auc_delta']:+8.4f} {p['max_prob_diff']:8.4f} {p['pred_agreement']:6.3f}"
+        )
+    print(f"\nExports written to {export_dir}")
@@ -1,61 +1,128 @@
 import os
-import wfdb
-import scipy.io as sio
-import pandas as pd
+import json
 from datetime import datetime
 
+import metrics
+import sweep
+from channel_index import RAW_DATA_DIR, default_index_path, load_channel_index, eligible_records
+
 # ============================================================
 # CONFIGURATION
 # ============================================================
 LOG_FILE = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\PROJECT_LOG.md"
 
-RAW_DATA_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\1-PHYSIONET RAW DATA\training-a"
+CHANNEL_INDEX = default_index_path(RAW_DATA_DIR)
 MAT_DATA_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\2-MATLAB DATA"
 
-TRAIN_LABELS = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\3-SPLIT_DATA\train_labels.csv"
-TEST_LABELS  = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\3-SPLIT_DATA\test_labels.csv"
-
-TRAIN_SEG_LABELS = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\4-SEGMENTED_DATA\train_segment_labels.csv"
-TEST_SEG_LABELS  = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\4-SEGMENTED_DATA\test_segment_labels.csv"
-
-SKIPPED_TRAIN = [
-    "a0077","a0084","a0113","a0155","a0159","a0187","a0202","a0206",
-    "a0225","a0228","a0238","a0258","a0276","a0305","a0366",
-    "a0393","a0406"
+# Written by segmentation.py (quality screen at segmentation time)
+SEGMENT_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\4-SEGMENTED_DATA"
+REJECT_LIST = os.path.join(SEGMENT_DIR, "{split}_rejected_segments.csv")
+
+# Written by sweep.py (one row per trial)
+SWEEP_RESULTS = os.path.join(sweep.SWEEP_DIR, sweep.RESULTS_FILE)
+
+# Numbers of the first (notebook) run, from before the stages wrote to the
+# metrics sink; `python log_run.py seed` imports them once as run "historical"
+HISTORICAL_RUN = "historical"
+HISTORICAL_EVENTS = [
+    ("segment", "summary", {
+        "split": "train", "segments": 2271,
+        "skipped": [
+            "a0077","a0084","a0113","a0155","a0159","a0187","a0202","a0206",
+            "a0225","a0228","a0238","a0258","a0276","a0305","a0366",
+            "a0393","a0406"
+        ],
+    }),
+    ("segment", "summary", {
+        "split": "test", "segments": 959,
+        "skipped": [
+            "a0101","a0137","a0217","a0255","a0279",
+            "a0291","a0295","a0333","a0344","a0367"
+        ],
+    }),
+    ("clean", "nan_removal", {
+        "train_segmented_total": 2271,
+        "train_segmented_removed": 173,
+        "train_segmented_clean": 2098,
+        "train_augmented_total": 9084,
+        "train_augmented_removed": 692,
+        "train_augmented_clean": 8392,
+        "train_removed_records": [
+            "a0014","a0027","a0028","a0045","a0055","a0057","a0068","a0070",
+            "a0075","a0118","a0160","a0163","a0179","a0250","a0274","a0303",
+            "a0315","a0361","a0395"
+        ],
+        "test_segmented_total": 959,
+        "test_segmented_removed": 79,
+        "test_segmented_clean": 880,
+        "test_removed_summary": {
+            "a0018": 5, "a0185": 10, "a0204": 9, "a0261": 10,
+            "a0311": 8, "a0314": 6, "a0320": 11, "a0337": 9,
+            "a0347": 6, "a0400": 5
+        },
+    }),
+    ("ablation", "metrics", {"variant": "fusion", "split": "test", "Accuracy": 0.782, "F1": 0.837, "AUC": 0.817}),
+    ("ablation", "metrics", {"variant": "ecg_only", "split": "test", "Accuracy": 0.763, "F1": 0.823, "AUC": 0.795}),
+    ("ablation", "metrics", {"variant": "pcg_only", "split": "test", "Accuracy": 0.641, "F1": 0.728, "AUC": 0.647}),
 ]
 
-SKIPPED_TEST = [
-    "a0101","a0137","a0217","a0255","a0279",
-    "a0291","a0295","a0333","a0344","a0367"
-]
 
 # ============================================================
-# LOG RAW DATA
+# METRICS SINK
 # ============================================================
-def log_raw_data():
-    total_records = 0
-    ecg_pcg = []
-    pcg_only = []
+# Every entry below is rendered from events the stages wrote while they
+# ran (metrics.py); nothing here reads signals or .mat files.
+
+def seed_history():
+    if any(e["run"] == HISTORICAL_RUN for e in metrics.read_events()):
+        print("Historical metrics already imported")
+        return
+    for stage, event, fields in HISTORICAL_EVENTS:
+        metrics.emit(stage, event, run=HISTORICAL_RUN, **fields)
+    print(f"✅ {len(HISTORICAL_EVENTS)} historical events written to {metrics.METRICS_FILE}")
+
+
+def not_recorded(stage, hint):
+    print(f"No '{stage}' metrics in {metrics.METRICS_FILE}: {hint}")
+
+
+def profile_block(stage, **match):
+    """Timers / bytes / peak RSS the stage recorded (profiling.py), as markdown."""
+    event = metrics.latest(stage, "profile", **match)
+    if event is None:
+        return "**Profile:** not recorded\n"
 
-    for file in os.listdir(RAW_DATA_DIR):
-        if not file.endswith(".hea"):
-            continue
+    lines = [
+        f"- {r['section']}: {r['calls']} calls, {r['seconds']:.1f} s ({r['ms_per_call']:.1f} ms/call), "
+        f"{r['mb_in']:.1f} MB in, {r['mb_out']:.1f} MB out"
+        for r in event["sections"]
+    ]
+    if event.get("peak_rss_mb") is not None:
+        worker = event.get("peak_rss_worker_mb")
+        lines.append(f"- Peak RSS: {event['peak_rss_mb']:.0f} MB" + (f" (largest worker {worker:.0f} MB)" if worker else ""))
 
-        record_id = file.replace(".hea", "")
-        record_path = os.path.join(RAW_DATA_DIR, record_id)
+    title = "**Profile" + (f" ({', '.join(str(v) for v in match.values())})" if match else "") + ":**"
+    return title + "\n" + ("\n".join(lines) or "- no instrumented sections") + "\n"
 
-        try:
-            header = wfdb.rdheader(record_path)
-            channels = header.sig_name
-        except Exception:
-            continue
 
-        total_records += 1
+def label_lines(counts, noun):
+    total = sum(counts.values())
+    return "\n".join(
+        f"- {name} {noun}: {counts.get(key, 0)} ({100 * counts.get(key, 0) / max(total, 1):.2f}%)"
+        for key, name in [("1", "+1"), ("-1", "-1")]
+    )
 
-        if "ECG" in channels and "PCG" in channels:
-            ecg_pcg.append(record_id)
-        elif "PCG" in channels:
-            pcg_only.append(record_id)
+
+# ============================================================
+# LOG RAW DATA
+# ============================================================
+def log_raw_data():
+    # Header-only inventory shared with 1-mat_convertion.py
+    index = load_channel_index(RAW_DATA_DIR, CHANNEL_INDEX)
+
+    total_records = len(index)
+    ecg_pcg = eligible_records(index)
+    pcg_only = index.loc[index["has_pcg"] & ~index["has_ecg"], "record"].tolist()
 
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -84,27 +151,10 @@ Notes:
 # LOG MATLAB CONVERTED DATA
 # ============================================================
 def log_mat_data():
-    mat_files = [f for f in os.listdir(MAT_DATA_DIR) if f.endswith(".mat")]
-
-    fs_values = []
-    invalid = []
-
-    for file in mat_files:
-        path = os.path.join(MAT_DATA_DIR, file)
-        try:
-            data = sio.loadmat(path)
-            ecg = data.get("ecg", None)
-            pcg = data.get("pcg", None)
-            fs = data.get("fs", None)
-
-            if ecg is None or pcg is None or fs is None:
-                invalid.append(file.replace(".mat", ""))
-                continue
-
-            fs_values.append(int(fs[0][0]))
-
-        except Exception:
-            invalid.append(file.replace(".mat", ""))
+    event = metrics.latest("mat", "summary")
+    if event is None:
+        not_recorded("mat", "run 1-mat_convertion.py first")
+        return
 
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -114,12 +164,18 @@ def log_mat_data():
 ## {timestamp} — MATLAB Converted Data Summary
 
 **Converted data path:**  
-`{MAT_DATA_DIR}`
+`{event.get("output_dir", MAT_DATA_DIR)}`
+
+- Total .mat records: {event["records"]}
+- Sampling rates detected: {event["fs_values"]}
+- Invalid or incomplete records: {len(event["failed"])}
+- Skipped (no ECG + PCG): {len(event["skipped"])}
 
-- Total .mat records: {len(mat_files)}
-- Sampling rates detected: {sorted(set(fs_values))}
-- Invalid or incomplete records: {len(invalid)}
+**Conversion run:**
+- Converted: {event["converted"]}, unchanged: {event["unchanged"]}
+- Throughput: {event["records_per_s"]:.2f} records/s, {event["mb_per_s"]:.2f} MB/s ({event["seconds"]:.1f} s wall)
 
+{profile_block("mat")}
 Notes:
 - ECG preserved in physical units (mV).
 - PCG amplitude normalized during conversion.
@@ -129,20 +185,24 @@ Notes:
         f.write(log_entry)
 
 
+
 # ============================================================
 # LOG TRAIN–TEST SPLIT
 # ============================================================
 def log_train_test_split():
-    train_df = pd.read_csv(TRAIN_LABELS)
-    test_df  = pd.read_csv(TEST_LABELS)
-
-    def summarize(df):
-        counts = df["label"].value_counts()
-        perc = df["label"].value_counts(normalize=True) * 100
-        return counts, perc
-
-    train_c, train_p = summarize(train_df)
-    test_c, test_p   = summarize(test_df)
+    event = metrics.latest("split", "summary")
+    if event is None:
+        not_recorded("split", "run 3-test_train_split.py first")
+        return
+
+    if "folds" in event:
+        strategy = (
+            "Stable hash per record (split_manifest.py): records never move once assigned\n"
+            f"- New records this run: {len(event.get('new_records', []))}\n"
+            f"- {event['n_folds']} patient-wise folds over train: {event['folds']}"
+        )
+    else:
+        strategy = "Stratified at patient (record) level"
 
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -152,19 +212,17 @@ def log_train_test_split():
 ## {timestamp} — Patient-wise Train–Test Split Summary
 
 **Split strategy:**
-- 70% Train / 30% Test
-- Stratified at patient (record) level
+- {100 * (1 - event["test_size"]):.0f}% Train / {100 * event["test_size"]:.0f}% Test
+- {strategy}
 - No cross-patient leakage
 
 ### Training Set
-- Records: {len(train_df)}
-- +1 records: {train_c.get(1,0)} ({train_p.get(1,0):.2f}%)
-- -1 records: {train_c.get(-1,0)} ({train_p.get(-1,0):.2f}%)
+- Records: {event["train"]}
+{label_lines(event["train_labels"], "records")}
 
 ### Test Set
-- Records: {len(test_df)}
-- +1 records: {test_c.get(1,0)} ({test_p.get(1,0):.2f}%)
-- -1 records: {test_c.get(-1,0)} ({test_p.get(-1,0):.2f}%)
+- Records: {event["test"]}
+{label_lines(event["test_labels"], "records")}
 
 Notes:
 - Split performed before segmentation.
@@ -175,21 +233,24 @@ Notes:
         f.write(log_entry)
 
 
+
 # ============================================================
 # LOG SEGMENTATION
 # ============================================================
 def log_segmentation():
-    train_df = pd.read_csv(TRAIN_SEG_LABELS)
-    test_df  = pd.read_csv(TEST_SEG_LABELS)
-
-    def summarize(df):
-        counts = df["label"].value_counts()
-        perc = df["label"].value_counts(normalize=True) * 100
-        return counts, perc
-
-    train_c, train_p = summarize(train_df)
-    test_c, test_p   = summarize(test_df)
-
+    events = {split: metrics.latest("segment", "summary", split=split) for split in ["train", "test"]}
+    if None in events.values():
+        not_recorded("segment", "run segmentation.py (or `python log_run.py seed` for the first run)")
+        return
+
+    def section(event):
+        lines = [f"- Total segments: {event['segments']}"]
+        if "labels" in event:
+            lines.append(label_lines(event["labels"], "segments"))
+        lines.append(f"- Skipped records: {len(event['skipped'])}")
+        return "\n".join(lines)
+
+    train = events["train"]
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     log_entry = f"""
@@ -199,22 +260,18 @@ def log_segmentation():
 
 **Segmentation method:**
 - R-peak–centered windows
-- Window length: 3 seconds
+- Window length: {train.get("window_sec", 3.0):g} seconds
 - Overlap: None
-- R-peak detection: Pan–Tompkins–based (NeuroKit2)
+- R-peak detection: {train.get("detector", "neurokit")} (see rpeak_detection.py)
 
 ### Training Data
-- Total segments: {len(train_df)}
-- +1 segments: {train_c.get(1,0)} ({train_p.get(1,0):.2f}%)
-- -1 segments: {train_c.get(-1,0)} ({train_p.get(-1,0):.2f}%)
-- Skipped records: {len(SKIPPED_TRAIN)}
+{section(train)}
 
 ### Test Data
-- Total segments: {len(test_df)}
-- +1 segments: {test_c.get(1,0)} ({test_p.get(1,0):.2f}%)
-- -1 segments: {test_c.get(-1,0)} ({test_p.get(-1,0):.2f}%)
-- Skipped records: {len(SKIPPED_TEST)}
+{section(events["test"])}
 
+{profile_block("segment", split="train")}
+{profile_block("segment", split="test")}
 Notes:
 - Patient-wise split preserved.
 - No data augmentation applied at this stage.
@@ -223,24 +280,27 @@ Notes:
     with open(LOG_FILE, "a", encoding="utf-8") as f:
         f.write(log_entry)
 
+
 # ============================================================
 # LOG AUGMENTATION
 # ============================================================
 def log_augmentation():
-    TRAIN_SEG_LABELS = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\4-SEGMENTED_DATA\train_segment_labels.csv"
-    AUG_LABELS = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\5-AUGMENTED_DATA\train_augmented_labels.csv"
-
-    # Load labels
-    orig_df = pd.read_csv(TRAIN_SEG_LABELS)
-    aug_df  = pd.read_csv(AUG_LABELS)
+    event = metrics.latest("augment", "summary")
+    if event is None:
+        not_recorded("augment", "run the augmentation notebook or pipeline stage first")
+        return
 
-    orig_count = len(orig_df)
-    aug_count  = len(aug_df)
+    orig_count = event["segments"]
+    aug_count  = event["items"]
     expansion_factor = aug_count / orig_count if orig_count > 0 else 0
 
-    # Label distribution after augmentation
-    counts = aug_df["label"].value_counts()
-    perc = aug_df["label"].value_counts(normalize=True) * 100
+    # Older runs wrote the variants to a train_augmented store
+    if event.get("on_the_fly"):
+        where = "- Drawn on the fly in the training loader (new variants every epoch, nothing written to disk)"
+        aug_line = f"Training samples per epoch: {aug_count}"
+    else:
+        where = "- Variants written to the train_augmented store"
+        aug_line = f"Augmented training segments: {aug_count}"
 
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -253,6 +313,7 @@ def log_augmentation():
 - Applied after segmentation and before scalogram generation
 - Applied to training data only
 - Signal-domain augmentation
+{where}
 
 **Augmentation methods:**
 
@@ -267,13 +328,14 @@ def log_augmentation():
 
 **Dataset size:**
 - Original training segments: {orig_count}
-- Augmented training segments: {aug_count}
+- {aug_line}
 - Expansion factor: {expansion_factor:.2f}×
+- Throughput: {event["items_per_s"]:.1f} samples/s ({event["seconds"]:.1f} s)
 
 **Label distribution after augmentation:**
-- +1 segments: {counts.get(1,0)} ({perc.get(1,0):.2f}%)
-- -1 segments: {counts.get(-1,0)} ({perc.get(-1,0):.2f}%)
+{label_lines(event["labels"], "segments")}
 
+{profile_block("augment")}
 Notes:
 - Augmentation parameters were fixed across all experiments.
 - No augmentation was applied to the test set.
@@ -287,33 +349,19 @@ Notes:
 # LOG DATA CLEANING (NaN REMOVAL — TRAIN + TEST)
 # ============================================================
 def log_data_cleaning():
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # ---------------- TRAIN STATS ----------------
-    train_segmented_total = 2271
-    train_segmented_removed = 173
-    train_segmented_clean = 2098
+    # Quality events present: cleaning already happened during segmentation
+    screens = {split: metrics.latest("segment", "quality", split=split) for split in ["train", "test"]}
+    if None not in screens.values():
+        log_quality_screen(screens)
+        return
+
+    # Otherwise: the manual NaN removal done in the notebooks
+    event = metrics.latest("clean", "nan_removal")
+    if event is None:
+        not_recorded("clean", "run segmentation.py (or `python log_run.py seed` for the first run)")
+        return
 
-    train_augmented_total = 9084
-    train_augmented_removed = 692
-    train_augmented_clean = 8392
-
-    train_removed_records = [
-        "a0014","a0027","a0028","a0045","a0055","a0057","a0068","a0070",
-        "a0075","a0118","a0160","a0163","a0179","a0250","a0274","a0303",
-        "a0315","a0361","a0395"
-    ]
-
-    # ---------------- TEST STATS ----------------
-    test_segmented_total = 959
-    test_segmented_removed = 79
-    test_segmented_clean = 880
-
-    test_removed_summary = {
-        "a0018": 5, "a0185": 10, "a0204": 9, "a0261": 10,
-        "a0311": 8, "a0314": 6, "a0320": 11, "a0337": 9,
-        "a0347": 6, "a0400": 5
-    }
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     log_entry = f"""
 ---
@@ -333,28 +381,28 @@ def log_data_cleaning():
 ### TRAIN Data Cleaning
 
 **Segment-level**
-- Original segments: {train_segmented_total}
-- Removed (PCG NaNs): {train_segmented_removed}
-- Clean segments retained: {train_segmented_clean}
+- Original segments: {event["train_segmented_total"]}
+- Removed (PCG NaNs): {event["train_segmented_removed"]}
+- Clean segments retained: {event["train_segmented_clean"]}
 
 **Augmented data**
-- Original augmented samples: {train_augmented_total}
-- Removed augmented samples: {train_augmented_removed}
-- Clean augmented samples retained: {train_augmented_clean}
+- Original augmented samples: {event["train_augmented_total"]}
+- Removed augmented samples: {event["train_augmented_removed"]}
+- Clean augmented samples retained: {event["train_augmented_clean"]}
 
 **Affected TRAIN records:**
-{chr(10).join(['- ' + r for r in train_removed_records])}
+{chr(10).join(['- ' + r for r in event['train_removed_records']])}
 
 ---
 
 ### TEST Data Cleaning
 
-- Original segments: {test_segmented_total}
-- Removed (PCG NaNs): {test_segmented_removed}
-- Clean segments retained: {test_segmented_clean}
+- Original segments: {event["test_segmented_total"]}
+- Removed (PCG NaNs): {event["test_segmented_removed"]}
+- Clean segments retained: {event["test_segmented_clean"]}
 
 **Removed TEST segments (summary):**
-{chr(10).join([f"- {k}: {v} segments" for k, v in test_removed_summary.items()])}
+{chr(10).join([f"- {k}: {v} segments" for k, v in event['test_removed_summary'].items()])}
 
 ---
 
@@ -373,47 +421,133 @@ Notes:
         f.write(log_entry)
 
 
+# ============================================================
+# LOG QUALITY SCREEN (REJECT LISTS FROM SEGMENTATION)
+# ============================================================
+def log_quality_screen(screens):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    sections = []
+    for split, summary in screens.items():
+        by_reason = summary["by_reason"] or {"none": 0}
+        by_record = summary["by_record"]
+
+        sections.append(f"""
+### {split.upper()}
+
+- Candidate windows: {summary['candidates']}
+- Rejected: {summary['rejected']}
+- Segments retained: {summary['kept']}
+
+**Rejections by check:**
+{chr(10).join([f"- {k}: {v}" for k, v in by_reason.items()])}
+
+**Affected {split.upper()} records:**
+{chr(10).join([f"- {k}: {v} segments" for k, v in by_record.items()]) or "- none"}
+""")
+
+    log_entry = f"""
+---
+
+## {timestamp} — Data Cleaning Summary (Quality Screen)
+
+### Quality Check
+- Screened at segmentation time: every R-peak window of a record scored in one pass on ECG and PCG
+- Rejected windows are never written to the segment index / segment store
+
+**Thresholds (quality.py):**
+{chr(10).join([f"- {k}: {v}" for k, v in screens['train']['thresholds'].items()])}
+
+---
+{"---".join(sections)}
+---
+
+Notes:
+- Augmentation and scalograms only see retained segments; no files are removed afterwards
+- Reject lists: `{REJECT_LIST.format(split="{train,test}")}`
+"""
+
+    with open(LOG_FILE, "a", encoding="utf-8") as f:
+        f.write(log_entry)
+
+
 # ============================================================
 # LOG SCALOGRAM GENERATION
 # ============================================================
 def log_scalogram():
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    runs = {split: metrics.latest("scalogram", "summary", split=split) for split in ["train", "test"]}
+    runs = {split: r for split, r in runs.items() if r is not None}
+    if not runs:
+        not_recorded("scalogram", "run scalogram_runner.py first")
+        return
+
+    def manifest_done(r):
+        # The runner's resume manifest: ids whose scalograms are complete
+        if not os.path.exists(r.get("manifest", "")):
+            return None
+        with open(r["manifest"], encoding="utf-8") as f:
+            return len(json.load(f)["done"])
+
+    def output_lines(r):
+        if r["output"] == "store":
+            return f"tensor store ({r['mode']}, {r['dtype']}), ECG and PCG in one file each"
+        return "PNG, separate directories for ECG and PCG"
+
+    def split_lines(split, r):
+        done = manifest_done(r)
+        lines = [
+            f"- Source: `{r.get('source', 'not recorded')}`",
+            f"- Output: {output_lines(r)}",
+            f"- This run: {r['processed']} new / {r['items']} items in {r['seconds']:.1f} s "
+            f"({r['items_per_s']:.1f} items/s, {r['workers']} workers, {r.get('cwt', 'full')} CWT)",
+        ]
+        if "resumed" in r:
+            lines.append(f"- Already complete from earlier runs (manifest): {r['resumed']}")
+            if r["removed"]:
+                how = "store rebuilt without them" if r["rebuilt"] else "their images deleted"
+                lines.append(f"- Segments removed from the source since the last run: {r['removed']} ({how})")
+            else:
+                lines.append("- Segments removed from the source since the last run: none")
+        if done is not None:
+            lines.append(f"- Manifest now lists {done} / {r['items']} items as done (`{r['manifest']}`)")
+        return "\n".join(lines)
+
+    first = next(iter(runs.values()))
+    wavelets = "\n".join(
+        f"- {name}: {first[key][0]}, scales {first[key][1]}–{first[key][2]}"
+        for name, key in [("ECG", "ecg"), ("PCG", "pcg")] if key in first
+    ) or "- not recorded"
+    size = first.get("size", [224, 224])
+    downsampling = (
+        "Multirate CWT: signals decimated per modality, one scale per image row"
+        if any(r.get("cwt") == "multirate" for r in runs.values()) else "Full-rate CWT, no downsampling"
+    )
+    splits = "\n\n".join(f"### {split.capitalize()}\n{split_lines(split, r)}" for split, r in runs.items())
 
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     log_entry = f"""
 ---
 
 ## {timestamp} — Scalogram Generation Summary
 
-**Input data:**
-- Cleaned augmented ECG–PCG segments
-- Invalid segments excluded prior to scalogram generation
-
 **Time–frequency representation:**
 - Continuous Wavelet Transform (CWT)
+- {downsampling}
 
 **Wavelet configuration:**
-- ECG:
-  - Wavelet: Complex Morlet (cmor1.5-1.0)
-  - Scales: 20–500 (≈0.5–40 Hz)
-- PCG:
-  - Wavelet: Real Morlet (morl)
-  - Scales: 7–130 (≈20–250 Hz)
+{wavelets}
 
 **Image settings:**
-- Output size: 224 × 224 pixels
-- Format: PNG
-- Separate directories for ECG and PCG
+- Output size: {size[0]} × {size[1]} pixels
 
 **Processing details:**
-- Scalogram generation is resume-safe (skip-if-exists enabled)
-- Partial generation supported
-- No downsampling applied
-- Consistent configuration used across the dataset
+- Resumable: scalogram_runner.py records finished items in a manifest per split;
+  a rerun computes only items not listed there, and new settings start the split over
 
-Notes:
-- Scalograms corresponding to removed segments were deleted
-- Final dataset integrity preserved before model training
-"""
+{splits}
+
+{profile_block("scalogram", split="train")}
+{profile_block("scalogram", split="test")}"""
 
     with open(LOG_FILE, "a", encoding="utf-8") as f:
         f.write(log_entry)
@@ -542,7 +676,15 @@ Notes:
     with open(LOG_FILE, "a", encoding="utf-8") as f:
         f.write(log_entry)
 
-def log_ablation_study():
+def sweep_results(path=SWEEP_RESULTS):
+    """(all trials, best trial per variant) from the sweep table, or None."""
+    trials = sweep.load_results(path)
+    if trials.empty:
+        return None
+    return trials, sweep.best_trials(trials).set_index("variant")
+
+
+def log_ablation_study(results_csv=SWEEP_RESULTS):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     """
@@ -550,8 +692,6 @@ def log_ablation_study():
     including strategy, architecture, leakage prevention, and results.
     """
 
-    LOG_FILE = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\PROJECT_LOG.md"
-
     log = []
     log.append("## Ablation Study: ECG-only vs PCG-only vs ECG–PCG Fusion\n")
     log.append(f"**Timestamp:** {timestamp}\n\n")
@@ -609,11 +749,23 @@ def log_ablation_study():
     # Training Configuration
     # --------------------------------------------------
     log.append("\n### Training Configuration\n")
+    epoch = metrics.latest("ablation", "epoch")
+    if epoch is None:
+        precision = "- Mixed-precision (AMP) training on GPU.\n"
+    else:
+        setup = [epoch["device"]]
+        setup += ["channels_last"] if epoch["channels_last"] else []
+        setup += ["torch.compile"] if epoch["compile"] else []
+        setup += [f"{epoch['threads']} threads"] if epoch.get("threads") else []
+        precision = (
+            f"- {epoch['precision']} training ({', '.join(setup)}), "
+            f"{epoch['images_per_s']:.1f} images/s in the last epoch.\n"
+        )
     log.append(
         "- Input: CWT scalograms (ECG: complex Morlet; PCG: real Morlet).\n"
         "- Loss: Class-weighted BCEWithLogitsLoss to address class imbalance.\n"
         "- Optimizer: Adam.\n"
-        "- Mixed-precision (AMP) training on GPU.\n"
+        + precision +
         "- Early stopping based on validation ROC–AUC.\n"
     )
 
@@ -621,20 +773,49 @@ def log_ablation_study():
     # Test Results
     # --------------------------------------------------
     log.append("\n### Test Set Results (Held-out)\n")
-    log.append(
-        "- **ECG–PCG Fusion Model**:\n"
-        "  - Accuracy: 0.782\n"
-        "  - F1-score: 0.837\n"
-        "  - ROC–AUC: 0.817\n\n"
-        "- **ECG-only Model**:\n"
-        "  - Accuracy: 0.763\n"
-        "  - F1-score: 0.823\n"
-        "  - ROC–AUC: 0.795\n\n"
-        "- **PCG-only Model**:\n"
-        "  - Accuracy: 0.641\n"
-        "  - F1-score: 0.728\n"
-        "  - ROC–AUC: 0.647\n"
-    )
+    names = [("fusion", "ECG–PCG Fusion Model"), ("ecg_only", "ECG-only Model"), ("pcg_only", "PCG-only Model")]
+    swept = sweep_results(results_csv)
+
+    if swept is not None:
+        # Sweep table: each variant's trial with the best validation AUC
+        trials, best = swept
+        results = [
+            (name, {"Accuracy": row.test_accuracy, "F1": row.test_f1, "AUC": row.test_auc})
+            for variant, name in names if variant in best.index
+            for row in [best.loc[variant]]
+        ]
+    else:
+        results = [
+            (name, metrics.latest("ablation", "metrics", variant=variant, split="test"))
+            for variant, name in names
+        ]
+        results = [(name, m) for name, m in results if m is not None]
+
+    if not results:
+        log.append("- No test metrics recorded (run ablation.py / sweep.py, or `python log_run.py seed`).\n")
+    log.append("\n".join(
+        f"- **{name}**:\n"
+        f"  - Accuracy: {m['Accuracy']:.3f}\n"
+        f"  - F1-score: {m['F1']:.3f}\n"
+        f"  - ROC–AUC: {m['AUC']:.3f}\n"
+        for name, m in results
+    ))
+
+    if swept is not None:
+        log.append("\n### Hyperparameter Sweep\n")
+        log.append(
+            f"- {len(trials)} trials ({trials['stopped_early'].sum()} stopped early on validation AUC), "
+            f"{trials['seconds'].sum() / 3600:.1f} h of trial time.\n"
+            "- Selected per variant by validation AUC; test metrics never used for selection.\n"
+        )
+        log.append("".join(
+            f"- {name}: lr {row.lr:.1e}, batch {row.batch_size}, patience {row.patience}, {row.cwt} CWT "
+            f"(val AUC {row.best_val_auc:.3f}, {row.epochs_run} epochs)\n"
+            for variant, name in names if variant in best.index
+            for row in [best.loc[variant]]
+        ))
+
+    log.append("\n" + profile_block("ablation"))
 
     # --------------------------------------------------
     # Interpretation
@@ -663,9 +844,11 @@ if __name__ == "__main__":
     import sys
 
     if len(sys.argv) < 2:
-        print("Usage: python log_run.py [raw | mat | split | segment | augment | clean | visualize | scalogram | scalogram_viz | ablation_study]")
-
+        print("Usage: python log_run.py [raw | mat | split | segment | augment | clean | visualize | scalogram | scalogram_viz | ablation_study | seed] [metrics.jsonl] [sweep_results.csv]")
+        sys.exit(1)
 
+    if len(sys.argv) > 2:
+        metrics.configure(sys.argv[2])
 
     stage = sys.argv[1].lower()
 
@@ -688,8 +871,8 @@ if __name__ == "__main__":
     elif stage == "scalogram_viz":
         log_scalogram_visualization()
     elif stage== "ablation_study":
-        log_ablation_study()
+        log_ablation_study(*sys.argv[3:4])
+    elif stage == "seed":
+        seed_history()
     else:
         print("Unknown stage")
-
-
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+METRICS_FILE = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\CACHE\metrics.jsonl"
+
+# One id per process run, shared by every event it writes
+RUN_ID = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+# ============================================================
+# EVENT SINK
+# ============================================================
+# Append-only JSON lines, one event per line:
+#   {"ts": ..., "run": ..., "stage": "segment", "event": "summary", <fields>}
+# Stages write the numbers they already hold in memory (counts, timings,
+# throughput, skipped ids, model metrics); log_run.py renders the project
+# log from these events without touching the data again.
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def configure(path=None, run_id=None):
+    """Redirect the sink (e.g. a local file on Colab) and/or name the run."""
+    global METRICS_FILE, RUN_ID
+    if path is not None:
+        METRICS_FILE = path
+    if run_id is not None:
+        RUN_ID = run_id
+
+
+def emit(stage, event, path=None, **fields):
+    """Append one event; fields must be JSON-serialisable (numpy is converted)."""
+    path = path or METRICS_FILE
+    record = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "run": fields.pop("run", RUN_ID),
+        "stage": stage,
+        "event": event,
+        **_jsonable(fields),
+    }
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    # One write per line: concurrent appenders never interleave within an event
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    return record
+
+
+@contextmanager
+def timed(stage, event, path=None, **fields):
+    """
+    Emits seconds (and items_per_s if the body sets out["items"]) on exit.
+
+        with timed("augment", "summary") as out:
+            ...
+            out["items"] = n
+    """
+    out = dict(fields)
+    t0 = time.perf_counter()
+    yield out
+    seconds = time.perf_counter() - t0
+
+    out["seconds"] = seconds
+    if "items" in out:
+        out["items_per_s"] = out["items"] / max(seconds, 1e-9)
+    emit(stage, event, path, **out)
+
+
+def label_counts(labels):
+    """{label: count} of a label column / array."""
+    values, counts = np.unique(np.asarray(labels), return_counts=True)
+    # 1.0 and 1 are the same label whichever dtype the column was read with
+    return {
+        str(int(v)) if isinstance(v, float) and v.is_integer() else str(v): int(c)
+        for v, c in zip(values.tolist(), counts)
+    }
+
+
+def emit_model_metrics(stage, results, path=None, **fields):
+    """One event per variant of {variant: metrics} (ablation / evaluation results); text reports are left out."""
+    for variant, scores in results.items():
+        values = {k: v for k, v in scores.items() if not isinstance(v, str)}
+        emit(stage, "metrics", path, variant=variant, **fields, **values)
+
+
+# ============================================================
+# READING
+# ============================================================
+def read_events(path=None, stage=None, event=None):
+    path = path or METRICS_FILE
+    if not os.path.exists(path):
+        return []
+
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves at most one torn last line
+                continue
+            if stage is not None and record.get("stage") != stage:
+                continue
+            if event is not None and record.get("event") != event:
+                continue
+            events.append(record)
+    return events
+
+
+def latest(stage, event, path=None, **match):
+    """Most recent event of stage/event whose fields equal match, or None."""
+    for record in reversed(read_events(path, stage, event)):
+        if all(record.get(k) == v for k, v in match.items()):
+            return record
+    return None
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else METRICS_FILE
+    events = read_events(path)
+
+    print(f"✅ {len(events)} events in {path}")
+    for record in events:
+        fields = {k: v for k, v in record.items() if k not in ("ts", "run", "stage", "event")}
+        summary = ", ".join(f"{k}={v}" for k, v in fields.items() if not isinstance(v, (list, dict)))
+        print(f"{record['ts']} {record['run']:22s} {record['stage']:10s} {record['event']:10s} {summary}")
@@ -0,0 +1,167 @@
+import torch
+import torch.nn as nn
+
+# ============================================================
+# MODELS (as defined in 7-ablation_model.ipynb)
+# ============================================================
+# Layer names match the notebook classes, so the saved best_*.pth
+# state dicts load unchanged.
+
+
+class ConvBlock(nn.Module):
+    def __init__(self, in_ch, out_ch):
+        super().__init__()
+        self.block = nn.Sequential(
+            nn.Conv2d(in_ch, out_ch, 3, padding=1),
+            nn.BatchNorm2d(out_ch),
+            nn.ReLU(inplace=True),
+            nn.MaxPool2d(2)
+        )
+
+    def forward(self, x):
+        return self.block(x)
+
+
+class CNNBranch(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.features = nn.Sequential(
+            ConvBlock(3, 32),
+            ConvBlock(32, 64),
+            ConvBlock(64, 128),
+            ConvBlock(128, 256)
+        )
+        self.pool = nn.AdaptiveAvgPool2d((1, 1))
+
+    def forward(self, x):
+        x = self.features(x)
+        x = self.pool(x)
+        return x.view(x.size(0), -1)
+
+
+class DualBranchECGPCGCNN(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.ecg = CNNBranch()
+        self.pcg = CNNBranch()
+        self.classifier = nn.Sequential(
+            nn.Linear(512, 128),
+            nn.ReLU(inplace=True),
+            nn.Dropout(0.5),
+            nn.Linear(128, 1)
+        )
+
+    def forward(self, ecg, pcg):
+        f_ecg = self.ecg(ecg)
+        f_pcg = self.pcg(pcg)
+        fused = torch.cat([f_ecg, f_pcg], dim=1)
+        return self.classifier(fused)
+
+
+class SingleModalityCNN(nn.Module):
+    """ECG-only / PCG-only baseline: one branch straight into the classifier."""
+
+    def __init__(self):
+        super().__init__()
+        self.features = nn.Sequential(
+            nn.Conv2d(3, 32, 3, padding=1), nn.BatchNorm2d(32), nn.ReLU(), nn.MaxPool2d(2),
+            nn.Conv2d(32, 64, 3, padding=1), nn.BatchNorm2d(64), nn.ReLU(), nn.MaxPool2d(2),
+            nn.Conv2d(64, 128, 3, padding=1), nn.BatchNorm2d(128), nn.ReLU(), nn.MaxPool2d(2),
+            nn.Conv2d(128, 256, 3, padding=1), nn.BatchNorm2d(256), nn.ReLU(), nn.MaxPool2d(2),
+        )
+        self.pool = nn.AdaptiveAvgPool2d((1, 1))
+        self.classifier = nn.Sequential(
+            nn.Linear(256, 128), nn.ReLU(), nn.Dropout(0.5),
+            nn.Linear(128, 1)
+        )
+
+    def forward(self, x):
+        x = self.features(x)
+        x = self.pool(x).view(x.size(0), -1)
+        return self.classifier(x)
+
+
+class ECGOnlyCNN(SingleModalityCNN):
+    pass
+
+
+class PCGOnlyCNN(SingleModalityCNN):
+    pass
+
+
+# ============================================================
+# RAW-WAVEFORM MODELS (no scalograms)
+# ============================================================
+# 1D counterparts of CNNBranch / DualBranchECGPCGCNN on the 3-s segments
+# themselves, (batch, 1, 6000) float32 at 2 kHz. Same channel
+# progression and classifier; kernel 7 with pooling by 4 per block takes
+# 6000 samples to 23 steps (≈130 ms each) before the global pool.
+
+
+class ConvBlock1D(nn.Module):
+    def __init__(self, in_ch, out_ch, kernel_size=7, pool=4):
+        super().__init__()
+        self.block = nn.Sequential(
+            nn.Conv1d(in_ch, out_ch, kernel_size, padding=kernel_size // 2),
+            nn.BatchNorm1d(out_ch),
+            nn.ReLU(inplace=True),
+            nn.MaxPool1d(pool)
+        )
+
+    def forward(self, x):
+        return self.block(x)
+
+
+class CNNBranch1D(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.features = nn.Sequential(
+            ConvBlock1D(1, 32),
+            ConvBlock1D(32, 64),
+            ConvBlock1D(64, 128),
+            ConvBlock1D(128, 256)
+        )
+        self.pool = nn.AdaptiveAvgPool1d(1)
+
+    def forward(self, x):
+        x = self.features(x)
+        x = self.pool(x)
+        return x.view(x.size(0), -1)
+
+
+class DualBranchECGPCG1D(DualBranchECGPCGCNN):
+    def __init__(self):
+        super().__init__()
+        self.ecg = CNNBranch1D()
+        self.pcg = CNNBranch1D()
+
+
+# ============================================================
+# ABLATION VARIANTS
+# ============================================================
+# name -> (model class, inputs it takes in forward order, checkpoint name)
+VARIANTS = {
+    "fusion": (DualBranchECGPCGCNN, ("ecg", "pcg"), "best_dual_cnn.pth"),
+    "ecg_only": (ECGOnlyCNN, ("ecg",), "best_ecg_only.pth"),
+    "pcg_only": (PCGOnlyCNN, ("pcg",), "best_pcg_only.pth"),
+    "fusion_1d": (DualBranchECGPCG1D, ("ecg", "pcg"), "best_dual_cnn_1d.pth"),
+}
+
+# The scalogram variants of the ablation study
+SCALOGRAM_VARIANTS = ["fusion", "ecg_only", "pcg_only"]
+
+# Shape of one input (without batch): scalogram image or raw segment
+IMAGE_SHAPE = (3, 224, 224)
+WAVEFORM_SHAPE = (1, 6000)
+
+
+def build_model(variant):
+    return VARIANTS[variant][0]()
+
+
+def model_inputs(variant):
+    return VARIANTS[variant][1]
+
+
+def input_shape(variant):
+    return WAVEFORM_SHAPE if variant.endswith("_1d") else IMAGE_SHAPE
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import augmentation
+import metrics
+import profiling
+import scalogram
+from channel_index import RAW_DATA_DIR, load_channel_index, eligible_records
+from signal_store import INDEX_FILE, SignalStore, pack_mat_dir
+from quality import QC_THRESHOLDS
+from split_manifest import (
+    MANIFEST_CSV, SPLIT_SALT, N_FOLDS, load_manifest, save_manifest, update_manifest, split_summary,
+)
+from segmentation import WINDOW_SEC, append_segments, save_segment_index, save_reject_list, emit_segment_metrics
+from rpeak_detection import DEFAULT_DETECTOR, CACHE_DIR as RPEAK_CACHE_DIR
+from stage_cache import Stage, StageCache, CACHE_ROOT, run_stages, status, print_report
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+DATASET_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET"
+
+LABELS_CSV = os.path.join(DATASET_DIR, "2-MATLAB DATA", "LABELS.csv")
+
+N_WORKERS = os.cpu_count() or 1
+
+# Arguments of the stages; the augmentation and wavelet settings are read
+# from augmentation.py / scalogram.py, so editing them there is enough
+CONFIG = {
+    "test_size": 0.30,
+    "split_salt": SPLIT_SALT,
+    "n_folds": N_FOLDS,
+    "window_sec": WINDOW_SEC,
+    "detector": DEFAULT_DETECTOR,
+    "qc": QC_THRESHOLDS,
+    "scalogram_mode": "rgb",
+    "scalogram_dtype": "uint8",
+    "scalogram_cwt": "full",
+}
+
+SPLITS = ["train", "test"]
+
+
+def load_config(path=None):
+    config = dict(CONFIG)
+    if path is not None:
+        with open(path, encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+
+# ============================================================
+# STAGES
+# ============================================================
+# raw -> convert -> split -> segment -> scalogram -> train
+# Each writes into its own cache dir (ctx.out_dir) and reads its
+# dependencies from ctx.inputs. All but train are incremental (see
+# stage_cache.py): a new raw record is converted, split, segmented and
+# turned into scalograms on its own, next to the outputs of the records
+# already there. Augmentation is not a stage: training draws it on the
+# fly from the train segments (augmentation.augmented_loader).
+
+def _changed_records(store_path, signatures, conversions, labels):
+    """Records of the store whose WFDB files or label changed, or that left the raw dir."""
+    if not os.path.exists(os.path.join(store_path, INDEX_FILE)):
+        return []
+
+    stored = SignalStore(store_path).index.set_index("id")
+    changed = []
+    for record_id in stored.index:
+        stored_label = stored["label"].get(record_id) if "label" in stored else None
+        same_label = labels.get(record_id) == stored_label or (pd.isna(stored_label) and record_id not in labels)
+        if conversions.get(record_id, {}).get("source") != signatures.get(record_id) or not same_label:
+            changed.append(record_id)
+    return changed
+
+
+def convert_stage(ctx):
+    """
+    WFDB records -> per-record .mat (as 1-mat_convertion.py) -> one record
+    store. Only records not converted yet are read; an edited, removed or
+    relabelled record starts the stage (and everything after it) over.
+    """
+    converter = importlib.import_module("1-mat_convertion")
+
+    mat_dir = os.path.join(ctx.out_dir, "mat")
+    store_path = os.path.join(ctx.out_dir, "records")
+    conversions_path = os.path.join(mat_dir, "conversion_manifest.json")
+
+    records = eligible_records(load_channel_index(RAW_DATA_DIR))
+    signatures = {r: converter.source_signature(os.path.join(RAW_DATA_DIR, r)) for r in records}
+    labels_df = pd.read_csv(LABELS_CSV, dtype={"record": str})
+    labels = dict(zip(labels_df["record"], labels_df["label"]))
+
+    conversions = converter.load_manifest(conversions_path)
+    changed = _changed_records(store_path, signatures, conversions, labels)
+    if changed:
+        print(f"convert: {len(changed)} records changed since they were converted ({', '.join(changed[:5])}), starting over")
+        ctx.reset()
+        conversions = {}
+    os.makedirs(mat_dir, exist_ok=True)
+
+    pending = [r for r in records if not converter.is_up_to_date(conversions.get(r), signatures[r], mat_dir)]
+    with ProcessPoolExecutor(max_workers=N_WORKERS) as pool:
+        for result in pool.map(converter.convert_record, pending, [RAW_DATA_DIR] * len(pending), [mat_dir] * len(pending)):
+            profiling.merge(result["profile"])
+            conversions[result["record"]] = {"record": result["record"], "source": signatures[result["record"]], "fs": result["fs"]}
+            converter.save_manifest(conversions_path, conversions)
+    profiling.emit_profile("mat", workers=N_WORKERS)
+    profiling.reset()
+
+    pack_mat_dir(mat_dir, store_path, LABELS_CSV, ids=records, resume=True)
+    print(f"convert: {len(pending)} new records, {len(records) - len(pending)} already converted")
+
+
+def split_stage(ctx):
+    """
+    Hash-based record-level split (split_manifest.py, as 3-test_train_split.py):
+    split manifest + label CSVs; the records stay in the convert store.
+    """
+    records = SignalStore(os.path.join(ctx.inputs["convert"], "records"))
+    labels_df = records.index[["id", "label"]].rename(columns={"id": "record"})
+
+    # Records of the project manifest keep their split; the rest are hashed
+    manifest, new = update_manifest(
+        load_manifest(MANIFEST_CSV), labels_df, os.path.join(ctx.inputs["convert"], "mat"),
+        ctx.params["test_size"], ctx.params["n_folds"], ctx.params["split_salt"],
+    )
+    manifest = manifest[manifest["record"].isin(set(labels_df["record"]))]
+
+    # Segments are appended per split, so a record may never change sides
+    manifest_path = os.path.join(ctx.out_dir, "split_manifest.csv")
+    previous = load_manifest(manifest_path)
+    if previous is not None:
+        current = dict(zip(manifest["record"], manifest["split"]))
+        moved = [r for r, split in zip(previous["record"], previous["split"]) if current.get(r) != split]
+        if moved:
+            print(f"split: {len(moved)} records left or changed split, starting over")
+            ctx.reset()
+    save_manifest(manifest, manifest_path)
+
+    for split in SPLITS:
+        df = manifest.loc[manifest["split"] == split, ["record", "label"]]
+        df.to_csv(os.path.join(ctx.out_dir, f"{split}_labels.csv"), index=False)
+
+    metrics.emit(
+        "split", "summary", test_size=ctx.params["test_size"], n_folds=ctx.params["n_folds"],
+        new_records=len(new), **split_summary(manifest),
+    )
+
+
+def segment_stage(ctx):
+    """R-peak centred windows -> quality screen -> segment store per split, appended for new records."""
+    records = SignalStore(os.path.join(ctx.inputs["convert"], "records"))
+
+    for split in SPLITS:
+        t0 = time.perf_counter()
+        ids = pd.read_csv(os.path.join(ctx.inputs["split"], f"{split}_labels.csv"), dtype={"record": str})["record"].tolist()
+
+        index, skipped, rejected, n_new = append_segments(
+            records, os.path.join(ctx.out_dir, f"{split}_segments"),
+            ctx.params["window_sec"], ctx.params["detector"], ctx.params["qc"], ids=ids, rpeak_cache=RPEAK_CACHE_DIR,
+        )
+        save_segment_index(index, os.path.join(ctx.out_dir, f"{split}_segment_index.csv"))
+        save_reject_list(rejected, os.path.join(ctx.out_dir, f"{split}_rejected_segments.csv"))
+
+        emit_segment_metrics(
+            split, len(ids), index, skipped, rejected, ctx.params["window_sec"],
+            ctx.params["detector"], ctx.params["qc"], time.perf_counter() - t0,
+        )
+        profiling.emit_profile("segment", split=split)
+        profiling.reset()
+
+        print(f"{split}: {n_new} new segments, {len(index)} in total, {len(rejected)} rejected, {len(skipped)} records without windows")
+
+
+def scalogram_stage(ctx):
+    """Scalogram tensor stores of the train and test segments (validation and test inputs)."""
+    from scalogram_runner import load_config as scalogram_config, run
+
+    config = scalogram_config()
+    config.update({
+        "output": "store",
+        "mode": ctx.params["mode"],
+        "dtype": ctx.params["dtype"],
+        "cwt": ctx.params["cwt"],
+        "out_root": ctx.out_dir,
+        "splits": {
+            "train": os.path.join(ctx.inputs["segment"], "train_segments"),
+            "test": os.path.join(ctx.inputs["segment"], "test_segments"),
+        },
+    })
+    run(config)
+
+
+def build_pipeline(config=None):
+    config = config or CONFIG
+
+    augment_params = {
+        "aug_types": augmentation.AUG_TYPES,
+        "ecg_noise_rel": augmentation.ECG_NOISE_REL,
+        "pcg_noise": augmentation.PCG_NOISE,
+        "ecg_scale_range": augmentation.ECG_SCALE_RANGE,
+        "pcg_scale_range": augmentation.PCG_SCALE_RANGE,
+        "max_shift_sec": augmentation.MAX_SHIFT_SEC,
+        "seed": augmentation.AUG_SEED,
+    }
+
+    scalogram_params = {
+        "ecg_wavelet": scalogram.ECG_WAVELET,
+        "ecg_scales": scalogram.ECG_SCALES,
+        "pcg_wavelet": scalogram.PCG_WAVELET,
+        "pcg_scales": scalogram.PCG_SCALES,
+        "precision": scalogram.PRECISION,
+        "size": scalogram.IMG_SIZE,
+        "mode": config["scalogram_mode"],
+        "dtype": config["scalogram_dtype"],
+        "cwt": config["scalogram_cwt"],
+    }
+
+    # Settings of the 7-ablation_model training cells; the augmentation
+    # drawn in the training loader belongs to them
+    train_params = {
+        "lr": 1e-4, "batch_size": 16, "epochs": 50, "patience": 5, "val_size": 0.2, "seed": 42,
+        "augmentation": augment_params,
+    }
+
+    return [
+        Stage("convert", convert_stage, sources=[(RAW_DATA_DIR, (".hea", ".dat")), LABELS_CSV], incremental=True),
+        Stage(
+            "split", split_stage, ["convert"],
+            {"test_size": config["test_size"], "split_salt": config["split_salt"], "n_folds": config["n_folds"]},
+            sources=[MANIFEST_CSV], incremental=True,
+        ),
+        Stage(
+            "segment", segment_stage, ["convert", "split"],
+            {"window_sec": config["window_sec"], "detector": config["detector"], "qc": config["qc"]}, incremental=True,
+        ),
+        Stage("scalogram", scalogram_stage, ["segment"], scalogram_params, incremental=True),
+        Stage("train", None, ["segment", "scalogram"], train_params),
+    ]
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python pipeline.py [status | run] [target_stage] [config.json]")
+        sys.exit(1)
+
+    action = sys.argv[1].lower()
+    target = sys.argv[2] if len(sys.argv) > 2 else None
+    config = load_config(sys.argv[3] if len(sys.argv) > 3 else None)
+
+    stages = build_pipeline(config)
+    cache = StageCache(CACHE_ROOT)
+
+    if action == "status":
+        for row in status(stages, cache):
+            state = "external" if row["external"] and not row["done"] else ("cached" if row["done"] else "stale")
+            print(f"{row['stage']:12s} {row['key']}  {state}")
+    elif action == "run":
+        report = run_stages(stages, cache, targets=[target] if target else None)
+        print("\n✅ Pipeline complete")
+        print_report(report)
+        for row in report:
+            if row["status"] == "external":
+                print(f"{row['stage']}: run outside the pipeline, write outputs to {row['out_dir']}")
+    else:
+        print("Unknown action")
@@ -0,0 +1,200 @@
+import os
+import time
+
+import numpy as np
+import torch
+
+import profiling
+from channel_index import extract_ecg_pcg
+from models import build_model, model_inputs
+from quality import QC_THRESHOLDS, screen_windows
+from rpeak_detection import DEFAULT_DETECTOR, detect
+from scalogram_dataset import NORM_MEAN, NORM_STD
+from scalogram_store import scalogram_images
+from segmentation import WINDOW_SEC, segment_windows
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+MODEL_DIR = "/content/drive/MyDrive/ECG-PCG PROJECT UPGRADED/MODELS"
+CHECKPOINT = os.path.join(MODEL_DIR, "best_dual_cnn.pth")
+
+CONFIG = {
+    "variant": "fusion",
+    "detector": DEFAULT_DETECTOR,
+    "window_sec": WINDOW_SEC,
+    "qc": QC_THRESHOLDS,
+    "batch_size": 16,          # segments per CWT + model batch
+    "aggregate": "mean",       # "mean", "max" or "vote" over segment probabilities
+    "threshold": 0.5,
+    "budget_ms": None,         # per-recording latency budget, reported if set
+}
+
+STAGES = ["read", "rpeaks", "segment", "cwt", "model", "aggregate"]
+
+# Record labels of the dataset: -1 normal, +1 abnormal
+LABELS = {0: -1, 1: 1}
+
+
+# ============================================================
+# STREAMING PIPELINE
+# ============================================================
+# raw record -> channels -> R-peaks -> windows (+ quality screen) ->
+# per batch of windows: CWT images -> model -> segment probabilities ->
+# record label. Everything stays in memory; windows are sliced from the
+# record only when their batch is scored, so memory is bounded by
+# batch_size whatever the recording length.
+
+
+def load_scorer(path=None, variant="fusion", device="cpu"):
+    """
+    .pth: state dict of the notebook/models.py classes; anything else is
+    taken as a TorchScript export (see inference.py).
+    """
+    if path is not None and not path.endswith(".pth"):
+        return torch.jit.load(path, map_location=device).eval()
+
+    model = build_model(variant)
+    if path is not None:
+        model.load_state_dict(torch.load(path, map_location=device))
+    return model.to(device).eval()
+
+
+@torch.no_grad()
+def score_images(model, inputs, ecg_img, pcg_img, device="cpu"):
+    """Segment probabilities from uint8 image batches, normalised as in training."""
+    images = {"ecg": ecg_img, "pcg": pcg_img}
+    x = [((torch.from_numpy(images[m]).to(device).float() / 255) - NORM_MEAN) / NORM_STD for m in inputs]
+    with profiling.section("forward"):
+        logits = model(*x)
+    return torch.sigmoid(logits.float()).view(-1).cpu().numpy()
+
+
+def aggregate(probs, method="mean", threshold=0.5):
+    """Record probability from segment probabilities."""
+    if method == "mean":
+        return float(np.mean(probs))
+    if method == "max":
+        return float(np.max(probs))
+    if method == "vote":
+        return float(np.mean(probs > threshold))
+    raise ValueError(f"Unknown aggregation: {method}")
+
+
+class Predictor:
+    """
+    Scores raw recordings with one model. predict_record() takes a WFDB
+    record path (without extension), predict_arrays() the signals.
+    Results carry a per-stage latency breakdown in milliseconds.
+    """
+
+    def __init__(self, checkpoint=CHECKPOINT, config=None, device="cpu", model=None):
+        self.config = dict(CONFIG, **(config or {}))
+        self.device = torch.device(device)
+        self.model = model if model is not None else load_scorer(checkpoint, self.config["variant"], device)
+        self.inputs = model_inputs(self.config["variant"])
+
+    def predict_record(self, record_path):
+        import wfdb
+
+        t0 = time.perf_counter()
+        with profiling.section("wfdb_read"):
+            record = wfdb.rdrecord(record_path)
+        ecg, pcg = extract_ecg_pcg(record.p_signal, record.sig_name)
+        read_ms = 1000 * (time.perf_counter() - t0)
+
+        result = self.predict_arrays(ecg, pcg, record.fs, record_id=os.path.basename(record_path))
+        result["timings"]["read"] = read_ms
+        result["total_ms"] += read_ms
+        return self._check_budget(result)
+
+    def predict_arrays(self, ecg, pcg, fs, record_id=None):
+        cfg = self.config
+        timings = {stage: 0.0 for stage in STAGES}
+
+        def timed(stage, fn, *args):
+            t0 = time.perf_counter()
+            out = fn(*args)
+            timings[stage] += 1000 * (time.perf_counter() - t0)
+            return out
+
+        rpeaks = timed("rpeaks", detect, ecg, fs, cfg["detector"])
+
+        def windows_of_record():
+            windows = segment_windows(rpeaks, len(ecg), fs, cfg["window_sec"])
+            if cfg["qc"] is None or not windows:
+                return windows, 0
+            keep, _ = screen_windows(ecg, pcg, fs, windows, cfg["qc"])
+            return [w for w, k in zip(windows, keep) if k], int((~keep).sum())
+
+        windows, rejected = timed("segment", windows_of_record)
+
+        probs = []
+        for i in range(0, len(windows), cfg["batch_size"]):
+            batch = windows[i:i + cfg["batch_size"]]
+            ecg_seg = np.stack([ecg[s:e] for s, e, _ in batch])
+            pcg_seg = np.stack([pcg[s:e] for s, e, _ in batch])
+
+            ecg_img, pcg_img = timed("cwt", scalogram_images, ecg_seg, pcg_seg)
+            probs.append(timed("model", score_images, self.model, self.inputs, ecg_img, pcg_img, self.device))
+
+        probs = np.concatenate(probs) if probs else np.zeros(0, dtype=np.float32)
+
+        if len(probs):
+            probability = timed("aggregate", aggregate, probs, cfg["aggregate"], cfg["threshold"])
+            label = LABELS[int(probability > cfg["threshold"])]
+        else:
+            probability, label = float("nan"), None
+
+        result = {
+            "record": record_id,
+            "label": label,
+            "probability": probability,
+            "n_segments": len(probs),
+            "n_rejected": rejected,
+            "segment_probs": probs,
+            "timings": timings,
+            "total_ms": sum(timings.values()),
+        }
+        return self._check_budget(result)
+
+    def _check_budget(self, result):
+        budget = self.config["budget_ms"]
+        result["budget_ms"] = budget
+        result["within_budget"] = None if budget is None else result["total_ms"] <= budget
+        return result
+
+
+def print_result(result):
+    label = {None: "no valid segments", -1: "normal (-1)", 1: "abnormal (+1)"}[result["label"]]
+    print(
+        f"{result['record']}: {label} | p={result['probability']:.4f} | "
+        f"{result['n_segments']} segments ({result['n_rejected']} rejected)"
+    )
+    print("  " + " | ".join(f"{k} {v:.1f} ms" for k, v in result["timings"].items()) +
+          f" | total {result['total_ms']:.1f} ms")
+    if result["within_budget"] is not None:
+        print(f"  {'within' if result['within_budget'] else 'OVER'} budget of {result['budget_ms']:.0f} ms")
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    config = {}
+    if "--budget" in args:
+        i = args.index("--budget")
+        config["budget_ms"] = float(args[i + 1])
+        del args[i:i + 2]
+
+    if len(args) < 2:
+        print("Usage: python predict.py <checkpoint (.pth or TorchScript .pt)> <record_path> [record_path ...] [--budget ms]")
+        sys.exit(1)
+
+    predictor = Predictor(args[0], config)
+
+    for record_path in args[1:]:
+        print_result(predictor.predict_record(record_path))
@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+ENABLED = True
+
+# Sections wrapped in the pipeline (name -> call site)
+SECTIONS = {
+    "wfdb_read": "1-mat_convertion.convert_record, predict.Predictor.predict_record",
+    "savemat": "1-mat_convertion.convert_record",
+    "rpeaks": "rpeak_detection.detect",
+    "cwt": "scalogram.cwt_batch, scalogram.cwt_multirate",
+    "render_png": "scalogram_runner._save_png",
+    "png_decode": "scalogram_dataset (ScalogramDataset, _decode_png)",
+    "forward": "ablation.AblationRunner, evaluation.predict_segments, predict.score_images",
+}
+
+TOP_FUNCTIONS = 25
+
+
+# ============================================================
+# TIMERS + COUNTERS
+# ============================================================
+# Per process: {section: [calls, seconds, bytes_in, bytes_out]}. A timer
+# costs two perf_counter() calls and a dict update, so the hooks stay on
+# in normal runs. Nothing is patched or traced (no sys.setprofile), so
+# cProfile and py-spy see the real call stacks.
+#
+# Pool workers keep their own counters; they return drain() with their
+# results and the parent merge()s them.
+
+_stats = {}
+_lock = threading.Lock()   # decode threads of CachedScalogramDataset share the counters
+
+
+def add(name, seconds=0.0, bytes_in=0, bytes_out=0, calls=1):
+    with _lock:
+        row = _stats.setdefault(name, [0, 0.0, 0, 0])
+        row[0] += calls
+        row[1] += seconds
+        row[2] += int(bytes_in or 0)
+        row[3] += int(bytes_out or 0)
+
+
+@contextmanager
+def section(name, bytes_in=0, bytes_out=0):
+    """
+    Times the body under name. Sizes only known afterwards can be set on
+    the yielded dict:
+
+        with section("savemat") as s:
+            sio.savemat(path, data)
+            s["bytes_out"] = os.path.getsize(path)
+    """
+    io = {"bytes_in": bytes_in, "bytes_out": bytes_out}
+    if not ENABLED:
+        yield io
+        return
+
+    t0 = time.perf_counter()
+    try:
+        yield io
+    finally:
+        add(name, time.perf_counter() - t0, io["bytes_in"], io["bytes_out"])
+
+
+def profiled(name):
+    """Decorator form of section(); keeps the function's name and frame."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with section(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def snapshot():
+    with _lock:
+        return {name: list(row) for name, row in _stats.items()}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def drain():
+    """Counters since the last drain (what a worker sends back with its result)."""
+    global _stats
+    with _lock:
+        stats, _stats = _stats, {}
+    return stats
+
+
+def merge(stats):
+    for name, (calls, seconds, bytes_in, bytes_out) in (stats or {}).items():
+        add(name, seconds, bytes_in, bytes_out, calls)
+
+
+# ============================================================
+# MEMORY
+# ============================================================
+def peak_rss_mb(children=False):
+    """
+    Peak resident set size of this process (children=True: of its largest
+    finished child, e.g. a pool worker). None where it can't be read.
+    """
+    try:
+        import resource
+
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+    except ImportError:
+        pass
+
+    if children:
+        return None
+    try:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        # Windows reports the peak working set
+        return getattr(info, "peak_wset", info.rss) / 2**20
+    except ImportError:
+        return None
+
+
+# ============================================================
+# REPORT
+# ============================================================
+def summary():
+    """Rows sorted by time: section, calls, seconds, ms_per_call, mb_in, mb_out."""
+    rows = [
+        {
+            "section": name,
+            "calls": calls,
+            "seconds": seconds,
+            "ms_per_call": 1000 * seconds / max(calls, 1),
+            "mb_in": bytes_in / 1e6,
+            "mb_out": bytes_out / 1e6,
+        }
+        for name, (calls, seconds, bytes_in, bytes_out) in snapshot().items()
+    ]
+    return sorted(rows, key=lambda r: -r["seconds"])
+
+
+def print_summary(title="Profile"):
+    rss, rss_children = peak_rss_mb(), peak_rss_mb(children=True)
+
+    print(f"\n{title}")
+    print(f"{'section':12s} {'calls':>8s} {'total s':>9s} {'ms/call':>9s} {'MB in':>9s} {'MB out':>9s}")
+    for r in summary():
+        print(
+            f"{r['section']:12s} {r['calls']:8d} {r['seconds']:9.2f} {r['ms_per_call']:9.2f} "
+            f"{r['mb_in']:9.1f} {r['mb_out']:9.1f}"
+        )
+    if rss is not None:
+        print(f"Peak RSS: {rss:.0f} MB" + (f" (largest worker {rss_children:.0f} MB)" if rss_children else ""))
+
+
+def emit_profile(stage, **fields):
+    """The current summary as a "profile" event of stage (rendered by log_run.py)."""
+    import metrics
+
+    return metrics.emit(
+        stage, "profile",
+        sections=summary(),
+        peak_rss_mb=peak_rss_mb(),
+        peak_rss_worker_mb=peak_rss_mb(children=True),
+        **fields,
+    )
+
+
+# ============================================================
+# cPROFILE MODE
+# ============================================================
+@contextmanager
+def cprofile(out_path=None, top=TOP_FUNCTIONS, sort="cumulative"):
+    """
+    Function-level profile of the body: prints the top functions and, if
+    out_path is given, writes the .prof file (snakeviz / pstats). Only the
+    calling process is profiled; pool workers are not.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if out_path:
+            profiler.dump_stats(out_path)
+        pstats.Stats(profiler).strip_dirs().sort_stats(sort).print_stats(top)
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import runpy
+
+    args = sys.argv[1:]
+    prof_path = None
+    if "--cprofile" in args:
+        i = args.index("--cprofile")
+        prof_path = args[i + 1]
+        del args[i:i + 2]
+
+    if not args:
+        print("Usage: python profiling.py [--cprofile out.prof] <script.py> [script args ...]")
+        print("       py-spy record -o profile.svg -- python <script.py> [script args ...] also works unchanged")
+        sys.exit(1)
+
+    sys.argv = args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args[0])))
+
+    # The script imports this file as "profiling", not "__main__": report those counters
+    import profiling
+
+    t0 = time.perf_counter()
+    if prof_path:
+        with cprofile(prof_path):
+            runpy.run_path(args[0], run_name="__main__")
+    else:
+        runpy.run_path(args[0], run_name="__main__")
+
+    profiling.print_summary(f"✅ Profile of {os.path.basename(args[0])} ({time.perf_counter() - t0:.1f} s wall)")
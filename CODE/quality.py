@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# QUALITY THRESHOLDS
+# ============================================================
+# A window is rejected if any check fails on ECG or PCG.
+#
+# nan:      NaN ratio above NAN_RATIO_MAX. The notebooks flagged >90%,
+#           but a single NaN spreads over the whole FFT-based scalogram,
+#           so any NaN rejects (contaminated windows were all-NaN anyway).
+# flat:     a run of constant samples of at least FLAT_MAX_SEC
+# clip:     more than CLIP_RATIO_MAX of the samples at the record's rail
+#           (|x| >= CLIP_LEVEL × record peak)
+# energy:   mean power below ENERGY_REL_MIN × the median window of the
+#           record, or below ENERGY_MIN
+QC_THRESHOLDS = {
+    "nan_ratio_max": 0.0,
+    "flat_max_sec": 0.5,
+    "flat_eps": 1e-7,
+    "clip_level": 0.999,
+    "clip_ratio_max": 0.01,
+    "energy_rel_min": 0.01,
+    "energy_min": 1e-12,
+}
+
+CHECKS = ["nan", "flat", "clip", "energy"]
+
+REJECT_COLUMNS = ["segment_id", "record_id", "start", "end", "label", "reason"]
+
+
+# ============================================================
+# VECTORISED SCORING
+# ============================================================
+def window_matrix(signal, starts, length):
+    """(n_windows, length) gather of equal-length windows, one fancy-index pass."""
+    idx = np.asarray(starts, dtype=np.int64)[:, None] + np.arange(length)
+    return np.asarray(signal)[idx]
+
+
+def _longest_run(mask):
+    """Longest run of True per row."""
+    counts = np.cumsum(mask, axis=1)
+    resets = np.maximum.accumulate(np.where(mask, 0, counts), axis=1)
+    return (counts - resets).max(axis=1) if mask.shape[1] else np.zeros(len(mask), dtype=np.int64)
+
+
+def channel_scores(signal, starts, length, fs, thresholds=QC_THRESHOLDS):
+    """Per-window nan_ratio, flat_sec, clip_ratio and energy_rel of one channel."""
+    windows = window_matrix(signal, starts, length).astype(np.float64)
+
+    nan = np.isnan(windows)
+    nan_ratio = nan.mean(axis=1)
+    x = np.where(nan, 0.0, windows)
+
+    # NaN stretches are reported by the nan check, not as flatlines
+    flat = (np.abs(np.diff(x, axis=1)) <= thresholds["flat_eps"]) & ~nan[:, 1:] & ~nan[:, :-1]
+    flat_sec = (_longest_run(flat) + 1) / fs
+
+    peak = np.nanmax(np.abs(signal)) if not np.all(np.isnan(signal)) else 0.0
+    if peak > 0:
+        clip_ratio = (np.abs(x) >= thresholds["clip_level"] * peak).mean(axis=1)
+    else:
+        clip_ratio = np.zeros(len(x))
+
+    valid = np.maximum((~nan).sum(axis=1), 1)
+    energy = (x ** 2).sum(axis=1) / valid
+    median_energy = np.median(energy) if len(energy) else 0.0
+    energy_rel = energy / median_energy if median_energy > 0 else np.zeros(len(x))
+
+    return {
+        "nan_ratio": nan_ratio,
+        "flat_sec": flat_sec,
+        "clip_ratio": clip_ratio,
+        "energy": energy,
+        "energy_rel": energy_rel,
+    }
+
+
+def failed_checks(scores, thresholds=QC_THRESHOLDS):
+    """Boolean array per check for one channel's scores."""
+    return {
+        "nan": scores["nan_ratio"] > thresholds["nan_ratio_max"],
+        "flat": scores["flat_sec"] >= thresholds["flat_max_sec"],
+        "clip": scores["clip_ratio"] > thresholds["clip_ratio_max"],
+        "energy": (scores["energy_rel"] < thresholds["energy_rel_min"]) | (scores["energy"] < thresholds["energy_min"]),
+    }
+
+
+def screen_windows(ecg, pcg, fs, windows, thresholds=QC_THRESHOLDS):
+    """
+    Scores every (start, end, rpeak) window of one record on both channels.
+    Returns (keep mask, DataFrame of scores with a "reason" column such as
+    "pcg_nan;pcg_energy", empty for windows that pass).
+    """
+    if len(windows) == 0:
+        return np.zeros(0, dtype=bool), pd.DataFrame(columns=["reason"])
+
+    starts = np.array([w[0] for w in windows], dtype=np.int64)
+    length = windows[0][1] - windows[0][0]
+
+    columns = {}
+    reasons = [[] for _ in windows]
+
+    for channel, signal in [("ecg", ecg), ("pcg", pcg)]:
+        scores = channel_scores(signal, starts, length, fs, thresholds)
+        for name, values in scores.items():
+            columns[f"{channel}_{name}"] = values
+
+        for check, failed in failed_checks(scores, thresholds).items():
+            for i in np.flatnonzero(failed):
+                reasons[i].append(f"{channel}_{check}")
+
+    scores_df = pd.DataFrame(columns)
+    scores_df["reason"] = [";".join(r) for r in reasons]
+
+    return scores_df["reason"].eq("").to_numpy(), scores_df
+
+
+# ============================================================
+# REJECT LIST (for log_run.py)
+# ============================================================
+def summarize_rejects(rejected, n_candidates=None):
+    """Counts for the logger: total, per check/channel, per record."""
+    rejected = rejected if rejected is not None else pd.DataFrame(columns=REJECT_COLUMNS)
+
+    reasons = rejected["reason"].str.split(";").explode() if len(rejected) else pd.Series(dtype=str)
+
+    return {
+        "candidates": n_candidates,
+        "rejected": len(rejected),
+        "kept": None if n_candidates is None else n_candidates - len(rejected),
+        "by_reason": reasons.value_counts().to_dict(),
+        "by_record": rejected["record_id"].value_counts().sort_index().to_dict() if len(rejected) else {},
+    }
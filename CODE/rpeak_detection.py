@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.signal import butter, sosfiltfilt, find_peaks
+from scipy.ndimage import maximum_filter1d
+
+import profiling
+from signal_store import SignalStore, load_mat
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+MAT_DATA_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\2-MATLAB DATA"
+CACHE_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\CACHE\rpeaks"
+
+DEFAULT_DETECTOR = "neurokit"
+
+N_WORKERS = os.cpu_count() or 1
+
+# Peaks closer than this are counted as the same beat in the benchmark
+MATCH_TOLERANCE_MS = 50
+
+
+# ============================================================
+# DETECTORS
+# ============================================================
+def detect_neurokit(ecg, fs):
+    """NeuroKit2 ecg_peaks, as used by segment_ecg_pcg."""
+    import neurokit2 as nk
+
+    try:
+        _, rpeaks = nk.ecg_peaks(np.asarray(ecg), sampling_rate=fs)
+        return np.asarray(rpeaks["ECG_R_Peaks"], dtype=np.int64)
+    except Exception:
+        return np.zeros(0, dtype=np.int64)
+
+
+def detect_pan_tompkins(
+    ecg,
+    fs,
+    lowcut=5.0,
+    highcut=15.0,
+    integration_ms=150,
+    refractory_ms=200,
+    threshold=0.3,
+    threshold_window_sec=2.0,
+    search_ms=75,
+    work_fs=500,
+):
+    """
+    Vectorised Pan–Tompkins: band-pass -> derivative -> squaring ->
+    moving-window integration, then peaks above a fraction of the local
+    (rolling) maximum. Only NumPy/SciPy, no NeuroKit2.
+
+    The QRS band sits well below 250 Hz, so detection runs on a
+    block-averaged copy at ~work_fs; each beat is then refined to the
+    largest deviation of the full-rate ECG within ±search_ms.
+    """
+    ecg = np.nan_to_num(np.asarray(ecg, dtype=np.float64))
+
+    if len(ecg) < int(fs):
+        return np.zeros(0, dtype=np.int64)
+
+    q = max(1, int(fs // work_fs))
+    n = len(ecg) // q * q
+    x = ecg[:n].reshape(-1, q).mean(axis=1)
+    rate = fs / q
+
+    sos = butter(2, [lowcut, highcut], btype="bandpass", fs=rate, output="sos")
+    filtered = sosfiltfilt(sos, x)
+
+    derivative = np.convolve(filtered, np.array([1.0, 2.0, 0.0, -2.0, -1.0]) * (rate / 8.0), mode="same")
+    squared = derivative ** 2
+
+    # Centred moving-window integration via a running sum (O(n) for any width)
+    win = max(1, int(integration_ms * rate / 1000))
+    csum = np.concatenate([[0.0], np.cumsum(squared)])
+    lo = np.clip(np.arange(len(squared)) - win // 2, 0, len(squared))
+    hi = np.clip(lo + win, 0, len(squared))
+    integrated = (csum[hi] - csum[lo]) / win
+
+    # Adaptive threshold: fraction of the rolling maximum
+    local_max = maximum_filter1d(integrated, size=max(1, int(threshold_window_sec * rate)))
+    candidates, _ = find_peaks(
+        integrated,
+        height=threshold * local_max,
+        distance=max(1, int(refractory_ms * rate / 1000)),
+    )
+
+    if len(candidates) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Refine every beat on the full-rate ECG in one vectorised pass
+    search = max(1, int(search_ms * fs / 1000))
+    centres = candidates * q + q // 2
+    padded = np.pad(ecg, search, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * search + 1)[centres]
+    deviation = np.abs(windows - np.median(windows, axis=1, keepdims=True))
+    rpeaks = centres + np.argmax(deviation, axis=1) - search
+
+    rpeaks = np.clip(rpeaks, 0, len(ecg) - 1)
+    return np.unique(rpeaks).astype(np.int64)
+
+
+DETECTORS = {
+    "neurokit": detect_neurokit,
+    "pantompkins": detect_pan_tompkins,
+}
+
+
+def detect(ecg, fs, detector=DEFAULT_DETECTOR, params=None):
+    with profiling.section("rpeaks", bytes_in=np.asarray(ecg).nbytes):
+        return DETECTORS[detector](ecg, fs, **(params or {}))
+
+
+# ============================================================
+# CACHE
+# ============================================================
+def signal_hash(ecg):
+    data = np.ascontiguousarray(ecg, dtype=np.float32)
+    return hashlib.sha1(data.tobytes()).hexdigest()[:16]
+
+
+def cache_key(record_id, ecg, fs, detector, params=None):
+    """record id + signal hash + detector name and parameters."""
+    params_json = json.dumps({"fs": int(fs), **(params or {})}, sort_keys=True)
+    params_hash = hashlib.sha1(params_json.encode("utf-8")).hexdigest()[:8]
+    return f"{record_id}-{signal_hash(ecg)}-{detector}-{params_hash}"
+
+
+class RPeakCache:
+    """One .npy per cache key; writes are atomic so workers can share it."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        return np.load(path)
+
+    def put(self, key, rpeaks):
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(rpeaks, dtype=np.int64))
+        os.replace(tmp_path, self._path(key))
+
+
+# ============================================================
+# PARALLEL DETECTION
+# ============================================================
+_stores = {}
+
+
+def _detect_record(store_path, record_id, detector, params):
+    # Each worker maps the store once and reuses it across tasks
+    if store_path not in _stores:
+        _stores[store_path] = SignalStore(store_path)
+    ecg, _, fs = _stores[store_path][record_id]
+    return record_id, detect(ecg, fs, detector, params), profiling.drain()
+
+
+def detect_all(records, detector=DEFAULT_DETECTOR, params=None, cache_dir=CACHE_DIR, n_workers=N_WORKERS, ids=None):
+    """
+    R-peaks for every record of a SignalStore (or only ids): {record_id: peaks}.
+    Cached records are read back; the rest are detected on a process pool.
+    """
+    cache = RPeakCache(cache_dir) if cache_dir else None
+    ids = list(records.ids if ids is None else ids)
+
+    rpeaks = {}
+    keys = {}
+
+    for record_id in ids:
+        ecg, _, fs = records[record_id]
+        keys[record_id] = cache_key(record_id, ecg, fs, detector, params)
+
+        cached = cache.get(keys[record_id]) if cache else None
+        if cached is not None:
+            rpeaks[record_id] = cached
+
+    missing = [record_id for record_id in ids if record_id not in rpeaks]
+    print(f"R-peaks ({detector}): {len(rpeaks)} cached, {len(missing)} to detect")
+
+    if missing:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                pool.submit(_detect_record, records.path, record_id, detector, params)
+                for record_id in missing
+            ]
+            for future in futures:
+                record_id, peaks, profile = future.result()
+                profiling.merge(profile)
+                rpeaks[record_id] = peaks
+                if cache:
+                    cache.put(keys[record_id], peaks)
+
+    return {record_id: rpeaks[record_id] for record_id in ids}
+
+
+# ============================================================
+# BENCHMARK (NeuroKit2 vs Pan–Tompkins)
+# ============================================================
+def match_peaks(reference, test, tolerance):
+    """Number of reference peaks with a test peak within ±tolerance samples, and their offsets."""
+    if len(reference) == 0 or len(test) == 0:
+        return 0, np.zeros(0)
+
+    pos = np.searchsorted(test, reference)
+    left = test[np.clip(pos - 1, 0, len(test) - 1)]
+    right = test[np.clip(pos, 0, len(test) - 1)]
+    nearest = np.where(np.abs(left - reference) <= np.abs(right - reference), left, right)
+
+    offsets = nearest - reference
+    hit = np.abs(offsets) <= tolerance
+    return int(hit.sum()), offsets[hit]
+
+
+def benchmark(mat_dir=MAT_DATA_DIR, limit=None):
+    files = sorted(f for f in os.listdir(mat_dir) if f.endswith(".mat"))[:limit]
+
+    timings = {name: 0.0 for name in DETECTORS}
+    n_ref = n_test = n_match = 0
+    offsets = []
+
+    # Import cost is paid once per (worker) process, so report it apart
+    t0 = time.perf_counter()
+    import neurokit2  # noqa: F401
+    import_seconds = time.perf_counter() - t0
+
+    for file in files:
+        ecg, _, fs = load_mat(os.path.join(mat_dir, file))
+        tolerance = int(MATCH_TOLERANCE_MS * fs / 1000)
+
+        peaks = {}
+        for name, fn in DETECTORS.items():
+            t0 = time.perf_counter()
+            peaks[name] = fn(ecg, fs)
+            timings[name] += time.perf_counter() - t0
+
+        matched, off = match_peaks(peaks["neurokit"], peaks["pantompkins"], tolerance)
+        n_ref += len(peaks["neurokit"])
+        n_test += len(peaks["pantompkins"])
+        n_match += matched
+        offsets.append(off / fs * 1000)
+
+    offsets = np.concatenate(offsets) if offsets else np.zeros(0)
+
+    print(f"Records: {len(files)}")
+    print(f"NeuroKit2 import: {import_seconds:.2f} s (per process)")
+    for name, seconds in timings.items():
+        print(f"{name:12s}: {seconds:.2f} s total, {len(files) / max(seconds, 1e-9):.1f} records/s")
+    print(f"Speed-up (neurokit / pantompkins): {timings['neurokit'] / max(timings['pantompkins'], 1e-9):.1f}×")
+
+    print(f"Agreement (±{MATCH_TOLERANCE_MS} ms, NeuroKit2 as reference):")
+    print(f"- Sensitivity: {n_match / max(n_ref, 1):.4f} ({n_match}/{n_ref})")
+    print(f"- PPV:         {n_match / max(n_test, 1):.4f} ({n_match}/{n_test})")
+    if len(offsets):
+        print(f"- Mean |offset|: {np.mean(np.abs(offsets)):.2f} ms")
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python rpeak_detection.py [benchmark | detect <store_dir> [neurokit | pantompkins]]")
+        sys.exit(1)
+
+    action = sys.argv[1].lower()
+
+    if action == "benchmark":
+        benchmark()
+    elif action == "detect":
+        store = SignalStore(sys.argv[2])
+        detector = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DETECTOR
+        t0 = time.perf_counter()
+        rpeaks = detect_all(store, detector)
+        print(f"✅ {len(rpeaks)} records in {time.perf_counter() - t0:.1f} s")
+    else:
+        print("Unknown action")
@@ -0,0 +1,508 @@
+import time
+import inspect
+from functools import lru_cache
+
+import numpy as np
+import pywt
+from scipy import fft as sp_fft
+from scipy.signal import resample_poly
+
+import profiling
+
+# ============================================================
+# WAVELET SETTINGS (LOCKED, same as 6-scalogram_generation)
+# ============================================================
+ECG_WAVELET = "cmor1.5-1.0"
+ECG_SCALES = np.arange(20, 501)
+
+PCG_WAVELET = "morl"
+PCG_SCALES = np.arange(7, 131)
+
+# Sampling rate of the segments (PhysioNet training-a)
+SIGNAL_FS = 2000
+
+# Image (height, width) every scalogram ends up as
+IMG_SIZE = (224, 224)
+
+# Same wavelet sampling as pywt.cwt (10 in older PyWavelets, a keyword since)
+_CWT_PARAMS = inspect.signature(pywt.cwt).parameters
+PRECISION = _CWT_PARAMS["precision"].default if "precision" in _CWT_PARAMS else 10
+
+# Scales processed per inverse FFT; bounds the (batch, chunk, freq) buffer
+SCALE_CHUNK = 64
+
+FFT_WORKERS = -1    # all cores for scipy.fft
+
+
+# ============================================================
+# FILTER BANK
+# ============================================================
+# pywt.cwt (method="conv") computes, per scale s:
+#   h    = integrated wavelet resampled at s (reversed)
+#   coef = -sqrt(s) * diff(convolve(x, h)), centre-trimmed to len(x)
+# which is one linear convolution of x with the kernel
+#   g = -sqrt(s) * (h[n] - h[n-1]), read from sample floor((len(h)-2)/2) + 1.
+# Each g is stored as its rFFT, circularly shifted by that offset, so a
+# whole batch needs one rFFT of the signals and one multiply + inverse
+# FFT per chunk of scales.
+
+def scaled_wavelet(int_psi, x, scale):
+    """The resampled, reversed wavelet pywt.cwt convolves with at one scale."""
+    step = x[1] - x[0]
+    j = np.arange(scale * (x[-1] - x[0]) + 1) / (scale * step)
+    j = j.astype(int)
+    if j[-1] >= int_psi.size:
+        j = np.extract(j < int_psi.size, j)
+    return int_psi[j][::-1]
+
+
+class CWTFilterBank:
+    """
+    Frequency-domain CWT filters for one (wavelet, scales, n_samples).
+
+    transform() returns |CWT| as (batch, n_scales, n_samples), the batched
+    equivalent of np.abs(pywt.cwt(signal, scales, wavelet)[0]).
+    Complex wavelets (cmor) keep real and imaginary filters as two real
+    banks, so only real FFTs are ever needed.
+    """
+
+    def __init__(self, wavelet, scales, n_samples, dtype=np.float32, precision=PRECISION):
+        self.wavelet = pywt.ContinuousWavelet(wavelet)
+        self.scales = np.asarray(scales)
+        self.n_samples = int(n_samples)
+        self.dtype = np.dtype(dtype)
+
+        int_psi, x = pywt.integrate_wavelet(self.wavelet, precision=precision)
+        if self.wavelet.complex_cwt:
+            int_psi = np.conj(int_psi)
+
+        kernels = [scaled_wavelet(int_psi, x, s) for s in self.scales]
+        if min(len(h) for h in kernels) < 2:
+            raise ValueError(f"Scale {self.scales.min()} too small for {wavelet}")
+
+        longest = max(len(h) for h in kernels)
+        # Longest kernel g (one sample more than h): a coefficient depends on
+        # at most this many neighbouring samples
+        self.kernel_len = longest + 1
+        self.n_fft = sp_fft.next_fast_len(self.n_samples + longest, real=True)
+
+        parts = [np.real] + ([np.imag] if self.wavelet.complex_cwt else [])
+        cdtype = np.result_type(self.dtype, np.complex64)
+        self.banks = [
+            np.empty((len(self.scales), self.n_fft // 2 + 1), dtype=cdtype)
+            for _ in parts
+        ]
+
+        for i, (scale, h) in enumerate(zip(self.scales, kernels)):
+            g = -np.sqrt(scale) * np.diff(np.concatenate([[0], h, [0]]))
+            shift = (len(h) - 2) // 2 + 1
+
+            for bank, part in zip(self.banks, parts):
+                padded = np.zeros(self.n_fft)
+                padded[:len(g)] = part(g)
+                bank[i] = sp_fft.rfft(np.roll(padded, -shift))
+
+    @property
+    def nbytes(self):
+        return sum(bank.nbytes for bank in self.banks)
+
+    def frequencies(self, fs):
+        return pywt.scale2frequency(self.wavelet, self.scales) * fs
+
+    def transform(self, signals, scale_chunk=SCALE_CHUNK, out=None):
+        """signals: (batch, n_samples) or (n_samples,). Returns |CWT| (batch, n_scales, n_samples)."""
+        signals = np.atleast_2d(np.asarray(signals, dtype=self.dtype))
+        if signals.shape[1] != self.n_samples:
+            raise ValueError(f"Expected {self.n_samples} samples, got {signals.shape[1]}")
+
+        if out is None:
+            out = np.empty((signals.shape[0], len(self.scales), self.n_samples), dtype=self.dtype)
+
+        spectrum = sp_fft.rfft(signals, n=self.n_fft, axis=-1, workers=FFT_WORKERS)[:, None, :]
+
+        for a in range(0, len(self.scales), scale_chunk):
+            b = min(a + scale_chunk, len(self.scales))
+
+            parts = [
+                sp_fft.irfft(spectrum * bank[None, a:b], n=self.n_fft, axis=-1, workers=FFT_WORKERS)[..., :self.n_samples]
+                for bank in self.banks
+            ]
+
+            if len(parts) == 1:
+                np.abs(parts[0], out=out[:, a:b])
+            else:
+                np.hypot(parts[0], parts[1], out=out[:, a:b])
+
+        return out
+
+
+def kernel_length(wavelet, scales, precision=PRECISION):
+    """Length of the longest kernel g of CWTFilterBank, without building the bank."""
+    _, x = pywt.integrate_wavelet(pywt.ContinuousWavelet(wavelet), precision=precision)
+    return int(np.max(scales) * (x[-1] - x[0])) + 2
+
+
+@lru_cache(maxsize=8)
+def _cached_bank(wavelet, scales, n_samples, dtype):
+    return CWTFilterBank(wavelet, scales, n_samples, dtype)
+
+
+def filter_bank(wavelet, scales, n_samples, dtype=np.float32):
+    """Filter bank built once per process and reused for every batch."""
+    return _cached_bank(wavelet, tuple(np.asarray(scales).tolist()), int(n_samples), np.dtype(dtype).name)
+
+
+def cwt_batch(signals, scales, wavelet, dtype=np.float32, scale_chunk=SCALE_CHUNK):
+    """|CWT| of equal-length signals, (batch, n_scales, n_samples)."""
+    signals = np.atleast_2d(signals)
+    with profiling.section("cwt", bytes_in=signals.nbytes) as io:
+        bank = filter_bank(wavelet, scales, signals.shape[1], dtype)
+        out = bank.transform(signals, scale_chunk)
+        io["bytes_out"] = out.nbytes
+    return out
+
+
+def generate_cwt(signal, scales, wavelet, fs, dtype=np.float32):
+    """Drop-in for the notebook's generate_cwt (fs only sets frequencies there)."""
+    return cwt_batch(signal, scales, wavelet, dtype)[0]
+
+
+# ============================================================
+# MULTIRATE CWT (only the rows the image keeps)
+# ============================================================
+# The locked settings analyse ECG at 2 kHz over 481 scales (4–100 Hz for
+# cmor1.5-1.0) and PCG over 124, then resize() averages them down to 224
+# image rows. Multirate mode computes what survives that:
+#   - decimate to the lowest rate that keeps DECIMATION_MARGIN × the
+#     highest wavelet frequency (ECG 2 kHz -> 333 Hz, PCG -> 1 kHz),
+#     with a zero-phase polyphase FIR (resample_poly)
+#   - min(image rows, len(scales)) scales, divided by the decimation factor:
+#     spacing "linear" puts them at the centres of the rows resize() would
+#     average (same picture, checked by fidelity_report), "log" spreads
+#     them evenly in log frequency (a different, log-frequency y axis).
+# |CWT| picks up a constant 1/sqrt(factor), which the per-image min-max
+# normalisation of to_image() removes. Output stays (batch, rows, n / factor);
+# to_image() brings it to the same 224×224 input the CNN expects.
+#
+# Why linear and not log spacing, and why "full" stays the training default
+# (fidelity_report on 8 segments, 3 s at 2 kHz):
+#   ECG linear: 481 -> 224 scales, ÷6, 14.5× faster, corr 0.96, PSNR 25 dB,
+#               but only 22% of RGB pixels within one jet level
+#   PCG linear: 124 scales kept, ÷2, 2.5× faster, corr 0.998
+#   log (both): corr 0.13 / 0.19 — a different picture, not an approximation
+# So log spacing would mean retraining on a new input, and even linear
+# multirate images are visibly different in colour. Multirate is opt-in
+# until the sweep's "cwt" axis (sweep.py) shows validation AUC unchanged.
+CWT_MODES = ("full", "multirate")
+DECIMATION_MARGIN = 3.0
+SCALE_SPACING = "linear"
+
+
+def decimation_factor(wavelet, scales, fs, margin=DECIMATION_MARGIN):
+    f_max = float(np.max(pywt.scale2frequency(pywt.ContinuousWavelet(wavelet), np.min(scales)) * fs))
+    return max(1, int(fs // (margin * f_max)))
+
+
+def image_scales(scales, n_rows=IMG_SIZE[0], spacing=SCALE_SPACING):
+    """The scales one image row each stands for."""
+    scales = np.asarray(scales, dtype=np.float64)
+    n = min(n_rows, len(scales))
+    if n == len(scales) and spacing == "linear":
+        return scales
+    if spacing == "linear":
+        # Centre of each area-average bin of _resize_axis over the scale index
+        centres = (np.arange(n) + 0.5) * len(scales) / n - 0.5
+        return np.interp(centres, np.arange(len(scales)), scales)
+    if spacing == "log":
+        return np.geomspace(scales.min(), scales.max(), n)
+    raise ValueError(f"Unknown scale spacing: {spacing}")
+
+
+class MultirateCWT:
+    """
+    |CWT| of equal-length signals at a decimated rate, over the scales the
+    image rows need. transform() returns (batch, n_scales, ceil(n / factor)).
+    """
+
+    def __init__(self, wavelet, scales, n_samples, fs=SIGNAL_FS, n_rows=IMG_SIZE[0], spacing=SCALE_SPACING,
+                 margin=DECIMATION_MARGIN, dtype=np.float32):
+        self.factor = decimation_factor(wavelet, scales, fs, margin)
+        self.fs = fs / self.factor
+        self.n_samples = int(n_samples)
+        self.n_out = -(-self.n_samples // self.factor)
+        # Same frequencies at the lower rate
+        self.scales = image_scales(scales, n_rows, spacing) / self.factor
+        self.bank = CWTFilterBank(wavelet, self.scales, self.n_out, dtype)
+
+    def frequencies(self):
+        return self.bank.frequencies(self.fs)
+
+    def transform(self, signals, scale_chunk=SCALE_CHUNK):
+        signals = np.atleast_2d(signals)
+        if self.factor > 1:
+            signals = resample_poly(signals, 1, self.factor, axis=-1)
+        return self.bank.transform(signals, scale_chunk)
+
+
+@lru_cache(maxsize=8)
+def _cached_multirate(wavelet, scales, n_samples, fs, n_rows, spacing, dtype):
+    return MultirateCWT(wavelet, scales, n_samples, fs, n_rows, spacing, dtype=dtype)
+
+
+def cwt_multirate(signals, scales, wavelet, fs=SIGNAL_FS, n_rows=IMG_SIZE[0], spacing=SCALE_SPACING, dtype=np.float32):
+    """Multirate counterpart of cwt_batch (see above); the engine is built once per process."""
+    signals = np.atleast_2d(signals)
+    with profiling.section("cwt", bytes_in=signals.nbytes) as io:
+        engine = _cached_multirate(
+            wavelet, tuple(np.asarray(scales).tolist()), signals.shape[1], fs, n_rows, spacing, np.dtype(dtype).name
+        )
+        out = engine.transform(signals)
+        io["bytes_out"] = out.nbytes
+    return out
+
+
+def scalogram_cwt(ecg, pcg, mode="full", fs=SIGNAL_FS, n_rows=IMG_SIZE[0]):
+    """|CWT| of ECG and PCG batches with the locked wavelets, full-rate or multirate."""
+    if mode == "full":
+        return cwt_batch(ecg, ECG_SCALES, ECG_WAVELET), cwt_batch(pcg, PCG_SCALES, PCG_WAVELET)
+    if mode == "multirate":
+        return (
+            cwt_multirate(ecg, ECG_SCALES, ECG_WAVELET, fs, n_rows),
+            cwt_multirate(pcg, PCG_SCALES, PCG_WAVELET, fs, n_rows),
+        )
+    raise ValueError(f"Unknown CWT mode: {mode}")
+
+
+# ============================================================
+# IMAGE OUTPUT (no matplotlib)
+# ============================================================
+# Same picture as imshow(cwt, aspect="auto", cmap="jet", origin="lower")
+# saved at 224×224: resample, min-max scale per image, flip so the
+# smallest scale is the bottom row, then colour through a jet LUT.
+
+# matplotlib's jet segment data: (x, value) breakpoints per channel
+_JET_POINTS = {
+    "red":   [(0.0, 0.0), (0.35, 0.0), (0.66, 1.0), (0.89, 1.0), (1.0, 0.5)],
+    "green": [(0.0, 0.0), (0.125, 0.0), (0.375, 1.0), (0.64, 1.0), (0.91, 0.0), (1.0, 0.0)],
+    "blue":  [(0.0, 0.5), (0.11, 1.0), (0.34, 1.0), (0.65, 0.0), (1.0, 0.0)],
+}
+
+
+def jet_lut(n=256):
+    """(n, 3) uint8 jet colormap, sampled like matplotlib's N=256 table."""
+    x = np.linspace(0, 1, n)
+    lut = np.stack([
+        np.interp(x, *zip(*_JET_POINTS[channel])) for channel in ("red", "green", "blue")
+    ], axis=1)
+    return (lut * 255).astype(np.uint8)
+
+
+JET_LUT = jet_lut()
+
+
+def _resize_axis(x, size, axis):
+    """Area average when shrinking, linear interpolation when growing."""
+    n = x.shape[axis]
+    if n == size:
+        return x
+
+    x = np.moveaxis(x, axis, -1)
+
+    if size < n:
+        edges = np.linspace(0, n, size + 1)
+        lo = np.floor(edges).astype(np.int64)
+        frac = (edges - lo).astype(x.dtype)
+
+        csum = np.concatenate([np.zeros(x.shape[:-1] + (1,), dtype=x.dtype), np.cumsum(x, axis=-1)], axis=-1)
+        at_edges = csum[..., lo] + frac * x[..., np.minimum(lo, n - 1)]
+        out = np.diff(at_edges, axis=-1) * (size / n)
+    else:
+        pos = np.clip((np.arange(size) + 0.5) * n / size - 0.5, 0, n - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, n - 1)
+        w = (pos - lo).astype(x.dtype)
+        out = x[..., lo] * (1 - w) + x[..., hi] * w
+
+    return np.moveaxis(out.astype(x.dtype, copy=False), -1, axis)
+
+
+def resize(cwt, size=IMG_SIZE):
+    """(..., n_scales, n_samples) -> (..., height, width); time axis first (the big one)."""
+    height, width = size
+    return _resize_axis(_resize_axis(cwt, width, -1), height, -2)
+
+
+def to_image(cwt, size=IMG_SIZE, mode="rgb", dtype=np.uint8):
+    """
+    |CWT| batch (batch, n_scales, n_samples) -> (batch, channels, H, W).
+
+    mode="rgb":  jet colours, 3 channels (what the PNGs held)
+    mode="gray": the normalised magnitude, 1 channel
+    dtype uint8 keeps 0-255, float16 keeps 0-1.
+    """
+    cwt = np.asarray(cwt)
+    if cwt.ndim == 2:
+        cwt = cwt[None]
+
+    img = resize(cwt, size)[:, ::-1, :]   # origin="lower"
+
+    lo = img.min(axis=(1, 2), keepdims=True)
+    hi = img.max(axis=(1, 2), keepdims=True)
+    norm = (img - lo) / np.where(hi > lo, hi - lo, 1)
+
+    if mode == "rgb":
+        levels = np.clip((norm * len(JET_LUT)).astype(np.int64), 0, len(JET_LUT) - 1)
+        out = np.moveaxis(JET_LUT[levels], -1, 1)
+        if np.dtype(dtype) == np.uint8:
+            return np.ascontiguousarray(out)
+        return (out / 255).astype(dtype)
+
+    if mode == "gray":
+        norm = norm[:, None]
+        if np.dtype(dtype) == np.uint8:
+            return np.round(norm * 255).astype(np.uint8)
+        return norm.astype(dtype)
+
+    raise ValueError(f"Unknown image mode: {mode}")
+
+
+# ============================================================
+# EQUIVALENCE CHECK / BENCHMARK (vs pywt.cwt)
+# ============================================================
+def check_equivalence(n_signals=8, fs=2000, seconds=3.0, seed=0, dtype=np.float32):
+    """
+    Compares the engine with np.abs(pywt.cwt(...)) on random signals for
+    both locked wavelets; prints max relative error and the speed-up.
+    Returns the max relative error per wavelet.
+    """
+    rng = np.random.default_rng(seed)
+    signals = rng.standard_normal((n_signals, int(seconds * fs)))
+
+    errors = {}
+
+    for name, wavelet, scales in [("ECG", ECG_WAVELET, ECG_SCALES), ("PCG", PCG_WAVELET, PCG_SCALES)]:
+        t0 = time.perf_counter()
+        reference = np.stack([
+            np.abs(pywt.cwt(s, scales, wavelet, sampling_period=1.0 / fs)[0]) for s in signals
+        ])
+        t_pywt = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        bank = filter_bank(wavelet, scales, signals.shape[1], dtype)
+        t_bank = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        result = bank.transform(signals)
+        t_engine = time.perf_counter() - t0
+
+        errors[name] = float(np.max(np.abs(result - reference)) / np.max(reference))
+
+        print(f"{name} ({wavelet}, {len(scales)} scales, {n_signals} × {signals.shape[1]} samples)")
+        print(f"- Max relative error: {errors[name]:.2e}")
+        print(f"- pywt.cwt: {t_pywt:.2f} s | engine: {t_engine:.2f} s (+ {t_bank:.2f} s filter bank, {bank.nbytes / 1e6:.0f} MB)")
+        print(f"- Speed-up: {t_pywt / max(t_engine, 1e-9):.1f}×")
+
+    return errors
+
+
+# ============================================================
+# FIDELITY REPORT (multirate vs generate_cwt images)
+# ============================================================
+def fidelity_report(ecg, pcg, fs=SIGNAL_FS, spacings=("linear", "log"), size=IMG_SIZE, repeats=3):
+    """
+    Multirate images against the full-rate ones (generate_cwt + to_image)
+    for the same segments. Compared on the normalised magnitude (0-1,
+    before the colour map): mean / max abs error, PSNR, mean per-image
+    correlation, share of RGB pixels within one jet level; plus CWT time.
+    Returns one dict per (modality, spacing).
+    """
+    def best_time(fn):
+        fn()    # filter banks built outside the timing
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            out = fn()
+            times.append(time.perf_counter() - t0)
+        return min(times), out
+
+    rows = []
+    for name, signals, wavelet, scales in [("ECG", ecg, ECG_WAVELET, ECG_SCALES), ("PCG", pcg, PCG_WAVELET, PCG_SCALES)]:
+        signals = np.atleast_2d(np.asarray(signals, dtype=np.float32))
+        t_full, full = best_time(lambda: cwt_batch(signals, scales, wavelet))
+        ref = to_image(full, size, "gray", np.float32)[:, 0]
+        ref_rgb = to_image(full, size).astype(np.int16)
+
+        for spacing in spacings:
+            engine = _cached_multirate(wavelet, tuple(np.asarray(scales).tolist()), signals.shape[1], fs, size[0], spacing, "float32")
+            t_multi, multi = best_time(lambda: engine.transform(signals))
+            img = to_image(multi, size, "gray", np.float32)[:, 0]
+            rgb = to_image(multi, size).astype(np.int16)
+
+            err = np.abs(img - ref)
+            a = (img - img.mean(axis=(1, 2), keepdims=True)).reshape(len(img), -1)
+            b = (ref - ref.mean(axis=(1, 2), keepdims=True)).reshape(len(ref), -1)
+            corr = (a * b).sum(1) / np.sqrt((a ** 2).sum(1) * (b ** 2).sum(1) + 1e-12)
+
+            rows.append({
+                "modality": name,
+                "spacing": spacing,
+                "factor": engine.factor,
+                "scales": f"{len(scales)} -> {len(engine.scales)}",
+                "mae": float(err.mean()),
+                "max_err": float(err.max()),
+                "psnr_db": float(10 * np.log10(1 / max(float((err ** 2).mean()), 1e-12))),
+                "corr": float(corr.mean()),
+                # jet levels are 256 steps over 0-1: a level is ~4/255 per channel at most
+                "rgb_within_1_level": float((np.abs(rgb - ref_rgb).max(axis=1) <= 4).mean()),
+                "full_ms": 1000 * t_full / len(signals),
+                "multirate_ms": 1000 * t_multi / len(signals),
+                "speedup": t_full / max(t_multi, 1e-9),
+            })
+    return rows
+
+
+def print_fidelity(rows):
+    print(f"{'':4s} {'spacing':8s} {'÷':>3s} {'scales':>11s} {'MAE':>7s} {'max':>6s} {'PSNR':>6s} {'corr':>7s} "
+          f"{'rgb±1':>6s} {'full ms':>8s} {'multi ms':>9s} {'speed-up':>9s}")
+    for r in rows:
+        print(
+            f"{r['modality']:4s} {r['spacing']:8s} {r['factor']:3d} {r['scales']:>11s} {r['mae']:7.4f} {r['max_err']:6.3f} "
+            f"{r['psnr_db']:6.1f} {r['corr']:7.4f} {r['rgb_within_1_level']:6.3f} {r['full_ms']:8.1f} "
+            f"{r['multirate_ms']:9.1f} {r['speedup']:8.1f}×"
+        )
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "fidelity":
+        # python scalogram.py fidelity [signal_store] [n_segments]
+        n = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+        if len(sys.argv) > 2:
+            from signal_store import SignalStore
+
+            store = SignalStore(sys.argv[2])
+            ids = store.ids[:n]
+            ecg, pcg = np.stack([store.ecg(k) for k in ids]), np.stack([store.pcg(k) for k in ids])
+            fs = store.fs(ids[0])
+        else:
+            rng = np.random.default_rng(0)
+            ecg, pcg = rng.standard_normal((2, n, int(3 * SIGNAL_FS)))
+            fs = SIGNAL_FS
+
+        print(f"✅ Multirate fidelity vs full-rate images ({len(ecg)} segments × {ecg.shape[1]} samples @ {fs} Hz)")
+        print_fidelity(fidelity_report(ecg, pcg, fs))
+        sys.exit(0)
+
+    n_signals = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    errors = check_equivalence(n_signals)
+
+    tolerance = 1e-4
+    if all(err < tolerance for err in errors.values()):
+        print(f"✅ Engine matches pywt.cwt (max relative error < {tolerance:g})")
+    else:
+        print("❌ Engine does not match pywt.cwt")
+        sys.exit(1)
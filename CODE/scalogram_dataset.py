@@ -0,0 +1,362 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
+from PIL import Image
+
+import profiling
+from scalogram import IMG_SIZE
+from scalogram_store import ScalogramStore, ECG_FILE, PCG_FILE, INDEX_FILE, scalogram_images
+
+# Same normalisation as the notebook transform: Normalize(mean=[0.5]*3, std=[0.5]*3)
+NORM_MEAN = 0.5
+NORM_STD = 0.5
+
+CACHE_META = "cache.json"
+DECODE_WORKERS = os.cpu_count() or 1
+
+
+class ECGPCGScalogramDataset(Dataset):
+    """
+    ECG/PCG scalogram pairs with labels mapped {-1,+1} → {0,1}.
+
+    Either PNG folders (ecg_dir, pcg_dir, as in 7-ablation_model) or a
+    scalogram store (store=path, see scalogram_store.py). The store is
+    already 224×224, so items come back normalised without PIL decoding
+    or resizing; transform, if given, is then applied to the tensors.
+    label_csv selects (and labels) a subset; without it a store yields
+    every item with the labels in its index.
+    modalities limits what is read: a modality left out comes back as an
+    empty tensor (see ablation.py).
+    """
+
+    modalities = ("ecg", "pcg")
+
+    def __init__(self, ecg_dir=None, pcg_dir=None, label_csv=None, transform=None, store=None):
+        self.ecg_dir = ecg_dir
+        self.pcg_dir = pcg_dir
+        self.transform = transform
+        self.store_path = store
+        self._store = None
+
+        if label_csv is not None:
+            self.df = pd.read_csv(label_csv)
+        elif store is not None:
+            self.df = ScalogramStore(store).index[["id", "label"]]
+        else:
+            raise ValueError("label_csv is required for PNG folders")
+
+        # Auto-detect filename column
+        self.file_col = [c for c in self.df.columns if c != "label"][0]
+
+        self.names = self.df[self.file_col].astype(str).tolist()
+        self.labels = self.df["label"].to_numpy(dtype=np.float32)
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def store(self):
+        # Opened on first use, so each DataLoader worker maps the files itself
+        if self._store is None:
+            self._store = ScalogramStore(self.store_path)
+        return self._store
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_store"] = None
+        return state
+
+    def _to_tensor(self, image):
+        image = np.array(image)   # copy out of the read-only memmap
+        x = torch.from_numpy(image).float()
+        if image.dtype == np.uint8:
+            x = x.div_(255)
+        x = (x - NORM_MEAN) / NORM_STD
+
+        # Single-channel stores feed the same 3-channel models
+        if x.shape[0] == 1:
+            x = x.expand(3, -1, -1)
+        return x
+
+    def __getitem__(self, idx):
+        fname = self.names[idx]
+        label = (self.labels[idx] + 1) / 2   # {-1,+1} → {0,1}
+
+        images = []
+        for modality, image_dir in [("ecg", self.ecg_dir), ("pcg", self.pcg_dir)]:
+            if modality not in self.modalities:
+                images.append(torch.empty(0))
+                continue
+
+            if self.store_path is not None:
+                image = self._to_tensor(getattr(self.store, modality)[self.store.row(fname)])
+            else:
+                path = os.path.join(image_dir, fname + ".png")
+                with profiling.section("png_decode", bytes_in=os.path.getsize(path)):
+                    image = Image.open(path).convert("RGB")
+
+            if self.transform:
+                image = self.transform(image)
+            images.append(image)
+
+        ecg, pcg = images
+        return ecg, pcg, torch.tensor(label, dtype=torch.float32)
+
+
+# ============================================================
+# PRE-DECODED CACHE
+# ============================================================
+def _decode_png(path, size=IMG_SIZE):
+    """PNG -> (3, H, W) uint8, same pixels as Resize((224, 224)) + ToTensor."""
+    with profiling.section("png_decode", bytes_in=os.path.getsize(path)):
+        image = Image.open(path).convert("RGB")
+        if image.size != (size[1], size[0]):
+            image = image.resize((size[1], size[0]), Image.BILINEAR)
+        return np.asarray(image).transpose(2, 0, 1)
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def source_identity(source):
+    """
+    What a cache was decoded from: the store (path, meta.json, size and
+    mtime of its files) or the PNG folders (paths, file count, total size,
+    newest mtime of the listed PNGs). A regenerated source with the same
+    ids no longer matches.
+    """
+    if source.store_path is not None:
+        path = os.path.abspath(source.store_path)
+        return {
+            "store": path,
+            "info": source.store.info,
+            "files": {name: _stamp(os.path.join(path, name)) for name in (ECG_FILE, PCG_FILE, INDEX_FILE)},
+        }
+
+    stamps = np.array([
+        _stamp(os.path.join(d, name + ".png")) for d in (source.ecg_dir, source.pcg_dir) for name in source.names
+    ], dtype=np.int64).reshape(-1, 2)
+    return {
+        "ecg_dir": os.path.abspath(source.ecg_dir),
+        "pcg_dir": os.path.abspath(source.pcg_dir),
+        "png": [len(stamps), int(stamps[:, 0].sum()), int(stamps[:, 1].max(initial=0))],
+    }
+
+
+def _normalise(x):
+    """uint8 pixels or 0-1 floats -> the notebook's Normalize(0.5, 0.5)."""
+    scale = 255 if x.dtype == torch.uint8 else 1
+    return (x.float() / scale - NORM_MEAN) / NORM_STD
+
+
+class CachedScalogramDataset(Dataset):
+    """
+    ECGPCGScalogramDataset decoded once up front.
+
+    All images of the split go into one (n, C, H, W) tensor per modality:
+    uint8 (raw pixels, normalised per item) or float16 (already
+    normalised). In memory the tensors are moved to shared memory, so
+    DataLoader workers read them without copies; with cache_dir they are
+    also written as .npy files and later runs memory-map them instead of
+    decoding again, as long as the source is unchanged (source_identity).
+    __getitem__ is then a pure row lookup; given a list
+    of indices it gathers the whole batch at once (see batch_loader).
+
+    Takes the same sources as ECGPCGScalogramDataset (PNG folders or a
+    scalogram store); no transform, items are 224×224 and normalised.
+    modalities works as in ECGPCGScalogramDataset.
+    """
+
+    modalities = ("ecg", "pcg")
+
+    def __init__(self, ecg_dir=None, pcg_dir=None, label_csv=None, store=None, cache_dir=None, dtype="uint8"):
+        source = ECGPCGScalogramDataset(ecg_dir, pcg_dir, label_csv, store=store)
+        self.names = source.names
+        self.labels = torch.from_numpy((source.labels + 1) / 2)   # {-1,+1} → {0,1}
+        self.dtype = np.dtype(dtype)
+        self.cache_dir = cache_dir
+        self.source = source_identity(source) if cache_dir is not None else None
+
+        if cache_dir is not None and self._cache_matches(cache_dir):
+            self.ecg, self.pcg = self._load(cache_dir)
+        else:
+            self.ecg, self.pcg = self._decode(source)
+            if cache_dir is not None:
+                self._save(cache_dir)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _image(self, images, idx):
+        x = images[idx]
+        if isinstance(x, np.ndarray):
+            x = torch.from_numpy(np.array(x))
+        x = _normalise(x) if self.dtype == np.uint8 else x.float()
+
+        # Single-channel stores feed the same 3-channel models
+        if x.shape[-3] == 1:
+            x = x.expand(*x.shape[:-3], 3, -1, -1)
+        return x
+
+    def __getitem__(self, idx):
+        ecg = self._image(self.ecg, idx) if "ecg" in self.modalities else torch.empty(0)
+        pcg = self._image(self.pcg, idx) if "pcg" in self.modalities else torch.empty(0)
+        return ecg, pcg, self.labels[idx]
+
+    # ---------------- decoding ----------------
+    def _decode(self, source):
+        t0 = time.perf_counter()
+
+        if source.store_path is not None:
+            store = source.store
+            rows = np.array([store.row(name) for name in self.names], dtype=np.int64)
+            ecg, pcg = np.asarray(store.ecg[rows]), np.asarray(store.pcg[rows])
+            if store.dtype != np.uint8 and self.dtype == np.uint8:
+                ecg = np.rint(ecg.astype(np.float32) * 255).astype(np.uint8)
+                pcg = np.rint(pcg.astype(np.float32) * 255).astype(np.uint8)
+        else:
+            paths = [os.path.join(d, name + ".png") for d in (source.ecg_dir, source.pcg_dir) for name in self.names]
+            with ThreadPoolExecutor(max_workers=DECODE_WORKERS) as pool:
+                images = np.stack(list(pool.map(_decode_png, paths)))
+            ecg, pcg = images[:len(self.names)], images[len(self.names):]
+
+        ecg, pcg = torch.from_numpy(np.ascontiguousarray(ecg)), torch.from_numpy(np.ascontiguousarray(pcg))
+
+        if self.dtype != np.uint8:
+            ecg, pcg = _normalise(ecg).half(), _normalise(pcg).half()
+
+        print(f"Decoded {len(self.names)} pairs in {time.perf_counter() - t0:.1f} s "
+              f"({(ecg.nbytes + pcg.nbytes) / 2**20:.0f} MiB cached)")
+        return ecg.share_memory_(), pcg.share_memory_()
+
+    # ---------------- on-disk cache ----------------
+    def _cache_meta(self):
+        return {"names": self.names, "dtype": self.dtype.name, "source": self.source}
+
+    def _cache_matches(self, cache_dir):
+        path = os.path.join(cache_dir, CACHE_META)
+        if not os.path.exists(path):
+            return False
+        with open(path, encoding="utf-8") as f:
+            return json.load(f) == self._cache_meta()
+
+    def _save(self, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, images in [("ecg", self.ecg), ("pcg", self.pcg)]:
+            tmp_path = os.path.join(cache_dir, name + ".tmp.npy")
+            np.save(tmp_path, images.numpy())
+            os.replace(tmp_path, os.path.join(cache_dir, name + ".npy"))
+
+        # Written last: marks the cache complete
+        tmp_path = os.path.join(cache_dir, CACHE_META + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._cache_meta(), f)
+        os.replace(tmp_path, os.path.join(cache_dir, CACHE_META))
+
+    def _load(self, cache_dir):
+        # Read-only memory maps: shared by every worker through the page cache
+        return tuple(np.load(os.path.join(cache_dir, name + ".npy"), mmap_mode="r") for name in ("ecg", "pcg"))
+
+
+# ============================================================
+# ON-THE-FLY SCALOGRAMS (augmented training batches)
+# ============================================================
+class ScalogramTransform:
+    """
+    AugmentCollate transform: an augmented (batch, samples) ECG/PCG pair
+    -> normalised (batch, 3, 224, 224) float32 scalograms, the same pixels
+    a scalogram store read through CachedScalogramDataset gives.
+    """
+
+    def __init__(self, mode="rgb", cwt="full"):
+        self.mode = mode
+        self.cwt = cwt
+
+    @staticmethod
+    def _normalise(images):
+        x = (images.astype(np.float32) / 255 - NORM_MEAN) / NORM_STD
+        # Single-channel scalograms feed the same 3-channel models
+        return np.repeat(x, 3, axis=1) if x.shape[1] == 1 else x
+
+    def __call__(self, ecg, pcg):
+        with profiling.section("scalogram_transform"):
+            ecg_img, pcg_img = scalogram_images(ecg, pcg, self.mode, np.uint8, cwt=self.cwt)
+        return self._normalise(ecg_img), self._normalise(pcg_img)
+
+
+def batch_loader(dataset, batch_size=16, shuffle=False, num_workers=0, **kwargs):
+    """
+    DataLoader handing whole index lists to CachedScalogramDataset, so a
+    batch is one gather instead of batch_size lookups + collation. With
+    data already in RAM, num_workers=0 is usually fastest.
+    """
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset, sampler=BatchSampler(sampler, batch_size, drop_last=False),
+        batch_size=None, num_workers=num_workers, **kwargs
+    )
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+def benchmark(loader, epochs=1, max_batches=None):
+    """samples/s of full passes over a DataLoader."""
+    n = 0
+    t0 = time.perf_counter()
+    for _ in range(epochs):
+        for i, (ecg, pcg, _) in enumerate(loader):
+            n += len(ecg)
+            if max_batches is not None and i + 1 >= max_batches:
+                break
+    seconds = time.perf_counter() - t0
+
+    return {"samples": n, "seconds": seconds, "samples_per_s": n / max(seconds, 1e-9)}
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+    from torchvision import transforms
+
+    if len(sys.argv) < 4:
+        print("Usage: python scalogram_dataset.py <ecg_dir> <pcg_dir> <label_csv> [cache_dir] [workers] [epochs]")
+        sys.exit(1)
+
+    ecg_dir, pcg_dir, label_csv = sys.argv[1:4]
+    cache_dir = sys.argv[4] if len(sys.argv) > 4 else None
+    workers = int(sys.argv[5]) if len(sys.argv) > 5 else 2
+    epochs = int(sys.argv[6]) if len(sys.argv) > 6 else 1
+
+    # Transform of the 7-ablation_model notebook
+    transform = transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.5]*3, std=[0.5]*3)
+    ])
+
+    # Loader settings of train_loader in 7-ablation_model
+    png_dataset = ECGPCGScalogramDataset(ecg_dir, pcg_dir, label_csv, transform)
+    png = benchmark(DataLoader(png_dataset, batch_size=16, shuffle=True, num_workers=workers), epochs)
+
+    t0 = time.perf_counter()
+    cached_dataset = CachedScalogramDataset(ecg_dir, pcg_dir, label_csv, cache_dir=cache_dir)
+    build_seconds = time.perf_counter() - t0
+    per_item = benchmark(DataLoader(cached_dataset, batch_size=16, shuffle=True, num_workers=workers), epochs)
+    batched = benchmark(batch_loader(cached_dataset, batch_size=16, shuffle=True), epochs)
+
+    print("\n✅ Data loading benchmark")
+    print(f"- PNG decode:             {png['samples_per_s']:.0f} samples/s")
+    for name, r in [("Pre-decoded (per item)", per_item), ("Pre-decoded (batched)", batched)]:
+        print(f"- {name}: {r['samples_per_s']:.0f} samples/s ({r['samples_per_s'] / max(png['samples_per_s'], 1e-9):.1f}×)")
+    print(f"- Cache built / loaded in {build_seconds:.1f} s")
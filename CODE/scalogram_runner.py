@@ -0,0 +1,290 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import profiling
+import scalogram
+from signal_store import SignalStore
+from scalogram_store import INDEX_FILE, allocate_scalogram_store, scalogram_images, ScalogramStore
+from scalogram import ECG_WAVELET, ECG_SCALES, PCG_WAVELET, PCG_SCALES, IMG_SIZE, scalogram_cwt
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+DATASET_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET"
+
+SIGNAL_STORE_DIR = os.path.join(DATASET_DIR, "SIGNAL_STORE")
+SCALOGRAM_DIR = os.path.join(DATASET_DIR, "6-SCALOGRAMS")
+
+MANIFEST_NAME = "scalogram_manifest.json"
+
+N_WORKERS = os.cpu_count() or 1
+
+CONFIG = {
+    "output": "store",      # "store" (tensor store, see scalogram_store.py) or "png"
+    "mode": "rgb",          # store only: "rgb" or "gray"
+    "dtype": "uint8",       # store only: "uint8" or "float16"
+    "cwt": "full",          # "full" or "multirate" (decimated, one scale per image row)
+    "shard_size": 32,       # segments per task
+    "workers": N_WORKERS,
+    # split -> signal store it reads (original segments; training
+    # augments on the fly, see augmentation.augmented_loader)
+    "splits": {
+        "train": os.path.join(SIGNAL_STORE_DIR, "train_segments"),
+        "test": os.path.join(SIGNAL_STORE_DIR, "test_segments"),
+    },
+}
+
+DPI = 100
+
+
+def load_config(path=None):
+    """CONFIG, updated with the keys of a JSON file if one is given."""
+    config = dict(CONFIG)
+    if path is not None:
+        with open(path, encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+
+def output_dir(config, split):
+    # "out_root" (optional) places the outputs elsewhere, e.g. a stage cache dir
+    root = config.get("out_root", SCALOGRAM_DIR)
+    if config["output"] == "store":
+        return os.path.join(root, "STORE", split)
+    return os.path.join(root, split)
+
+
+# ============================================================
+# MANIFEST
+# ============================================================
+# {"settings": {...}, "done": [ids]} next to the output. Written
+# atomically after every finished shard, so an interrupted run resumes
+# from it; a change of settings starts the split over.
+
+def manifest_settings(config, source):
+    return {
+        "source": source,
+        "output": config["output"],
+        "mode": config["mode"],
+        "dtype": config["dtype"],
+        "cwt": config.get("cwt", "full"),
+        "ecg": [ECG_WAVELET, int(ECG_SCALES[0]), int(ECG_SCALES[-1])],
+        "pcg": [PCG_WAVELET, int(PCG_SCALES[0]), int(PCG_SCALES[-1])],
+        "size": list(IMG_SIZE),
+    }
+
+
+def load_manifest(path, settings):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("settings") == settings:
+            return manifest
+    return {"settings": settings, "done": []}
+
+
+def save_manifest(manifest, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+# ============================================================
+# WORKER
+# ============================================================
+# Every worker process keeps its own pyplot state, CWT filter banks and
+# memory maps; tasks only carry paths and ids.
+_signals = {}
+_outputs = {}
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+    # One FFT thread per process; the pool already uses every core
+    scalogram.FFT_WORKERS = 1
+
+
+def _save_png(cwt, out_path):
+    import matplotlib.pyplot as plt
+
+    with profiling.section("render_png") as io:
+        plt.figure(figsize=(IMG_SIZE[0]/DPI, IMG_SIZE[1]/DPI), dpi=DPI)
+        plt.imshow(cwt, aspect="auto", cmap="jet", origin="lower")
+        plt.axis("off")
+        plt.savefig(out_path, bbox_inches="tight", pad_inches=0)
+        plt.close()
+        io["bytes_out"] = os.path.getsize(out_path)
+
+
+def _run_shard(source, out_dir, ids, output, mode, dtype, cwt):
+    t0 = time.perf_counter()
+
+    if source not in _signals:
+        _signals[source] = SignalStore(source)
+    signals = _signals[source]
+
+    ecg = np.stack([signals.ecg(k) for k in ids])
+    pcg = np.stack([signals.pcg(k) for k in ids])
+
+    if output == "store":
+        if out_dir not in _outputs:
+            _outputs[out_dir] = ScalogramStore(out_dir, mode="r+")
+        store = _outputs[out_dir]
+
+        ecg_img, pcg_img = scalogram_images(ecg, pcg, mode, dtype, cwt=cwt)
+        store.write(ids, ecg_img, pcg_img)
+        store.flush()
+    else:
+        ecg_cwt, pcg_cwt = scalogram_cwt(ecg, pcg, cwt, n_rows=IMG_SIZE[0])
+        for j, item_id in enumerate(ids):
+            _save_png(ecg_cwt[j], os.path.join(out_dir, "ecg", item_id + ".png"))
+            _save_png(pcg_cwt[j], os.path.join(out_dir, "pcg", item_id + ".png"))
+
+    return ids, time.perf_counter() - t0, profiling.drain()
+
+
+# ============================================================
+# RUNNER
+# ============================================================
+def prepare_output(config, signals, out_dir):
+    """
+    Output with room for every item of signals: a store that already
+    holds some of them grows (see allocate_scalogram_store).
+    """
+    if config["output"] == "store":
+        meta_cols = [c for c in ("label", "base_id", "record_id") if c in signals.index.columns]
+        allocate_scalogram_store(
+            out_dir, signals.ids, config["mode"], config["dtype"],
+            **{c: signals.index[c].tolist() for c in meta_cols},
+        )
+    else:
+        os.makedirs(os.path.join(out_dir, "ecg"), exist_ok=True)
+        os.makedirs(os.path.join(out_dir, "pcg"), exist_ok=True)
+
+
+def kept_rows(out_dir, ids):
+    """True if the store in out_dir holds only ids (so prepare_output keeps its rows)."""
+    index_path = os.path.join(out_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return False
+    return set(pd.read_csv(index_path, dtype={"id": str})["id"]) <= set(ids)
+
+
+def run_split(config, split):
+    source = config["splits"][split]
+    out_dir = output_dir(config, split)
+    signals = SignalStore(source)
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    os.makedirs(out_dir, exist_ok=True)
+
+    settings = manifest_settings(config, source)
+    manifest = load_manifest(manifest_path, settings)
+
+    # Items appended to the source since the last run are simply pending;
+    # the outputs of items that left it are deleted
+    source_ids = set(signals.ids)
+    removed = [k for k in manifest["done"] if k not in source_ids]
+    rebuilt = False
+    if config["output"] == "store" and manifest["done"] and not kept_rows(out_dir, signals.ids):
+        # The store is allocated afresh below, without the removed rows
+        manifest["done"] = []
+        rebuilt = True
+    elif config["output"] == "png":
+        for k in removed:
+            for modality in ("ecg", "pcg"):
+                path = os.path.join(out_dir, modality, k + ".png")
+                if os.path.exists(path):
+                    os.remove(path)
+    prepare_output(config, signals, out_dir)
+
+    manifest["done"] = [k for k in manifest["done"] if k in source_ids]
+    done = set(manifest["done"])
+    pending = [k for k in signals.ids if k not in done]
+    shards = [pending[i:i + config["shard_size"]] for i in range(0, len(pending), config["shard_size"])]
+
+    print(f"[{split}] {len(signals)} items: {len(done)} done, {len(pending)} pending in {len(shards)} shards")
+
+    t0 = time.perf_counter()
+    processed = 0
+    busy_seconds = 0.0
+
+    with ProcessPoolExecutor(max_workers=config["workers"], initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(
+                _run_shard, source, out_dir, shard,
+                config["output"], config["mode"], config["dtype"], config.get("cwt", "full"),
+            )
+            for shard in shards
+        ]
+
+        for future in as_completed(futures):
+            ids, seconds, profile = future.result()
+            profiling.merge(profile)
+
+            manifest["done"].extend(ids)
+            save_manifest(manifest, manifest_path)
+
+            processed += len(ids)
+            busy_seconds += seconds
+            elapsed = time.perf_counter() - t0
+            rate = processed / max(elapsed, 1e-9)
+            eta = (len(pending) - processed) / max(rate, 1e-9)
+
+            print(f"[{split}] {len(manifest['done'])}/{len(signals)} | {rate:.1f} items/s | ETA {eta:.0f} s")
+
+    elapsed = time.perf_counter() - t0
+    report = {
+        "split": split,
+        "source": source,
+        "manifest": manifest_path,
+        "items": len(signals),
+        "resumed": len(done),
+        "removed": len(removed),
+        "rebuilt": rebuilt,
+        "done": len(manifest["done"]),
+        "processed": processed,
+        "seconds": elapsed,
+        "items_per_s": processed / max(elapsed, 1e-9),
+        "ms_per_item_worker": 1000 * busy_seconds / max(processed, 1),
+    }
+    metrics.emit(
+        "scalogram", "summary",
+        output=config["output"], mode=config["mode"], dtype=config["dtype"], cwt=config.get("cwt", "full"),
+        workers=config["workers"], ecg=settings["ecg"], pcg=settings["pcg"], size=settings["size"],
+        **report,
+    )
+    profiling.print_summary(f"[{split}] profile (all workers)")
+    profiling.emit_profile("scalogram", split=split)
+    profiling.reset()
+    return report
+
+
+def run(config):
+    reports = [run_split(config, split) for split in config["splits"]]
+
+    print("\n✅ Scalogram generation complete")
+    for r in reports:
+        print(
+            f"- {r['split'].upper()}: {r['processed']} new / {r['items']} items in {r['seconds']:.1f} s "
+            f"({r['items_per_s']:.1f} items/s, {r['ms_per_item_worker']:.0f} ms per item per worker)"
+        )
+    return reports
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+
+    run(load_config(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from signal_store import SignalStore
+from scalogram import IMG_SIZE, scalogram_cwt, to_image
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+DATASET_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET"
+
+SIGNAL_STORE_DIR = os.path.join(DATASET_DIR, "SIGNAL_STORE")
+SCALOGRAM_STORE_DIR = os.path.join(DATASET_DIR, "6-SCALOGRAMS", "STORE")
+
+ECG_FILE = "ecg.bin"
+PCG_FILE = "pcg.bin"
+INDEX_FILE = "index.csv"
+META_FILE = "meta.json"
+
+BATCH_SIZE = 16
+
+
+# ============================================================
+# STORE LAYOUT
+# ============================================================
+# <store>/ecg.bin    (n, channels, H, W) images, back to back
+# <store>/pcg.bin    same shape, same row order as ECG
+# <store>/index.csv  id, row + metadata (label, base_id, ...)
+# <store>/meta.json  channels, height, width, dtype, mode
+#
+# mode "rgb" holds the jet-coloured image the PNGs held, "gray" only the
+# normalised magnitude; uint8 holds 0-255, float16 0-1.
+
+
+def _atomic_write(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def store_info(mode="rgb", dtype=np.uint8, size=IMG_SIZE):
+    return {
+        "channels": 3 if mode == "rgb" else 1,
+        "height": size[0],
+        "width": size[1],
+        "dtype": np.dtype(dtype).name,
+        "mode": mode,
+    }
+
+
+class ScalogramStore:
+    """
+    Memory-mapped access to a packed split of ECG/PCG scalograms
+    (mode="r+" for in-place writes into a pre-allocated store).
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.mode = mode
+
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.info = json.load(f)
+
+        self.index = pd.read_csv(os.path.join(path, INDEX_FILE), dtype={"id": str})
+        self._pos = {item_id: i for i, item_id in enumerate(self.index["id"])}
+        self._rows = self.index["row"].to_numpy(dtype=np.int64)
+
+        self.shape = (self.info["channels"], self.info["height"], self.info["width"])
+        self.dtype = np.dtype(self.info["dtype"])
+
+        self.ecg = self._map(ECG_FILE)
+        self.pcg = self._map(PCG_FILE)
+
+    def _map(self, name):
+        n_rows = int(self.index["row"].max()) + 1 if len(self.index) else 0
+        if n_rows == 0:
+            return np.zeros((0,) + self.shape, dtype=self.dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=self.dtype, mode=self.mode, shape=(n_rows,) + self.shape)
+
+    @property
+    def ids(self):
+        return self.index["id"].tolist()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, item_id):
+        return item_id in self._pos
+
+    def row(self, item_id):
+        return int(self._rows[self._pos[item_id]])
+
+    def meta(self, item_id):
+        return self.index.iloc[self._pos[item_id]].to_dict()
+
+    def __getitem__(self, item_id):
+        i = self.row(item_id)
+        return self.ecg[i], self.pcg[i]
+
+    def write(self, ids, ecg_images, pcg_images):
+        rows = [self.row(k) for k in ids]
+        self.ecg[rows] = ecg_images
+        self.pcg[rows] = pcg_images
+
+    def flush(self):
+        if self.mode != "r":
+            self.ecg.flush()
+            self.pcg.flush()
+
+
+class ScalogramStoreWriter:
+    """
+    Appends image batches to a store; index and meta.json are written on
+    close(). With resume=True an existing store is extended (rows beyond
+    its index, left by an interrupted run, are truncated).
+    """
+
+    def __init__(self, path, mode="rgb", dtype=np.uint8, size=IMG_SIZE, resume=False):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        self.info = store_info(mode, dtype, size)
+
+        index_path = os.path.join(path, INDEX_FILE)
+        meta_path = os.path.join(path, META_FILE)
+
+        self.rows = []
+        if resume and os.path.exists(index_path):
+            with open(meta_path, encoding="utf-8") as f:
+                if json.load(f) != self.info:
+                    raise ValueError(f"{path}: existing store has a different layout")
+            self.rows = pd.read_csv(index_path, dtype={"id": str}).to_dict("records")
+
+        self.ids = {r["id"] for r in self.rows}
+
+        item_bytes = int(np.prod([self.info["channels"], *size])) * np.dtype(dtype).itemsize
+        self._ecg = self._open(ECG_FILE, item_bytes)
+        self._pcg = self._open(PCG_FILE, item_bytes)
+
+    def _open(self, name, item_bytes):
+        f = open(os.path.join(self.path, name), "ab" if self.rows else "wb")
+        f.truncate(len(self.rows) * item_bytes)
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def add_batch(self, ids, ecg_images, pcg_images, metas=None):
+        dtype = np.dtype(self.info["dtype"])
+        self._ecg.write(np.ascontiguousarray(ecg_images, dtype=dtype).tobytes())
+        self._pcg.write(np.ascontiguousarray(pcg_images, dtype=dtype).tobytes())
+
+        for i, item_id in enumerate(ids):
+            meta = metas[i] if metas is not None else {}
+            self.rows.append({"id": item_id, "row": len(self.rows), **meta})
+            self.ids.add(item_id)
+
+    def close(self):
+        self._ecg.close()
+        self._pcg.close()
+
+        index = pd.DataFrame(self.rows)
+        if index.empty:
+            index = pd.DataFrame(columns=["id", "row"])
+
+        _atomic_write(os.path.join(self.path, INDEX_FILE), lambda p: index.to_csv(p, index=False))
+
+        def write_meta(p):
+            with open(p, "w", encoding="utf-8") as f:
+                json.dump(self.info, f, indent=2)
+
+        _atomic_write(os.path.join(self.path, META_FILE), write_meta)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def allocate_scalogram_store(path, ids, mode="rgb", dtype=np.uint8, size=IMG_SIZE, **meta_columns):
+    """
+    Pre-sizes a store with one row per id and returns it opened with
+    mode="r+", so several processes can fill their rows in place.
+    An existing store with the same layout whose ids are all among ids
+    is reopened with rows appended for the missing ids (its rows are
+    kept as they are); any other store is allocated afresh.
+    """
+    os.makedirs(path, exist_ok=True)
+    ids = list(ids)
+    info = store_info(mode, dtype, size)
+
+    meta_path = os.path.join(path, META_FILE)
+    index_path = os.path.join(path, INDEX_FILE)
+
+    existing = None
+    if os.path.exists(meta_path) and os.path.exists(index_path):
+        with open(meta_path, encoding="utf-8") as f:
+            same_layout = json.load(f) == info
+        existing = pd.read_csv(index_path, dtype={"id": str})
+        if not same_layout or not set(existing["id"]) <= set(ids):
+            existing = None
+        elif len(existing) == len(ids):
+            return ScalogramStore(path, mode="r+")
+
+    index = pd.DataFrame({"id": ids, **meta_columns})
+    if existing is not None:
+        # Grow: new ids get the rows after the existing ones
+        index = index[~index["id"].isin(set(existing["id"]))]
+        index.insert(1, "row", len(existing) + np.arange(len(index)))
+        index = pd.concat([existing, index], ignore_index=True)
+    else:
+        index.insert(1, "row", np.arange(len(ids)))
+
+    item_bytes = int(np.prod([info["channels"], *size])) * np.dtype(dtype).itemsize
+    for name in (ECG_FILE, PCG_FILE):
+        with open(os.path.join(path, name), "r+b" if existing is not None else "wb") as f:
+            f.truncate(len(index) * item_bytes)
+
+    _atomic_write(index_path, lambda p: index.to_csv(p, index=False))
+
+    def write_meta(p):
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+
+    _atomic_write(meta_path, write_meta)
+    return ScalogramStore(path, mode="r+")
+
+
+# ============================================================
+# SIGNALS -> SCALOGRAM TENSORS
+# ============================================================
+def scalogram_images(ecg, pcg, mode="rgb", dtype=np.uint8, size=IMG_SIZE, cwt="full"):
+    """
+    (batch, samples) ECG/PCG -> two (batch, channels, H, W) image arrays.
+    cwt: "full" or "multirate" (see scalogram.scalogram_cwt).
+    """
+    ecg_cwt, pcg_cwt = scalogram_cwt(ecg, pcg, cwt, n_rows=size[0])
+    return to_image(ecg_cwt, size, mode, dtype), to_image(pcg_cwt, size, mode, dtype)
+
+
+def build_scalogram_store(signals, out_path, mode="rgb", dtype=np.uint8, batch_size=BATCH_SIZE, ids=None, cwt="full"):
+    """
+    Writes the scalograms of every item of a signal source (SignalStore or
+    SegmentIndex) into a scalogram store, batch by batch. Items already
+    in out_path are skipped, so an interrupted run picks up where it left.
+    """
+    meta_cols = [c for c in ("label", "base_id", "record_id") if c in signals.index.columns]
+
+    with ScalogramStoreWriter(out_path, mode, dtype, resume=True) as writer:
+        pending = [k for k in (ids if ids is not None else signals.ids) if k not in writer.ids]
+
+        for i in range(0, len(pending), batch_size):
+            batch_ids = pending[i:i + batch_size]
+
+            ecg = np.stack([signals[k][0] for k in batch_ids])
+            pcg = np.stack([signals[k][1] for k in batch_ids])
+            ecg_img, pcg_img = scalogram_images(ecg, pcg, mode, dtype, cwt=cwt)
+
+            metas = [{c: signals.meta(k)[c] for c in meta_cols} for k in batch_ids]
+            writer.add_batch(batch_ids, ecg_img, pcg_img, metas)
+
+    return ScalogramStore(out_path)
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else "rgb"
+    dtype = sys.argv[2] if len(sys.argv) > 2 else "uint8"
+    cwt = sys.argv[3] if len(sys.argv) > 3 else "full"
+
+    # Original segments only: training augments on the fly (augmentation.augmented_loader)
+    for split, source in [("train", "train_segments"), ("test", "test_segments")]:
+        t0 = time.perf_counter()
+        store = build_scalogram_store(
+            SignalStore(os.path.join(SIGNAL_STORE_DIR, source)),
+            os.path.join(SCALOGRAM_STORE_DIR, split),
+            mode, dtype, cwt=cwt,
+        )
+        elapsed = time.perf_counter() - t0
+
+        size_mb = store.ecg.nbytes * 2 / 1e6
+        print(f"✅ {split.upper()}: {len(store)} scalogram pairs ({mode}, {dtype}, {cwt} CWT, {size_mb:.0f} MB) in {elapsed:.1f} s")
@@ -0,0 +1,387 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import profiling
+from signal_store import SignalStore, SignalStoreWriter
+from rpeak_detection import CACHE_DIR as RPEAK_CACHE_DIR, detect, detect_all, DEFAULT_DETECTOR
+from quality import QC_THRESHOLDS, REJECT_COLUMNS, screen_windows, summarize_rejects
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+STORE_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\SIGNAL_STORE"
+SEGMENT_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\4-SEGMENTED_DATA"
+
+WINDOW_SEC = 3.0
+
+INDEX_COLUMNS = ["segment_id", "record_id", "start", "end", "rpeak", "label"]
+
+
+# ============================================================
+# R-PEAK DETECTION
+# ============================================================
+def detect_rpeaks(ecg, fs, detector=DEFAULT_DETECTOR):
+    """R-peaks of one record; empty array if detection fails (see rpeak_detection.py)."""
+    return detect(ecg, fs, detector)
+
+
+# ============================================================
+# WINDOWING
+# ============================================================
+def segment_windows(rpeaks, n_samples, fs, window_sec=WINDOW_SEC, overlap=False):
+    """
+    R-peak–centred windows as (start, end, rpeak) rows.
+
+    Same policy as segment_ecg_pcg: windows must fit inside the record,
+    and unless overlap=True a window may not start before the previous
+    one ended.
+    """
+    half_window = int((window_sec / 2) * fs)
+    window_len = int(window_sec * fs)
+
+    windows = []
+    last_end = -1
+
+    for r in rpeaks:
+        start = int(r) - half_window
+        end = int(r) + half_window
+
+        if start < 0 or end > n_samples:
+            continue
+
+        if not overlap and start <= last_end:
+            continue
+
+        if end - start != window_len:
+            continue
+
+        windows.append((start, end, int(r)))
+        last_end = end
+
+    return windows
+
+
+def segment_ecg_pcg(ecg, pcg, fs, window_sec=WINDOW_SEC, rpeaks=None):
+    """Materialised segments, kept for the .mat based notebook cells."""
+    if rpeaks is None:
+        rpeaks = detect_rpeaks(ecg, fs)
+
+    return [
+        (ecg[start:end], pcg[start:end])
+        for start, end, _ in segment_windows(rpeaks, len(ecg), fs, window_sec)
+    ]
+
+
+# ============================================================
+# SEGMENT INDEX (virtual segmentation)
+# ============================================================
+def build_segment_index(records, rpeaks=None, window_sec=WINDOW_SEC, overlap=False, label_map=None, qc=QC_THRESHOLDS, ids=None):
+    """
+    One row per segment: segment_id, record_id, start, end, rpeak, label.
+    No samples are copied; the windows point into the record store.
+
+    rpeaks: optional {record_id: peaks} (e.g. from rpeak_detection.detect_all);
+    records missing from it are detected here. ids: only these records.
+    qc: thresholds of quality.py (None disables screening). All windows of
+    a record are scored in one pass and failing ones never enter the
+    index; segment ids count every candidate window, so they stay the
+    same whatever is rejected.
+    Returns (index DataFrame, rpeaks dict, skipped record ids, rejected
+    DataFrame with a reason per window).
+    """
+    rpeaks = dict(rpeaks or {})
+    rows = []
+    rejected = []
+    skipped = []
+
+    for record_id in (records.ids if ids is None else ids):
+        ecg, pcg, fs = records[record_id]
+
+        if record_id not in rpeaks:
+            rpeaks[record_id] = detect_rpeaks(ecg, fs)
+
+        if label_map is not None:
+            label = label_map.get(record_id)
+        else:
+            label = records.meta(record_id).get("label")
+
+        windows = segment_windows(rpeaks[record_id], len(ecg), fs, window_sec, overlap)
+
+        if len(windows) == 0:
+            skipped.append(record_id)
+            continue
+
+        if qc is not None:
+            keep, scores = screen_windows(ecg, pcg, fs, windows, qc)
+            reasons = scores["reason"].tolist()
+        else:
+            keep, reasons = [True] * len(windows), [""] * len(windows)
+
+        for i, (start, end, r) in enumerate(windows):
+            row = {
+                "segment_id": f"{record_id}_seg{i:03d}",
+                "record_id": record_id,
+                "start": start,
+                "end": end,
+                "rpeak": r,
+                "label": label,
+            }
+            if keep[i]:
+                rows.append(row)
+            else:
+                rejected.append({**row, "reason": reasons[i]})
+
+    return (
+        pd.DataFrame(rows, columns=INDEX_COLUMNS),
+        rpeaks,
+        skipped,
+        pd.DataFrame(rejected, columns=REJECT_COLUMNS),
+    )
+
+
+class SegmentView:
+    """A window of a parent record, sliced from the store only on access."""
+
+    __slots__ = ("records", "segment_id", "record_id", "start", "end", "rpeak", "label")
+
+    def __init__(self, records, segment_id, record_id, start, end, rpeak, label):
+        self.records = records
+        self.segment_id = segment_id
+        self.record_id = record_id
+        self.start = start
+        self.end = end
+        self.rpeak = rpeak
+        self.label = label
+
+    @property
+    def ecg(self):
+        return self.records.ecg(self.record_id)[self.start:self.end]
+
+    @property
+    def pcg(self):
+        return self.records.pcg(self.record_id)[self.start:self.end]
+
+    @property
+    def fs(self):
+        return self.records.fs(self.record_id)
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"SegmentView({self.segment_id}, {self.record_id}[{self.start}:{self.end}])"
+
+
+class SegmentIndex:
+    """
+    Segment-level view over a record store. Exposes the same lookup
+    interface as SignalStore (ids, [id] -> (ecg, pcg, fs), meta, items),
+    so later stages can consume either.
+    """
+
+    def __init__(self, records, index):
+        if isinstance(records, str):
+            records = SignalStore(records)
+        if isinstance(index, str):
+            index = pd.read_csv(index, dtype={"segment_id": str, "record_id": str})
+
+        self.records = records
+        self.index = index.reset_index(drop=True)
+        self._rows = {seg_id: i for i, seg_id in enumerate(self.index["segment_id"])}
+
+        self._record_ids = self.index["record_id"].to_numpy()
+        self._starts = self.index["start"].to_numpy(dtype=np.int64)
+        self._ends = self.index["end"].to_numpy(dtype=np.int64)
+
+    @property
+    def ids(self):
+        return self.index["segment_id"].tolist()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, segment_id):
+        return segment_id in self._rows
+
+    def view(self, segment_id):
+        row = self.index.iloc[self._rows[segment_id]]
+        return SegmentView(
+            self.records, segment_id, row["record_id"],
+            int(row["start"]), int(row["end"]), int(row["rpeak"]), row["label"],
+        )
+
+    def __getitem__(self, segment_id):
+        i = self._rows[segment_id]
+        ecg, pcg, fs = self.records[self._record_ids[i]]
+        start, end = self._starts[i], self._ends[i]
+        return ecg[start:end], pcg[start:end], fs
+
+    def ecg(self, segment_id):
+        return self[segment_id][0]
+
+    def pcg(self, segment_id):
+        return self[segment_id][1]
+
+    def fs(self, segment_id):
+        return self[segment_id][2]
+
+    def meta(self, segment_id):
+        return self.index.iloc[self._rows[segment_id]].to_dict()
+
+    def items(self):
+        for segment_id in self.index["segment_id"]:
+            yield (segment_id, *self[segment_id])
+
+
+def save_segment_index(index, path):
+    tmp_path = path + ".tmp"
+    index.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def load_segment_index(records, path):
+    return SegmentIndex(records, path)
+
+
+def save_reject_list(rejected, path):
+    """Windows dropped by the quality screen, one row per window with its reason."""
+    tmp_path = path + ".tmp"
+    rejected[REJECT_COLUMNS].to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def emit_segment_metrics(split, n_records, index, skipped, rejected, window_sec=WINDOW_SEC,
+                         detector=DEFAULT_DETECTOR, qc=QC_THRESHOLDS, seconds=None):
+    """Segment counts and quality-screen summary of one split for the metrics sink."""
+    metrics.emit(
+        "segment", "summary",
+        split=split,
+        window_sec=window_sec,
+        detector=detector,
+        records=n_records,
+        segments=len(index),
+        labels=metrics.label_counts(index["label"]),
+        skipped=list(skipped),
+        seconds=seconds,
+    )
+    if qc is not None:
+        summary = summarize_rejects(rejected, len(index) + len(rejected))
+        metrics.emit("segment", "quality", split=split, thresholds=qc, **summary)
+
+
+# ============================================================
+# SEGMENT STORE (incremental)
+# ============================================================
+# The windows of build_segment_index, materialised for the stages that
+# read segment samples (augmentation, scalograms, waveform model). Next
+# to the samples (signal_store.py layout) the store keeps:
+# <store>/segment_index.csv      its segment index (INDEX_COLUMNS)
+# <store>/rejected_segments.csv  windows the quality screen dropped
+# <store>/segment_settings.json  window_sec, detector and qc it was built with
+SEGMENT_INDEX_NAME = "segment_index.csv"
+REJECT_NAME = "rejected_segments.csv"
+SETTINGS_NAME = "segment_settings.json"
+
+
+def _read_csv(path, columns):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    return pd.read_csv(path, dtype={"segment_id": str, "record_id": str})
+
+
+def append_segments(records, segment_store, window_sec=WINDOW_SEC, detector=DEFAULT_DETECTOR, qc=QC_THRESHOLDS, ids=None,
+                    rpeak_cache=RPEAK_CACHE_DIR):
+    """
+    Screens the records (or only ids) the segment store has not seen yet
+    with build_segment_index (R-peaks from the detect_all cache, qc
+    thresholds of quality.py) and appends the windows that pass; rejected
+    windows are never written. Records already screened are left as they
+    are; a store built with other settings starts over. rpeak_cache:
+    cache_dir of detect_all.
+    Returns (segment index of the store, records without windows,
+    rejected windows of the store, number of new segments).
+    """
+    settings = {"window_sec": window_sec, "detector": detector, "qc": qc}
+    index_path = os.path.join(segment_store, SEGMENT_INDEX_NAME)
+    reject_path = os.path.join(segment_store, REJECT_NAME)
+    settings_path = os.path.join(segment_store, SETTINGS_NAME)
+
+    resume = False
+    if os.path.exists(settings_path):
+        with open(settings_path, encoding="utf-8") as f:
+            resume = json.load(f) == json.loads(json.dumps(settings))
+
+    index = _read_csv(index_path, INDEX_COLUMNS) if resume else pd.DataFrame(columns=INDEX_COLUMNS)
+    rejected = _read_csv(reject_path, REJECT_COLUMNS) if resume else pd.DataFrame(columns=REJECT_COLUMNS)
+
+    # Records without any window are not kept anywhere, so they are tried again
+    screened = set(index["record_id"]) | set(rejected["record_id"])
+    new_ids = [r for r in (records.ids if ids is None else ids) if r not in screened]
+
+    rpeaks = detect_all(records, detector, cache_dir=rpeak_cache, ids=new_ids) if new_ids else {}
+    new_index, _, skipped, new_rejected = build_segment_index(records, rpeaks, window_sec, qc=qc, ids=new_ids)
+
+    with SignalStoreWriter(segment_store, resume=resume) as writer:
+        for row in new_index.itertuples(index=False):
+            if row.segment_id in writer.ids:
+                # Written by a run interrupted before it saved the index
+                continue
+            ecg, pcg, fs = records[row.record_id]
+            writer.add(
+                row.segment_id, ecg[row.start:row.end], pcg[row.start:row.end], fs,
+                record_id=row.record_id, label=row.label
+            )
+
+    if len(new_index):
+        index = new_index if index.empty else pd.concat([index, new_index], ignore_index=True)
+    if len(new_rejected):
+        rejected = new_rejected if rejected.empty else pd.concat([rejected, new_rejected], ignore_index=True)
+    save_segment_index(index, index_path)
+    save_reject_list(rejected, reject_path)
+
+    # Written last: the index and reject list above belong to these settings
+    tmp_path = settings_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(settings, f)
+    os.replace(tmp_path, settings_path)
+
+    return index, skipped, rejected, len(new_index)
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+    import time
+
+    window_sec = float(sys.argv[1]) if len(sys.argv) > 1 else WINDOW_SEC
+
+    for split in ["train", "test"]:
+        t0 = time.perf_counter()
+        records = SignalStore(os.path.join(STORE_DIR, f"{split}_records"))
+        index_csv = os.path.join(SEGMENT_DIR, f"{split}_segment_index.csv")
+        reject_csv = os.path.join(SEGMENT_DIR, f"{split}_rejected_segments.csv")
+
+        # Cached + parallel: changing WINDOW_SEC only re-runs the windowing
+        rpeaks = detect_all(records, DEFAULT_DETECTOR)
+
+        index, _, skipped, rejected = build_segment_index(records, rpeaks, window_sec)
+        save_segment_index(index, index_csv)
+        save_reject_list(rejected, reject_csv)
+        emit_segment_metrics(split, len(records), index, skipped, rejected, window_sec,
+                             seconds=time.perf_counter() - t0)
+        profiling.print_summary(f"[{split}] profile (all workers)")
+        profiling.emit_profile("segment", split=split)
+        profiling.reset()
+
+        print(f"✅ {split.upper()}: {len(index)} segments from {len(records) - len(skipped)} records")
+        if skipped:
+            print(f"Skipped records (no valid R-peak windows): {', '.join(skipped)}")
+        if len(rejected):
+            summary = summarize_rejects(rejected, len(index) + len(rejected))
+            print(f"Rejected {summary['rejected']} windows: {summary['by_reason']}")
@@ -0,0 +1,278 @@
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.io as sio
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+DATASET_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET"
+
+# One store per split: record-level and segment-level
+STORE_DIR = os.path.join(DATASET_DIR, "SIGNAL_STORE")
+
+ECG_FILE = "ecg.f32"
+PCG_FILE = "pcg.f32"
+INDEX_FILE = "index.csv"
+
+DTYPE = np.float32
+
+INDEX_COLUMNS = ["id", "offset", "length", "fs"]
+
+
+# ============================================================
+# STORE LAYOUT
+# ============================================================
+# <store>/ecg.f32    all ECG samples of the split, back to back (float32)
+# <store>/pcg.f32    all PCG samples, same offsets as ECG
+# <store>/index.csv  id, offset, length, fs + optional metadata columns
+#                    (record_id, label, start, end, ...)
+#
+# ECG and PCG of one item always share offset and length, so a single
+# index row addresses both channels.
+
+
+def _atomic_write_csv(df, path):
+    tmp_path = path + ".tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+class SignalStore:
+    """
+    Read (or, with mode="r+", in-place write) access to a packed split.
+
+    Every accessor returns a view into the memory-mapped data files, so
+    slicing a record or segment never copies or re-parses anything.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.mode = mode
+
+        self.index = pd.read_csv(os.path.join(path, INDEX_FILE), dtype={"id": str})
+        self._rows = {item_id: i for i, item_id in enumerate(self.index["id"])}
+        self._offsets = self.index["offset"].to_numpy(dtype=np.int64)
+        self._lengths = self.index["length"].to_numpy(dtype=np.int64)
+        self._fs = self.index["fs"].to_numpy()
+
+        self._ecg = self._map(ECG_FILE)
+        self._pcg = self._map(PCG_FILE)
+
+    def _map(self, name):
+        path = os.path.join(self.path, name)
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=DTYPE)
+        return np.memmap(path, dtype=DTYPE, mode=self.mode)
+
+    # ------------------------------------------------
+    # Lookup
+    # ------------------------------------------------
+    @property
+    def ids(self):
+        return self.index["id"].tolist()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, item_id):
+        return item_id in self._rows
+
+    def _span(self, item_id):
+        i = self._rows[item_id]
+        start = self._offsets[i]
+        return start, start + self._lengths[i]
+
+    def ecg(self, item_id):
+        start, end = self._span(item_id)
+        return self._ecg[start:end]
+
+    def pcg(self, item_id):
+        start, end = self._span(item_id)
+        return self._pcg[start:end]
+
+    def fs(self, item_id):
+        return int(self._fs[self._rows[item_id]])
+
+    def meta(self, item_id):
+        return self.index.iloc[self._rows[item_id]].to_dict()
+
+    def __getitem__(self, item_id):
+        start, end = self._span(item_id)
+        return self._ecg[start:end], self._pcg[start:end], self.fs(item_id)
+
+    def items(self):
+        for item_id in self.index["id"]:
+            yield (item_id, *self[item_id])
+
+    def flush(self):
+        if self.mode != "r":
+            self._ecg.flush()
+            self._pcg.flush()
+
+
+class SignalStoreWriter:
+    """
+    Appends items to a store. Samples go straight to the data files; the
+    index is written on close(). With resume=True an existing store is
+    extended, after truncating any samples not covered by its index
+    (left behind by an interrupted run).
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        index_path = os.path.join(path, INDEX_FILE)
+
+        if resume and os.path.exists(index_path):
+            self.rows = pd.read_csv(index_path, dtype={"id": str}).to_dict("records")
+        else:
+            self.rows = []
+
+        self.offset = sum(int(r["length"]) for r in self.rows)
+        self.ids = {r["id"] for r in self.rows}
+
+        self._ecg = self._open(ECG_FILE)
+        self._pcg = self._open(PCG_FILE)
+
+    def _open(self, name):
+        f = open(os.path.join(self.path, name), "ab" if self.rows else "wb")
+        f.truncate(self.offset * np.dtype(DTYPE).itemsize)
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def add(self, item_id, ecg, pcg, fs, **meta):
+        ecg = np.ascontiguousarray(ecg, dtype=DTYPE).reshape(-1)
+        pcg = np.ascontiguousarray(pcg, dtype=DTYPE).reshape(-1)
+
+        if len(ecg) != len(pcg):
+            raise ValueError(f"{item_id}: ECG and PCG lengths differ ({len(ecg)} vs {len(pcg)})")
+        if item_id in self.ids:
+            raise ValueError(f"{item_id}: already in store")
+
+        self._ecg.write(ecg.tobytes())
+        self._pcg.write(pcg.tobytes())
+
+        self.rows.append({"id": item_id, "offset": self.offset, "length": len(ecg), "fs": int(fs), **meta})
+        self.ids.add(item_id)
+        self.offset += len(ecg)
+
+    def close(self):
+        self._ecg.close()
+        self._pcg.close()
+
+        index = pd.DataFrame(self.rows)
+        if index.empty:
+            index = pd.DataFrame(columns=INDEX_COLUMNS)
+        _atomic_write_csv(index, os.path.join(self.path, INDEX_FILE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def allocate_store(path, ids, lengths, fs, **meta_columns):
+    """
+    Pre-sizes a store for items of known length and returns it opened
+    with mode="r+", so a stage can fill each item's slice in place.
+    """
+    os.makedirs(path, exist_ok=True)
+
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(lengths) else lengths
+
+    index = pd.DataFrame({"id": list(ids), "offset": offsets, "length": lengths, "fs": fs, **meta_columns})
+    total_bytes = int(lengths.sum()) * np.dtype(DTYPE).itemsize
+
+    for name in (ECG_FILE, PCG_FILE):
+        with open(os.path.join(path, name), "wb") as f:
+            f.truncate(total_bytes)
+
+    _atomic_write_csv(index, os.path.join(path, INDEX_FILE))
+    return SignalStore(path, mode="r+")
+
+
+# ============================================================
+# .MAT COMPATIBILITY
+# ============================================================
+def load_mat(mat_path):
+    data = sio.loadmat(mat_path)
+    ecg = data["ecg"].squeeze().astype(DTYPE)
+    pcg = data["pcg"].squeeze().astype(DTYPE)
+    fs = int(data["fs"][0][0])
+    return ecg, pcg, fs
+
+
+def pack_mat_dir(mat_dir, store_path, labels_csv=None, id_col="record", ids=None, resume=False):
+    """
+    Packs every .mat of a stage directory (or only ids, e.g. one split of
+    split_manifest.py) into one store. resume=True appends just the items
+    the store does not hold yet.
+    """
+    label_map = {}
+    if labels_csv is not None:
+        labels_df = pd.read_csv(labels_csv, dtype={id_col: str})
+        label_map = dict(zip(labels_df[id_col], labels_df["label"]))
+
+    files = sorted(ids) if ids is not None else [f[:-4] for f in sorted(os.listdir(mat_dir)) if f.endswith(".mat")]
+
+    with SignalStoreWriter(store_path, resume=resume) as writer:
+        for item_id in files:
+            if item_id in writer.ids:
+                continue
+
+            ecg, pcg, fs = load_mat(os.path.join(mat_dir, item_id + ".mat"))
+
+            meta = {"label": label_map[item_id]} if item_id in label_map else {}
+            writer.add(item_id, ecg, pcg, fs, **meta)
+
+    return SignalStore(store_path)
+
+
+def export_mat(store_path, out_dir, ids=None):
+    """Writes items back out as the per-file .mat layout the notebooks expect."""
+    store = SignalStore(store_path)
+    os.makedirs(out_dir, exist_ok=True)
+
+    has_record_id = "record_id" in store.index.columns
+
+    for item_id in ids if ids is not None else store.ids:
+        ecg, pcg, fs = store[item_id]
+
+        data = {"ecg": np.asarray(ecg), "pcg": np.asarray(pcg), "fs": fs}
+        if has_record_id:
+            data["record_id"] = store.meta(item_id)["record_id"]
+
+        sio.savemat(os.path.join(out_dir, item_id + ".mat"), data)
+
+
+# ============================================================
+# MAIN (pack the existing .mat stages)
+# ============================================================
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 4:
+        print("Usage: python signal_store.py [pack | export] <mat_dir | store_dir> <store_dir | out_dir> [labels_csv]")
+        sys.exit(1)
+
+    action, src, dst = sys.argv[1:4]
+
+    if action == "pack":
+        labels_csv = sys.argv[4] if len(sys.argv) > 4 else None
+        id_col = "record"
+        if labels_csv is not None and "segment_id" in pd.read_csv(labels_csv, nrows=0).columns:
+            id_col = "segment_id"
+
+        store = pack_mat_dir(src, dst, labels_csv, id_col)
+        size_mb = os.path.getsize(os.path.join(dst, ECG_FILE)) * 2 / 1e6
+        print(f"✅ Packed {len(store)} items into {dst} ({size_mb:.1f} MB)")
+    elif action == "export":
+        export_mat(src, dst)
+        print(f"✅ Exported {len(SignalStore(src))} items to {dst}")
+    else:
+        print("Unknown action")
@@ -0,0 +1,186 @@
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+MAT_DATA_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\2-MATLAB DATA"
+LABELS_CSV = os.path.join(MAT_DATA_DIR, "LABELS.csv")
+
+SPLIT_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\3-SPLIT_DATA"
+MANIFEST_CSV = os.path.join(SPLIT_DIR, "split_manifest.csv")
+
+TEST_SIZE = 0.30
+N_FOLDS = 5
+SPLIT_SALT = "ecg-pcg-split-v1"
+
+MANIFEST_COLUMNS = ["record", "label", "split", "fold", "source"]
+
+
+# ============================================================
+# STABLE ASSIGNMENT
+# ============================================================
+# Each record's split and fold depend only on its id (and the salt):
+# sha1 -> a number in [0, 1), test if below TEST_SIZE, fold from a second
+# hash. Adding records never moves an existing one, so their segments,
+# R-peaks and scalograms stay valid. Rows already in the manifest are
+# kept as they are (e.g. the first run's sklearn split, see pin_split).
+#
+# One record is one subject in the PhysioNet set, so record-wise folds
+# are patient-wise.
+
+
+def unit_hash(record, salt=SPLIT_SALT):
+    """Record id -> float in [0, 1), the same on every machine and run."""
+    digest = hashlib.sha1(f"{salt}:{record}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64
+
+
+def split_of(record, test_size=TEST_SIZE, salt=SPLIT_SALT):
+    return "test" if unit_hash(record, salt) < test_size else "train"
+
+
+def fold_of(record, n_folds=N_FOLDS, salt=SPLIT_SALT):
+    return int(unit_hash(record, salt + ":fold") * n_folds)
+
+
+def assign(labels_df, mat_dir=MAT_DATA_DIR, test_size=TEST_SIZE, n_folds=N_FOLDS, salt=SPLIT_SALT):
+    """Manifest rows for records (record, label columns) from the hashes alone."""
+    records = labels_df["record"].astype(str)
+    splits = [split_of(r, test_size, salt) for r in records]
+
+    return pd.DataFrame({
+        "record": records.values,
+        "label": labels_df["label"].values,
+        "split": splits,
+        # Folds partition the train records; test records stay out of them
+        "fold": [fold_of(r, n_folds, salt) if s == "train" else -1 for r, s in zip(records, splits)],
+        "source": [os.path.join(mat_dir, r + ".mat") for r in records],
+    }, columns=MANIFEST_COLUMNS)
+
+
+def update_manifest(manifest, labels_df, mat_dir=MAT_DATA_DIR, test_size=TEST_SIZE, n_folds=N_FOLDS, salt=SPLIT_SALT):
+    """
+    Existing rows keep their split and fold; records not yet in the
+    manifest are assigned by hash. Returns (manifest, ids of new records).
+    """
+    if manifest is None:
+        manifest = pd.DataFrame(columns=MANIFEST_COLUMNS)
+
+    known = set(manifest["record"])
+    new = labels_df[~labels_df["record"].astype(str).isin(known)]
+
+    added = assign(new, mat_dir, test_size, n_folds, salt)
+    manifest = pd.concat([manifest, added], ignore_index=True) if len(manifest) else added
+    return manifest.sort_values("record", ignore_index=True), added["record"].tolist()
+
+
+def pin_split(train_csv, test_csv, mat_dir=MAT_DATA_DIR, n_folds=N_FOLDS, salt=SPLIT_SALT):
+    """Manifest from an existing train/test label split, so earlier results stay comparable."""
+    parts = []
+    for split, path in [("train", train_csv), ("test", test_csv)]:
+        df = pd.read_csv(path, dtype={"record": str})
+        parts.append(pd.DataFrame({
+            "record": df["record"],
+            "label": df["label"],
+            "split": split,
+            "fold": [fold_of(r, n_folds, salt) if split == "train" else -1 for r in df["record"]],
+            "source": [os.path.join(mat_dir, r + ".mat") for r in df["record"]],
+        }, columns=MANIFEST_COLUMNS))
+    return pd.concat(parts, ignore_index=True).sort_values("record", ignore_index=True)
+
+
+# ============================================================
+# MANIFEST FILE
+# ============================================================
+def load_manifest(path=MANIFEST_CSV):
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype={"record": str})
+
+
+def save_manifest(manifest, path=MANIFEST_CSV):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    manifest[MANIFEST_COLUMNS].to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def split_ids(manifest, split):
+    return manifest.loc[manifest["split"] == split, "record"].tolist()
+
+
+def kfold(manifest, n_folds=None, salt=SPLIT_SALT):
+    """
+    (fold, train ids, val ids) over the train records. n_folds other than
+    the manifest's recomputes the folds from the hash.
+    """
+    train = manifest[manifest["split"] == "train"]
+    if n_folds is None:
+        folds = train["fold"].to_numpy()
+        n_folds = int(folds.max()) + 1
+    else:
+        folds = np.array([fold_of(r, n_folds, salt) for r in train["record"]])
+
+    records = train["record"].to_numpy()
+    for k in range(n_folds):
+        yield k, records[folds != k].tolist(), records[folds == k].tolist()
+
+
+# ============================================================
+# CONSUMERS
+# ============================================================
+def write_label_csvs(manifest, split_dir=SPLIT_DIR):
+    """train_labels.csv / test_labels.csv (record, label) as 3-test_train_split.py wrote them."""
+    paths = {}
+    for split in ["train", "test"]:
+        paths[split] = os.path.join(split_dir, f"{split}_labels.csv")
+        rows = manifest.loc[manifest["split"] == split, ["record", "label"]]
+        tmp_path = paths[split] + ".tmp"
+        rows.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, paths[split])
+    return paths
+
+
+def link_split(manifest, split_dir=SPLIT_DIR):
+    """
+    split_dir/train, split_dir/test as hardlinks to the converted .mat
+    files, for code that still expects one folder per split. No data is
+    copied; existing links are left alone. Needs the same volume.
+    """
+    linked = 0
+    for row in manifest.itertuples(index=False):
+        out_dir = os.path.join(split_dir, row.split)
+        os.makedirs(out_dir, exist_ok=True)
+
+        dst = os.path.join(out_dir, row.record + ".mat")
+        if os.path.exists(dst) or not os.path.exists(row.source):
+            continue
+        os.link(row.source, dst)
+        linked += 1
+
+    # A record whose split changed (a re-pinned manifest) must not stay in the other folder
+    for split in ["train", "test"]:
+        out_dir = os.path.join(split_dir, split)
+        if not os.path.isdir(out_dir):
+            continue
+        keep = set(split_ids(manifest, split))
+        for file in os.listdir(out_dir):
+            if file.endswith(".mat") and file[:-4] not in keep:
+                os.remove(os.path.join(out_dir, file))
+    return linked
+
+
+def split_summary(manifest):
+    """Records and label counts per split, plus fold sizes."""
+    summary = {}
+    for split in ["train", "test"]:
+        rows = manifest[manifest["split"] == split]
+        summary[split] = len(rows)
+        summary[f"{split}_labels"] = {str(k): int(v) for k, v in rows["label"].value_counts().sort_index().items()}
+    train = manifest[manifest["split"] == "train"]
+    summary["folds"] = {str(k): int(v) for k, v in train["fold"].value_counts().sort_index().items()}
+    return summary
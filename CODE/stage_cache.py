@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import uuid
+
+import numpy as np
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+CACHE_ROOT = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\CACHE\stages"
+
+RECORD_FILE = "stage.json"
+WORKSPACE_FILE = "workspace.json"
+
+# Files up to this size are fingerprinted by content, larger ones (and
+# directories) by size + mtime
+CONTENT_HASH_MAX_BYTES = 16 * 1024 * 1024
+
+
+# ============================================================
+# CACHE LAYOUT
+# ============================================================
+# <root>/<stage>/<key>/            outputs of one run of a stage
+# <root>/<stage>/<key>/stage.json  written last: key, params, inputs, seconds
+#
+# key = hash of the stage name + version, its parameters, the keys of the
+# stages it reads and fingerprints of its external sources. A stage whose
+# key already has a stage.json is never recomputed; changing a parameter
+# changes the key of that stage and of every stage downstream of it.
+#
+# Incremental stages (per-record work: conversion, segments, scalograms)
+# keep one workspace instead:
+# <root>/<stage>/<workspace>/                 outputs, extended run after run
+# <root>/<stage>/<workspace>/workspace.json   base: random id given when it was (re)started
+# workspace = the same hash without data fingerprints, over the
+# workspaces + bases of the stages it reads. New data changes the key, so
+# the stage runs again, but in the same directory: it only adds what its
+# outputs are missing (e.g. the segments of one new record). A stage that
+# can't just add (a record was edited or removed) calls ctx.reset(),
+# which empties its workspace and gives it a new base, so every
+# incremental stage downstream starts a fresh workspace too. Done means
+# the stage.json of the workspace holds the current key.
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def fingerprint(path, suffixes=None):
+    """
+    Content hash for small files, size + mtime listing for directories and
+    large files. suffixes limits a directory listing to those extensions.
+    """
+    if not os.path.exists(path):
+        return None
+
+    if os.path.isfile(path):
+        st = os.stat(path)
+        if st.st_size <= CONTENT_HASH_MAX_BYTES:
+            with open(path, "rb") as f:
+                return hashlib.sha1(f.read()).hexdigest()
+        return [st.st_size, st.st_mtime_ns]
+
+    listing = []
+    for root, _, files in os.walk(path):
+        for file in sorted(files):
+            if suffixes and not file.endswith(tuple(suffixes)):
+                continue
+            st = os.stat(os.path.join(root, file))
+            listing.append([os.path.relpath(os.path.join(root, file), path), st.st_size, st.st_mtime_ns])
+    listing.sort()
+    return hashlib.sha1(json.dumps(listing).encode("utf-8")).hexdigest()
+
+
+def _source_fingerprint(source, data=True):
+    if isinstance(source, (list, tuple)):
+        path, suffixes = source
+        return [path, list(suffixes), fingerprint(path, suffixes) if data else None]
+    return [source, fingerprint(source) if data else None]
+
+
+class Stage:
+    """
+    One step of the DAG.
+
+    fn(ctx) writes the stage's outputs into ctx.out_dir; ctx.inputs maps
+    each dependency to its output dir. fn=None marks a step run outside
+    the runner (e.g. a training notebook): it gets a key and a directory,
+    and counts as done once something calls StageCache.commit for it.
+    sources: external files/dirs fingerprinted into the key; a (dir,
+    suffixes) pair only looks at files with those extensions.
+    incremental: fn extends the outputs already in its workspace (see
+    CACHE LAYOUT) instead of starting from an empty directory; it must
+    also cope with the outputs of an interrupted run.
+    """
+
+    def __init__(self, name, fn, deps=(), params=None, sources=(), version=1, incremental=False):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.params = _jsonable(params or {})
+        self.sources = tuple(sources)
+        self.version = version
+        self.incremental = incremental
+
+    def key(self, upstream_keys, data=True):
+        """data=False leaves the source fingerprints out (workspace key)."""
+        payload = {
+            "stage": self.name,
+            "version": self.version,
+            "params": self.params,
+            "deps": {d: upstream_keys[d] for d in self.deps},
+            "sources": [_source_fingerprint(s, data) for s in self.sources],
+        }
+        blob = json.dumps(payload, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(blob).hexdigest()[:16]
+
+
+class StageContext:
+    def __init__(self, stage, key, out_dir, inputs):
+        self.stage = stage
+        self.key = key
+        self.out_dir = out_dir
+        self.inputs = inputs
+        self.params = stage.params
+
+    def reset(self):
+        """Incremental stages: empties the workspace; downstream workspaces start over."""
+        _start_dir(self.out_dir, incremental=True)
+
+
+class StageCache:
+    def __init__(self, root=CACHE_ROOT):
+        self.root = root
+
+    def path(self, stage_name, key):
+        return os.path.join(self.root, stage_name, key)
+
+    def is_done(self, stage_name, key, workspace=None):
+        """workspace: dir key of an incremental stage, done if its stage.json holds key."""
+        if workspace is None:
+            return os.path.exists(os.path.join(self.path(stage_name, key), RECORD_FILE))
+        if not os.path.exists(os.path.join(self.path(stage_name, workspace), RECORD_FILE)):
+            return False
+        return self.record(stage_name, workspace)["key"] == key
+
+    def base(self, stage_name, workspace):
+        path = os.path.join(self.path(stage_name, workspace), WORKSPACE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["base"]
+
+    def record(self, stage_name, key):
+        with open(os.path.join(self.path(stage_name, key), RECORD_FILE), encoding="utf-8") as f:
+            return json.load(f)
+
+    def commit(self, stage_name, key, info):
+        """Marks a stage run complete; stage.json is replaced atomically."""
+        path = os.path.join(self.path(stage_name, key), RECORD_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_jsonable(info), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def _start_dir(path, incremental):
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    if incremental:
+        with open(os.path.join(path, WORKSPACE_FILE), "w", encoding="utf-8") as f:
+            json.dump({"base": uuid.uuid4().hex[:16]}, f)
+
+
+# ============================================================
+# RUNNER
+# ============================================================
+def plan(stages):
+    """Stage keys in DAG order (stages must be listed after their deps)."""
+    keys = {}
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in keys]
+        if missing:
+            raise ValueError(f"{stage.name}: dependencies {missing} must come first")
+        keys[stage.name] = stage.key(keys)
+    return keys
+
+
+def _needed(stages, targets):
+    if not targets:
+        return {s.name for s in stages}
+
+    by_name = {s.name: s for s in stages}
+    needed = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in needed:
+            needed.add(name)
+            todo.extend(by_name[name].deps)
+    return needed
+
+
+def _out_key(stage, seen, cache):
+    """
+    Dir key of a stage, given what the stages before it showed downstream
+    (seen: key, or workspace + base for incremental ones); returns
+    (dir key, what this stage shows downstream).
+    """
+    if not stage.incremental:
+        return None, None
+    workspace = stage.key(seen, data=False)
+    return workspace, f"{workspace}:{cache.base(stage.name, workspace)}"
+
+
+def status(stages, cache):
+    keys = plan(stages)
+    seen = {}
+    rows = []
+    for s in stages:
+        workspace, shown = _out_key(s, seen, cache)
+        seen[s.name] = shown or keys[s.name]
+        rows.append({
+            "stage": s.name, "key": keys[s.name], "done": cache.is_done(s.name, keys[s.name], workspace),
+            "external": s.fn is None,
+        })
+    return rows
+
+
+def run_stages(stages, cache, targets=None, force=()):
+    """
+    Runs every stage (or only those needed for targets) whose key has no
+    completed entry in the cache; incremental stages run in their existing
+    workspace. force: stage names recomputed anyway, from an empty dir.
+    Returns one report row per stage considered.
+    """
+    keys = plan(stages)
+    needed = _needed(stages, targets)
+    report = []
+    seen = {}
+    out_dirs = {}
+    done = {}
+
+    for stage in stages:
+        key = keys[stage.name]
+        workspace, _ = _out_key(stage, seen, cache)
+        out_dir = out_dirs[stage.name] = cache.path(stage.name, workspace or key)
+        done[stage.name] = cache.is_done(stage.name, key, workspace)
+
+        if stage.name not in needed:
+            seen[stage.name] = _out_key(stage, seen, cache)[1] or key
+            continue
+
+        row = {"stage": stage.name, "key": key, "seconds": 0.0}
+
+        if done[stage.name] and stage.name not in force:
+            row["status"] = "cached"
+        elif stage.fn is None:
+            os.makedirs(out_dir, exist_ok=True)
+            row["status"] = "external"
+        else:
+            inputs = {d: out_dirs[d] for d in stage.deps}
+            not_ready = [d for d in stage.deps if not done[d]]
+            if not_ready:
+                raise RuntimeError(f"{stage.name}: inputs not available: {not_ready}")
+
+            if stage.incremental and stage.name not in force and cache.base(stage.name, workspace):
+                # Outputs of earlier runs stay; the stage adds what is missing
+                row["status"] = "updated"
+            else:
+                # A half-written dir from an interrupted run is discarded
+                _start_dir(out_dir, stage.incremental)
+                row["status"] = "ran"
+
+            print(f"▶ {stage.name} ({key})")
+            t0 = time.perf_counter()
+            stage.fn(StageContext(stage, key, out_dir, inputs))
+            row["seconds"] = time.perf_counter() - t0
+
+            cache.commit(stage.name, workspace or key, {
+                "stage": stage.name,
+                "key": key,
+                "version": stage.version,
+                "params": stage.params,
+                "inputs": inputs,
+                "base": cache.base(stage.name, workspace) if stage.incremental else None,
+                "seconds": row["seconds"],
+                "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+            done[stage.name] = True
+
+        # Read after the run: a reset gives the workspace a new base
+        seen[stage.name] = _out_key(stage, seen, cache)[1] or key
+        row["out_dir"] = out_dir
+        report.append(row)
+
+    return report
+
+
+def print_report(report):
+    for row in report:
+        seconds = f"{row['seconds']:.1f} s" if row["status"] in ("ran", "updated") else ""
+        print(f"{row['stage']:12s} {row['key']}  {row['status']:9s} {seconds}")
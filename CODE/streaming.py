@@ -0,0 +1,423 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from predict import CONFIG as PREDICT_CONFIG, load_scorer, score_images, aggregate
+from models import model_inputs
+from quality import screen_windows
+from rpeak_detection import detect
+from scalogram import ECG_WAVELET, ECG_SCALES, PCG_WAVELET, PCG_SCALES, filter_bank, kernel_length, to_image
+from scalogram_store import scalogram_images
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+CONFIG = dict(
+    PREDICT_CONFIG,
+    cwt="window",           # "window": CWT per window (as in training); "stream": shared overlap-save CWT,
+                            # each window then waits hop_sec + the wavelet context (~4 s) for its coefficients
+    buffer_sec=12.0,        # signal history kept; bounds memory
+    detect_every_sec=0.5,   # R-peak detection cadence
+    detect_lookback_sec=6.0,
+    detect_guard_sec=0.4,   # peaks this close to the newest sample wait for the next run
+    refractory_sec=0.25,
+    overlap=False,          # True: a window for every beat (overlapping), where the stream CWT pays off
+    hop_sec=2.0,            # stream CWT block
+    history=32,             # segment probabilities kept for the running record score
+)
+
+
+# ============================================================
+# RING BUFFER
+# ============================================================
+class RingBuffer:
+    """
+    The last `capacity` samples of a multi-channel stream, addressed by
+    absolute sample index. Memory is fixed at construction.
+    """
+
+    def __init__(self, capacity, n_channels=1, dtype=np.float32):
+        self.capacity = int(capacity)
+        self.data = np.zeros((n_channels, self.capacity), dtype=dtype)
+        self.end = 0   # samples written so far
+
+    @property
+    def start(self):
+        return max(0, self.end - self.capacity)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def append(self, chunk):
+        chunk = np.atleast_2d(chunk)
+        total = chunk.shape[1]
+
+        # Longer than the buffer: only the newest samples survive anyway
+        chunk = chunk[:, -self.capacity:]
+        n = chunk.shape[1]
+        pos = (self.end + total - n) % self.capacity
+        first = min(n, self.capacity - pos)
+
+        self.data[:, pos:pos + first] = chunk[:, :first]
+        self.data[:, :n - first] = chunk[:, first:]
+        self.end += total
+
+    def get(self, a, b):
+        """Samples [a, b) as (channels, b - a); indices before 0 read as zeros."""
+        if b > self.end or max(a, 0) < self.start:
+            raise IndexError(f"[{a}, {b}) outside buffered [{self.start}, {self.end})")
+
+        out = np.zeros((self.data.shape[0], b - a), dtype=self.data.dtype)
+        lo = max(a, 0)
+        idx = np.arange(lo, b) % self.capacity
+        out[:, lo - a:] = self.data[:, idx]
+        return out
+
+
+# ============================================================
+# ONLINE R-PEAKS + WINDOWS
+# ============================================================
+class OnlineRPeakDetector:
+    """
+    Runs the offline detector (rpeak_detection.detect) on the recent tail
+    of the buffer every detect_every_sec. Peaks within detect_guard_sec of
+    the newest sample are left for the next run, where the filters have
+    settled; each peak is reported once.
+    """
+
+    def __init__(self, fs, config=CONFIG):
+        self.fs = fs
+        self.detector = config["detector"]
+        self.every = int(config["detect_every_sec"] * fs)
+        self.lookback = int(config["detect_lookback_sec"] * fs)
+        self.guard = int(config["detect_guard_sec"] * fs)
+        self.refractory = int(config["refractory_sec"] * fs)
+
+        self.last_run = 0
+        self.last_peak = -self.refractory - 1
+
+    def update(self, buffer):
+        if buffer.end - self.last_run < self.every:
+            return []
+        self.last_run = buffer.end
+
+        start = max(buffer.start, buffer.end - self.lookback)
+        ecg = buffer.get(start, buffer.end)[0]
+        peaks = np.asarray(detect(ecg, self.fs, self.detector), dtype=np.int64) + start
+
+        new = []
+        for r in peaks:
+            if r > buffer.end - self.guard or r <= self.last_peak + self.refractory:
+                continue
+            new.append(int(r))
+            self.last_peak = int(r)
+        return new
+
+
+class StreamSegmenter:
+    """
+    Chunks in, R-centred windows out as soon as their last sample has
+    arrived; same policy as segmentation.segment_windows (fixed length,
+    no overlap unless config["overlap"]).
+    """
+
+    def __init__(self, fs, config=CONFIG):
+        self.fs = fs
+        self.half = int((config["window_sec"] / 2) * fs)
+        self.length = int(config["window_sec"] * fs)
+        self.overlap = config["overlap"]
+
+        self.buffer = RingBuffer(int(config["buffer_sec"] * fs), n_channels=2)
+        self.detector = OnlineRPeakDetector(fs, config)
+
+        # Peaks whose window is not complete yet; never more than a window's worth
+        self.pending = deque(maxlen=int(config["window_sec"] / config["refractory_sec"]) + 1)
+        self.last_end = -1
+
+    def push(self, ecg_chunk, pcg_chunk):
+        self.buffer.append(np.stack([ecg_chunk, pcg_chunk]))
+        self.pending.extend(self.detector.update(self.buffer))
+
+        windows = []
+        while self.pending and self.pending[0] + self.half <= self.buffer.end:
+            r = self.pending.popleft()
+            start, end = r - self.half, r + self.half
+
+            if start < self.buffer.start or end - start != self.length:
+                continue
+            if not self.overlap and start <= self.last_end:
+                continue
+
+            windows.append((start, end, r))
+            self.last_end = end
+        return windows
+
+
+# ============================================================
+# STREAMING CWT (shared across overlapping windows)
+# ============================================================
+class StreamingCWT:
+    """
+    |CWT| of one channel of the stream, computed block by block
+    (overlap-save): each hop of samples is transformed once, together
+    with enough context on both sides that its coefficients are exact for
+    the continuous signal, and stored in a fixed ring buffer. A window's
+    scalogram is then a slice, however many windows overlap it.
+
+    Coefficients are available context_sec later than the samples, and
+    they differ from a CWT of the isolated window near its edges (no zero
+    padding) - see benchmark() for the image fidelity.
+    """
+
+    def __init__(self, wavelet, scales, fs, hop, capacity, channel):
+        self.hop = int(hop)
+        self.channel = channel
+
+        self.context = kernel_length(wavelet, scales) // 2 + 2
+        self.bank = filter_bank(wavelet, scales, self.hop + 2 * self.context)
+
+        self.coefs = RingBuffer(capacity, n_channels=len(scales))
+        self.done = 0
+
+    @property
+    def lag(self):
+        return self.hop + self.context
+
+    @property
+    def nbytes(self):
+        return self.coefs.nbytes
+
+    def update(self, signal_buffer):
+        while signal_buffer.end >= self.done + self.hop + self.context:
+            a = self.done - self.context
+            x = signal_buffer.get(a, self.done + self.hop + self.context)[self.channel]
+            cwt = self.bank.transform(x)[0]
+            self.coefs.append(cwt[:, self.context:self.context + self.hop])
+            self.done += self.hop
+
+    def get(self, a, b):
+        return self.coefs.get(a, b)
+
+
+# ============================================================
+# STREAMING PREDICTOR
+# ============================================================
+class StreamingPredictor:
+    """
+    push(ecg_chunk, pcg_chunk) -> list of scored windows. Memory is fixed
+    by buffer_sec (signal), the stream CWT rings and the pending queues,
+    independent of how long the stream runs (see nbytes).
+    """
+
+    def __init__(self, fs, checkpoint=None, config=None, device="cpu", model=None):
+        self.config = dict(CONFIG, **(config or {}))
+        self.fs = fs
+        self.device = device
+        self.model = model if model is not None else load_scorer(checkpoint, self.config["variant"], device)
+        self.inputs = model_inputs(self.config["variant"])
+
+        self.segmenter = StreamSegmenter(fs, self.config)
+        self.probs = deque(maxlen=self.config["history"])
+
+        self.cwt = None
+        if self.config["cwt"] == "stream":
+            hop = int(self.config["hop_sec"] * fs)
+            capacity = self.segmenter.buffer.capacity
+            self.cwt = {
+                "ecg": StreamingCWT(ECG_WAVELET, ECG_SCALES, fs, hop, capacity, 0),
+                "pcg": StreamingCWT(PCG_WAVELET, PCG_SCALES, fs, hop, capacity, 1),
+            }
+
+        # Complete windows waiting for their coefficients: at most one per
+        # refractory period over the CWT lag, plus one detection run's worth
+        self.waiting = deque()
+        self.waiting_capacity = int(self.lag / (self.config["refractory_sec"] * fs)) + 1 + self.segmenter.pending.maxlen
+
+    @property
+    def lag(self):
+        """Samples between a window's last sample and its coefficients (0 in window mode)."""
+        return max(c.lag for c in self.cwt.values()) if self.cwt else 0
+
+    @property
+    def nbytes(self):
+        total = self.segmenter.buffer.nbytes
+        if self.cwt:
+            total += sum(c.nbytes for c in self.cwt.values())
+        return total
+
+    def _images(self, windows):
+        buffer = self.segmenter.buffer
+        if self.cwt is None:
+            ecg = np.stack([buffer.get(s, e)[0] for s, e, _ in windows])
+            pcg = np.stack([buffer.get(s, e)[1] for s, e, _ in windows])
+            return scalogram_images(ecg, pcg)
+
+        return tuple(
+            to_image(np.stack([self.cwt[m].get(s, e) for s, e, _ in windows]))
+            for m in ("ecg", "pcg")
+        )
+
+    def push(self, ecg_chunk, pcg_chunk):
+        t0 = time.perf_counter()
+        buffer = self.segmenter.buffer
+
+        self.waiting.extend(self.segmenter.push(ecg_chunk, pcg_chunk))
+        if len(self.waiting) > self.waiting_capacity:
+            # Never drop windows silently; the capacity bound above is off
+            raise RuntimeError(
+                f"{len(self.waiting)} windows waiting for coefficients, capacity {self.waiting_capacity}"
+            )
+        if self.cwt:
+            for c in self.cwt.values():
+                c.update(buffer)
+
+        # Windows whose coefficients are complete (immediately in window mode)
+        ready_until = min(c.done for c in self.cwt.values()) if self.cwt else buffer.end
+        ready = []
+        while self.waiting and self.waiting[0][1] <= ready_until:
+            ready.append(self.waiting.popleft())
+
+        if self.config["qc"] is not None and ready:
+            signals = buffer.get(buffer.start, buffer.end)
+            local = [(s - buffer.start, e - buffer.start, r) for s, e, r in ready]
+            keep, _ = screen_windows(signals[0], signals[1], self.fs, local, self.config["qc"])
+            ready = [w for w, k in zip(ready, keep) if k]
+
+        if not ready:
+            return []
+
+        ecg_img, pcg_img = self._images(ready)
+        probs = score_images(self.model, self.inputs, ecg_img, pcg_img, self.device)
+        self.probs.extend(probs)
+
+        compute_ms = 1000 * (time.perf_counter() - t0)
+        return [
+            {"start": s, "end": e, "rpeak": r, "probability": float(p),
+             "emitted_at": buffer.end, "compute_ms": compute_ms}
+            for (s, e, r), p in zip(ready, probs)
+        ]
+
+    def record_probability(self):
+        """Running record-level score over the last `history` windows."""
+        if not self.probs:
+            return float("nan")
+        return aggregate(np.asarray(self.probs), self.config["aggregate"], self.config["threshold"])
+
+
+# ============================================================
+# LATENCY BENCHMARK
+# ============================================================
+def replay(predictor, ecg, pcg, chunk_sec=0.1):
+    """
+    Feeds a recording chunk by chunk. Latency of a window = time from the
+    arrival of its last sample (real-time clock, chunk granularity) to its
+    probability: the samples the pipeline waited for plus the compute of
+    the push that produced it.
+    """
+    fs = predictor.fs
+    chunk = max(int(chunk_sec * fs), 1)
+
+    results = []
+    push_ms = []
+    memory = []
+
+    for a in range(0, len(ecg), chunk):
+        t0 = time.perf_counter()
+        out = predictor.push(ecg[a:a + chunk], pcg[a:a + chunk])
+        push_ms.append(1000 * (time.perf_counter() - t0))
+        memory.append(predictor.nbytes)
+
+        for r in out:
+            waited_ms = 1000 * (r["emitted_at"] - r["end"]) / fs
+            r["latency_ms"] = waited_ms + r["compute_ms"]
+            results.append(r)
+
+    latency = np.array([r["latency_ms"] for r in results]) if results else np.zeros(1)
+    return {
+        "windows": len(results),
+        "latency_mean_ms": float(latency.mean()),
+        "latency_p95_ms": float(np.percentile(latency, 95)),
+        "latency_max_ms": float(latency.max()),
+        "push_p95_ms": float(np.percentile(push_ms, 95)),
+        "realtime_factor": sum(push_ms) / 1000 / (len(ecg) / fs),
+        "memory_bytes": max(memory),
+        "memory_constant": len(set(memory)) == 1,
+        # The tail the stream CWT had no right context for yet
+        "unscored_at_end": len(predictor.waiting),
+        "cwt_lag_ms": 1000 * predictor.lag / fs,
+        "results": results,
+    }
+
+
+def benchmark(ecg, pcg, fs, checkpoint=None, chunk_sec=0.1, config=None):
+    """Both CWT modes on one recording, plus image fidelity of stream vs window CWT."""
+    reports = {}
+    model = None
+    for mode in ("window", "stream"):
+        predictor = StreamingPredictor(fs, checkpoint, dict(config or {}, cwt=mode), model=model)
+        model = predictor.model
+        reports[mode] = replay(predictor, ecg, pcg, chunk_sec)
+
+    # Same windows through both CWT paths
+    windows = [(r["start"], r["end"], r["rpeak"]) for r in reports["stream"]["results"]][:8]
+    if windows:
+        ecg_w = np.stack([ecg[s:e] for s, e, _ in windows])
+        pcg_w = np.stack([pcg[s:e] for s, e, _ in windows])
+        reference = scalogram_images(ecg_w, pcg_w)
+
+        stream = StreamingPredictor(fs, config=dict(config or {}, cwt="stream"), model=model)
+        stream.segmenter.buffer = RingBuffer(len(ecg), n_channels=2)
+        for c in stream.cwt.values():
+            c.coefs = RingBuffer(len(ecg), n_channels=c.coefs.data.shape[0])
+        stream.segmenter.buffer.append(np.stack([ecg, pcg]))
+        for c in stream.cwt.values():
+            c.update(stream.segmenter.buffer)
+        streamed = stream._images(windows)
+
+        reports["fidelity"] = {
+            m: float(np.corrcoef(ref.astype(np.float32).ravel(), img.astype(np.float32).ravel())[0, 1])
+            for m, ref, img in zip(("ecg", "pcg"), reference, streamed)
+        }
+    return reports
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    import sys
+    import wfdb
+    from channel_index import extract_ecg_pcg
+
+    if len(sys.argv) < 3:
+        print("Usage: python streaming.py <checkpoint> <record_path> [chunk_ms]")
+        sys.exit(1)
+
+    chunk_sec = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.1
+
+    record = wfdb.rdrecord(sys.argv[2])
+    ecg, pcg = extract_ecg_pcg(record.p_signal, record.sig_name)
+
+    reports = benchmark(ecg, pcg, record.fs, sys.argv[1], chunk_sec)
+
+    print(f"\n✅ Streaming benchmark ({len(ecg) / record.fs:.1f} s record, {chunk_sec * 1000:.0f} ms chunks)")
+    for mode in ("window", "stream"):
+        r = reports[mode]
+        print(
+            f"- {mode:6s} CWT: {r['windows']} windows | latency mean {r['latency_mean_ms']:.0f} ms, "
+            f"p95 {r['latency_p95_ms']:.0f} ms, max {r['latency_max_ms']:.0f} ms | "
+            f"push p95 {r['push_p95_ms']:.1f} ms | real-time factor {r['realtime_factor']:.2f} | "
+            f"memory {r['memory_bytes'] / 2**20:.1f} MiB ({'constant' if r['memory_constant'] else 'varies'})"
+        )
+    stream = reports["stream"]
+    print(
+        f"- Stream CWT shares the transform across overlapping windows, at the price of "
+        f"{stream['cwt_lag_ms'] / 1000:.1f} s extra latency (hop + wavelet context) per window; "
+        f"{stream['unscored_at_end']} windows of the last {stream['cwt_lag_ms'] / 1000:.1f} s were still "
+        f"waiting for coefficients when the recording ended"
+    )
+    if "fidelity" in reports:
+        print(f"- Stream vs window CWT image correlation: "
+              f"ECG {reports['fidelity']['ecg']:.3f}, PCG {reports['fidelity']['pcg']:.3f}")
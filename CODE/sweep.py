@@ -0,0 +1,365 @@
+import os
+import sys
+import json
+import time
+import random
+import itertools
+import multiprocessing
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+SWEEP_DIR = r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\MODELS\SWEEP"
+RESULTS_FILE = "sweep_results.csv"   # read by log_run.log_ablation_study
+CACHE_DIR = "CACHE"
+
+N_THREADS = os.cpu_count() or 1
+THREADS_PER_TRIAL = 2
+
+CONFIG = {
+    # Axes: a list is sampled from (random) or crossed (grid);
+    # {"loguniform": [lo, hi]} is only valid for random search
+    "space": {
+        "variant": ["fusion", "ecg_only", "pcg_only"],
+        "lr": [1e-4, 3e-4, 1e-3],
+        "batch_size": [16, 32],
+        "patience": [5],
+        "cwt": ["full"],            # scalogram settings, see "scalograms"; add "multirate" to check its AUC
+    },
+    "search": "grid",               # "grid" or "random"
+    "n_trials": 12,                 # random search only
+    "seed": 42,
+    "epochs": 50,
+    "threads_per_trial": THREADS_PER_TRIAL,
+    "workers": max(N_THREADS // THREADS_PER_TRIAL, 1),
+    # Label CSVs of 7-ablation_model (train/val filtered by base id, test);
+    # augmented ids (<segment_id>_<aug_type>) are read as their segment
+    "train_csv": r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\6-SCALOGRAMS\train_train_labels_filtered.csv",
+    "val_csv": r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\6-SCALOGRAMS\train_val_labels_filtered.csv",
+    "test_csv": r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\6-SCALOGRAMS\test_scalogram_labels.csv",
+    # Original train segments: augmented and turned into scalograms on the fly for training
+    "segments": r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\SIGNAL_STORE\train_segments",
+    # cwt value -> scalogram root (scalogram_runner out_root: <root>/STORE/<split>).
+    # Missing stores are built with scalogram_runner using that cwt mode.
+    "scalograms": {
+        "full": r"E:\PROJECTS\CARDIAC-PROJECT-UPDATED\DATASET\6-SCALOGRAMS",
+        "multirate": os.path.join(SWEEP_DIR, "SCALOGRAMS", "multirate"),
+    },
+    "out_dir": SWEEP_DIR,
+}
+
+RESULT_COLUMNS = [
+    "trial", "variant", "lr", "batch_size", "patience", "cwt",
+    "best_val_auc", "epochs_run", "stopped_early",
+    "test_accuracy", "test_f1", "test_auc",
+    "seconds", "images_per_s", "threads",
+]
+
+
+def load_config(path=None):
+    """CONFIG, updated with the keys of a JSON file if one is given."""
+    config = dict(CONFIG)
+    if path is not None:
+        with open(path, encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+
+# ============================================================
+# SEARCH SPACE
+# ============================================================
+def trial_key(params):
+    """Stable name of a trial: its directory and its row in the results table."""
+    return (
+        f"{params['variant']}_lr{params['lr']:.1e}_bs{params['batch_size']}"
+        f"_p{params['patience']}_{params['cwt']}"
+    )
+
+
+def grid_trials(space):
+    keys = sorted(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_trials(space, n_trials, seed):
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(n_trials):
+        params = {}
+        for k in sorted(space):
+            axis = space[k]
+            if isinstance(axis, dict):
+                lo, hi = axis["loguniform"]
+                params[k] = float(np.exp(rng.uniform(np.log(lo), np.log(hi))))
+            else:
+                params[k] = rng.choice(axis)
+        trials.append(params)
+    return trials
+
+
+def make_trials(config):
+    """Trials of the configured search, without duplicates, in a fixed order."""
+    if config["search"] == "grid":
+        trials = grid_trials(config["space"])
+    elif config["search"] == "random":
+        trials = random_trials(config["space"], config["n_trials"], config["seed"])
+    else:
+        raise ValueError(f"Unknown search: {config['search']}")
+
+    unique = {}
+    for params in trials:
+        unique.setdefault(trial_key(params), params)
+    return unique
+
+
+# ============================================================
+# SHARED DATA
+# ============================================================
+# Every trial of one cwt setting reads the same decoded arrays: the
+# parent decodes val and test once into a CachedScalogramDataset cache
+# (.npy), trials open it read-only with mmap, so the OS keeps one copy
+# in the page cache however many trials run. Training batches are drawn
+# from the original segments, augmented and transformed per epoch
+# (augmentation.augmented_loader), so no 4× store is kept.
+
+
+def store_path(config, cwt, split):
+    return os.path.join(config["scalograms"][cwt], "STORE", split)
+
+
+def cache_path(config, cwt, split):
+    return os.path.join(config["out_dir"], CACHE_DIR, cwt, split)
+
+
+def label_path(config, name):
+    return os.path.join(config["out_dir"], CACHE_DIR, "labels", f"{name}_labels.csv")
+
+
+def write_label_csvs(config):
+    """train/val/test label CSVs of config with segment ids (id, label), once each."""
+    from augmentation import base_id
+
+    os.makedirs(os.path.dirname(label_path(config, "train")), exist_ok=True)
+    for name in ("train", "val", "test"):
+        df = pd.read_csv(config[f"{name}_csv"])
+        ids = df[[c for c in df.columns if c != "label"][0]].astype(str).map(base_id)
+        labels = pd.DataFrame({"id": ids, "label": df["label"]}).drop_duplicates("id")
+
+        tmp_path = label_path(config, name) + ".tmp"
+        labels.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, label_path(config, name))
+
+
+def split_datasets(config, cwt):
+    """{val, test}: CachedScalogramDataset on the shared cache."""
+    from scalogram_dataset import CachedScalogramDataset
+
+    return {
+        name: CachedScalogramDataset(
+            store=store_path(config, cwt, split), label_csv=label_path(config, name), cache_dir=cache_path(config, cwt, name),
+        )
+        for name, split in [("val", "train"), ("test", "test")]
+    }
+
+
+def train_loader(config, cwt, batch_size):
+    """Shuffled, augmented scalogram batches of the train segments; fit() advances the epoch."""
+    from augmentation import augmented_loader
+    from scalogram_dataset import ScalogramTransform
+    from scalogram_runner import load_config as scalogram_config
+    from signal_store import SignalStore
+
+    ids = pd.read_csv(label_path(config, "train"), dtype={"id": str})["id"].tolist()
+    transform = ScalogramTransform(scalogram_config()["mode"], cwt)
+    return augmented_loader(SignalStore(config["segments"]), ids, transform, batch_size)
+
+
+def prepare_data(config, cwts):
+    """Builds missing scalogram stores, then the shared caches (parent process, before any trial)."""
+    from scalogram_store import META_FILE
+    from scalogram_runner import load_config as scalogram_config, run
+
+    write_label_csvs(config)
+    for cwt in cwts:
+        if not all(os.path.exists(os.path.join(store_path(config, cwt, s), META_FILE)) for s in ["train", "test"]):
+            print(f"Building {cwt} scalogram stores in {config['scalograms'][cwt]}")
+            scalograms = scalogram_config()
+            scalograms.update({"output": "store", "cwt": cwt, "out_root": config["scalograms"][cwt]})
+            run(scalograms)
+
+        datasets = split_datasets(config, cwt)
+        print(f"Cache {cwt}: " + ", ".join(f"{name} {len(ds)}" for name, ds in datasets.items()))
+
+
+# ============================================================
+# TRIAL (runs in a worker process)
+# ============================================================
+def _init_worker(threads):
+    import torch
+
+    # Fixed budget per trial, so concurrent trials don't oversubscribe the cores
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def run_trial(key, params, config):
+    """
+    Trains one variant with AblationRunner (val-AUC early stopping with
+    the trial's patience, checkpoint/resume in the trial directory),
+    then tests its best weights. Returns the results-table row.
+    """
+    import torch
+    from ablation import AblationRunner
+    from scalogram_dataset import batch_loader
+
+    trial_dir = os.path.join(config["out_dir"], key)
+    os.makedirs(trial_dir, exist_ok=True)
+    # Spawned workers don't see the parent's sink settings; events are tagged with the trial
+    metrics.configure(config.get("metrics_file"), run_id=f"sweep-{key}")
+
+    t0 = time.perf_counter()
+    with open(os.path.join(trial_dir, "train.log"), "a", encoding="utf-8") as log, redirect_stdout(log):
+        torch.manual_seed(config["seed"])
+        datasets = split_datasets(config, params["cwt"])
+        train = train_loader(config, params["cwt"], params["batch_size"])
+
+        labels = train.dataset.labels
+        pos_weight = float((labels == 0).sum() / max(int((labels == 1).sum()), 1))
+
+        runner = AblationRunner(
+            variants=[params["variant"]], device="cpu", pos_weight=pos_weight, lr=params["lr"],
+            model_dir=trial_dir, threads=config["threads_per_trial"], interop_threads=1,
+        )
+        runner.fit(
+            train,
+            batch_loader(datasets["val"], batch_size=params["batch_size"]),
+            epochs=config["epochs"], patience=params["patience"],
+        )
+        runner.load_best()
+        test = runner.test(batch_loader(datasets["test"], batch_size=params["batch_size"]))[params["variant"]]
+
+    history = runner.history[params["variant"]]
+    return {
+        "trial": key,
+        **params,
+        "best_val_auc": runner.best_auc[params["variant"]],
+        "epochs_run": len(history),
+        "stopped_early": params["variant"] not in runner.active,
+        "test_accuracy": test["Accuracy"],
+        "test_f1": test["F1"],
+        "test_auc": test["AUC"],
+        "seconds": time.perf_counter() - t0,
+        "images_per_s": getattr(runner, "epoch_stats", {}).get("images_per_s"),
+        "threads": config["threads_per_trial"],
+    }
+
+
+# ============================================================
+# RESULTS TABLE
+# ============================================================
+# One row per finished trial, rewritten atomically by the parent only.
+# Rows already there are not run again, so an interrupted sweep resumes
+# (and an unfinished trial itself resumes from its ablation_state.pt).
+
+def results_path(config):
+    return os.path.join(config["out_dir"], RESULTS_FILE)
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return pd.read_csv(path)
+
+
+def save_results(results, path):
+    tmp_path = path + ".tmp"
+    results[RESULT_COLUMNS].to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def best_trials(results):
+    """Per variant, the trial with the highest validation AUC (test metrics are never used to pick)."""
+    if results.empty:
+        return results
+    best = results.loc[results.groupby("variant")["best_val_auc"].idxmax()]
+    return best.sort_values("best_val_auc", ascending=False)
+
+
+# ============================================================
+# SCHEDULER
+# ============================================================
+def run_sweep(config):
+    config = {"metrics_file": metrics.METRICS_FILE, **config}
+    os.makedirs(config["out_dir"], exist_ok=True)
+    path = results_path(config)
+
+    trials = make_trials(config)
+    results = load_results(path)
+    pending = {k: p for k, p in trials.items() if k not in set(results["trial"])}
+
+    print(
+        f"{len(trials)} trials ({config['search']}): {len(trials) - len(pending)} done, {len(pending)} pending | "
+        f"{config['workers']} workers × {config['threads_per_trial']} threads"
+    )
+    if not pending:
+        return results
+
+    prepare_data(config, sorted({p["cwt"] for p in pending.values()}))
+
+    t0 = time.perf_counter()
+    # spawn: workers start clean instead of forking the parent's torch thread pools
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=config["workers"], mp_context=context,
+        initializer=_init_worker, initargs=(config["threads_per_trial"],),
+    ) as pool:
+        futures = {pool.submit(run_trial, key, params, config): key for key, params in pending.items()}
+
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                print(f"❌ {key}: {e!r} (see {os.path.join(config['out_dir'], key, 'train.log')})")
+                continue
+
+            results = pd.concat([results, pd.DataFrame([row])], ignore_index=True) if len(results) else pd.DataFrame([row])
+            save_results(results, path)
+            metrics.emit("sweep", "trial", **row)
+
+            print(
+                f"[{len(results)}/{len(trials)}] {key} | val AUC {row['best_val_auc']:.4f} | "
+                f"test AUC {row['test_auc']:.4f} | {row['epochs_run']} epochs"
+                f"{' (early stop)' if row['stopped_early'] else ''} | {row['seconds']:.0f} s"
+            )
+
+    print(f"\n✅ Sweep finished in {time.perf_counter() - t0:.0f} s, results in {path}")
+    return results
+
+
+def print_best(results):
+    print(f"{'variant':10s} {'trial':40s} {'val AUC':>8s} {'test AUC':>9s} {'test F1':>8s}")
+    for row in best_trials(results).itertuples(index=False):
+        print(f"{row.variant:10s} {row.trial:40s} {row.best_val_auc:8.4f} {row.test_auc:9.4f} {row.test_f1:8.4f}")
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print("Usage: python sweep.py [config.json]   (keys of CONFIG; results in <out_dir>/sweep_results.csv)")
+        sys.exit(0)
+
+    results = run_sweep(load_config(sys.argv[1] if len(sys.argv) > 1 else None))
+    print_best(results)
@@ -0,0 +1,92 @@
+import numpy as np
+from torch.utils.data import DataLoader
+
+from augmentation import AUG_TYPES, augment_variant, augmented_loader
+from scalogram_dataset import CachedScalogramDataset, ScalogramTransform
+from scalogram_store import build_scalogram_store
+from signal_store import SignalStore, SignalStoreWriter
+
+FS = 2000
+
+
+def segment_store(path, n=3, n_samples=FS):
+    rng = np.random.default_rng(0)
+    with SignalStoreWriter(path) as writer:
+        for i in range(n):
+            writer.add(f"r{i:03d}_seg000", rng.standard_normal(n_samples), rng.standard_normal(n_samples), FS,
+                       label=1 if i % 2 else -1)
+    return SignalStore(path)
+
+
+def test_on_the_fly_batches_match_the_materialised_store(tmp_path):
+    segments = segment_store(str(tmp_path / "segments"))
+    epoch = 2
+
+    # What the 4× train_augmented store + its scalogram store used to serve
+    with SignalStoreWriter(str(tmp_path / "augmented")) as writer:
+        for segment_id, ecg, pcg, fs in segments.items():
+            for aug_type in AUG_TYPES:
+                ecg_a, pcg_a = augment_variant(segment_id, ecg, pcg, aug_type, fs, epoch=epoch)
+                writer.add(f"{segment_id}_{aug_type}", ecg_a, pcg_a, fs, label=segments.meta(segment_id)["label"])
+    build_scalogram_store(SignalStore(str(tmp_path / "augmented")), str(tmp_path / "scalograms"))
+    stored = CachedScalogramDataset(store=str(tmp_path / "scalograms"))
+    rows = {name: i for i, name in enumerate(stored.names)}
+
+    loader = augmented_loader(segments, transform=ScalogramTransform(), batch_size=5)
+    loader.collate_fn.set_epoch(epoch)
+    dataset = loader.dataset
+    assert len(dataset) == len(AUG_TYPES) * len(segments)
+
+    # Same collate, in dataset order, so every row can be matched to its name
+    batches = list(DataLoader(dataset, batch_size=5, collate_fn=loader.collate_fn))
+    ecg = np.concatenate([b[0].numpy() for b in batches])
+    pcg = np.concatenate([b[1].numpy() for b in batches])
+    y = np.concatenate([b[2].numpy() for b in batches])
+
+    expected = stored[[rows[name] for name in dataset.names]]
+    assert np.allclose(ecg, expected[0].numpy(), atol=1e-6)
+    assert np.allclose(pcg, expected[1].numpy(), atol=1e-6)
+    assert np.array_equal(y, expected[2].numpy()) and np.array_equal(y, dataset.labels)
+
+
+def test_variants_are_keyed_not_drawn_from_shared_state():
+    rng = np.random.default_rng(1)
+    ecg, pcg = rng.standard_normal(FS), rng.standard_normal(FS)
+
+    variant = augment_variant("r000_seg000", ecg, pcg, "mix", FS, epoch=1)
+    np.random.seed(123)
+    assert all(np.array_equal(a, b) for a, b in zip(variant, augment_variant("r000_seg000", ecg, pcg, "mix", FS, epoch=1)))
+
+    others = [
+        augment_variant("r000_seg001", ecg, pcg, "mix", FS, epoch=1),
+        augment_variant("r000_seg000", ecg, pcg, "mix", FS, epoch=2),
+        augment_variant("r000_seg000", ecg, pcg, "mix", FS, seed=7, epoch=1),
+    ]
+    assert not any(np.array_equal(variant[1], other[1]) for other in others)
+
+    orig = augment_variant("r000_seg000", ecg, pcg, "orig", FS)
+    assert np.allclose(orig[0], ecg) and np.allclose(orig[1], pcg)
+
+
+def test_batch_rows_do_not_depend_on_the_batch(tmp_path):
+    segments = segment_store(str(tmp_path / "segments"), n=5)
+    loader = augmented_loader(segments)
+    loader.collate_fn.set_epoch(3)
+    dataset = loader.dataset
+
+    def rows(order, batch_size):
+        out = {}
+        for a in range(0, len(order), batch_size):
+            idx = order[a:a + batch_size]
+            ecg, pcg, _ = loader.collate_fn([dataset[i] for i in idx])
+            out.update({dataset.names[i]: (e, p) for i, e, p in zip(idx, ecg.numpy(), pcg.numpy())})
+        return out
+
+    in_order = rows(list(range(len(dataset))), 4)
+    shuffled = rows(list(np.random.default_rng(0).permutation(len(dataset))), 7)
+
+    for name, (ecg, pcg) in in_order.items():
+        segment_id, aug_type = name.rsplit("_", 1)
+        expected = augment_variant(segment_id, segments.ecg(segment_id), segments.pcg(segment_id), aug_type, FS, epoch=3)
+        assert np.array_equal(ecg, shuffled[name][0]) and np.array_equal(pcg, shuffled[name][1])
+        assert np.allclose(ecg, expected[0], atol=1e-6) and np.allclose(pcg, expected[1], atol=1e-6)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from evaluation import RecordBatchSampler, pool, record_of
+
+PROBS = np.array([0.2, 0.9, 0.7, 0.1, 0.4, 0.6])
+GROUPS = np.array([0, 0, 1, 2, 2, 2])
+
+
+def by_hand(method):
+    rows = [PROBS[GROUPS == g] for g in range(3)]
+    if method == "mean":
+        return [r.mean() for r in rows]
+    if method == "max":
+        return [r.max() for r in rows]
+    return [(r > 0.5).mean() for r in rows]
+
+
+@pytest.mark.parametrize("method", ["mean", "max", "vote"])
+def test_pool_matches_per_record_computation(method):
+    assert np.allclose(pool(PROBS, GROUPS, method), by_hand(method))
+
+
+def test_pool_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        pool(PROBS, GROUPS, "median")
+
+
+def test_record_of():
+    assert record_of("a0001_seg003") == "a0001"
+    assert record_of("a0001_seg003_mix") == "a0001"
+    assert record_of("x_1_seg010_orig") == "x_1"
+    assert record_of("a0001") == "a0001"
+
+
+def test_batches_hold_whole_records():
+    record_ids = ["b"] * 3 + ["a"] * 2 + ["c"] * 7 + ["a"] + ["d"] * 2
+    batches = list(RecordBatchSampler(record_ids, batch_size=4))
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(record_ids)))
+    assert all(len(batch) <= 4 for batch in batches)
+    for record in "abd":
+        assert sum(any(record_ids[i] == record for i in batch) for batch in batches) == 1
@@ -0,0 +1,62 @@
+import numpy as np
+import neurokit2 as nk
+
+import metrics
+import scalogram_runner
+from scalogram_store import ScalogramStore
+from segmentation import append_segments
+from signal_store import SignalStore, SignalStoreWriter
+
+FS = 2000
+DURATION = 8
+
+
+def add_records(path, record_ids):
+    with SignalStoreWriter(path, resume=True) as writer:
+        for i, record_id in enumerate(record_ids):
+            ecg = nk.ecg_simulate(duration=DURATION, sampling_rate=FS, heart_rate=70, random_state=i)
+            pcg = np.random.default_rng(i).standard_normal(len(ecg))
+            writer.add(record_id, ecg, pcg, FS, label=1 if i % 2 else -1)
+
+
+def snapshot(segment_store, scalogram_store):
+    segments = SignalStore(segment_store)
+    scalograms = ScalogramStore(scalogram_store)
+    return (
+        {k: (segments.ecg(k).copy(), segments.pcg(k).copy()) for k in segments.ids},
+        {k: (scalograms[k][0].copy(), scalograms[k][1].copy()) for k in scalograms.ids},
+    )
+
+
+def test_new_records_leave_existing_outputs_untouched(tmp_path):
+    metrics.configure(str(tmp_path / "metrics.jsonl"), "test")
+    record_store = str(tmp_path / "train_records")
+    segment_store = str(tmp_path / "train_segments")
+    rpeak_cache = str(tmp_path / "rpeaks")
+
+    config = scalogram_runner.load_config()
+    config.update(splits={"train": segment_store}, out_root=str(tmp_path / "scalograms"), workers=1)
+    scalogram_dir = scalogram_runner.output_dir(config, "train")
+
+    add_records(record_store, ["r000", "r001", "r002"])
+    append_segments(SignalStore(record_store), segment_store, rpeak_cache=rpeak_cache)
+    scalogram_runner.run_split(config, "train")
+    old_segments, old_scalograms = snapshot(segment_store, scalogram_dir)
+
+    add_records(record_store, ["r003"])
+    _, _, _, n_new = append_segments(SignalStore(record_store), segment_store, rpeak_cache=rpeak_cache)
+    report = scalogram_runner.run_split(config, "train")
+    segments, scalograms = snapshot(segment_store, scalogram_dir)
+
+    # Only the new record was segmented, and only its segments got scalograms
+    new_ids = sorted(set(segments) - set(old_segments))
+    assert n_new == len(new_ids) > 0
+    assert all(k.startswith("r003_") for k in new_ids)
+    assert report["processed"] == n_new
+    assert sorted(scalograms) == sorted(segments)
+
+    for k, (ecg, pcg) in old_segments.items():
+        assert np.array_equal(segments[k][0], ecg) and np.array_equal(segments[k][1], pcg)
+    for k, (ecg, pcg) in old_scalograms.items():
+        assert np.array_equal(scalograms[k][0], ecg) and np.array_equal(scalograms[k][1], pcg)
+    assert all(scalograms[k][0].any() for k in new_ids)
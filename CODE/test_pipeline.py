@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pandas as pd
+import neurokit2 as nk
+import wfdb
+
+import metrics
+import pipeline
+from signal_store import SignalStore
+from stage_cache import StageCache, run_stages
+
+FS = 2000
+DURATION = 8
+
+
+def write_record(raw_dir, record_id, seed, heart_rate=70):
+    ecg = nk.ecg_simulate(duration=DURATION, sampling_rate=FS, heart_rate=heart_rate, random_state=seed)
+    pcg = np.random.default_rng(seed).standard_normal(len(ecg))
+    wfdb.wrsamp(
+        record_id, fs=FS, units=["mV", "mV"], sig_name=["ECG", "PCG"],
+        p_signal=np.column_stack([ecg, pcg]), fmt=["16", "16"], write_dir=raw_dir,
+    )
+
+
+def write_labels(path, record_ids):
+    pd.DataFrame({"record": record_ids, "label": [1 if i % 2 else -1 for i in range(len(record_ids))]}).to_csv(path, index=False)
+
+
+def segments(report, split):
+    out_dir = {row["stage"]: row["out_dir"] for row in report}["segment"]
+    store = SignalStore(os.path.join(out_dir, f"{split}_segments"))
+    return out_dir, {k: (store.ecg(k).copy(), store.pcg(k).copy()) for k in store.ids}
+
+
+def run(cache):
+    return run_stages(pipeline.build_pipeline(), cache, targets=["segment"])
+
+
+def test_new_record_only_adds_its_own_work(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    labels_csv = str(tmp_path / "LABELS.csv")
+    monkeypatch.setattr(pipeline, "RAW_DATA_DIR", str(raw_dir))
+    monkeypatch.setattr(pipeline, "LABELS_CSV", labels_csv)
+    monkeypatch.setattr(pipeline, "MANIFEST_CSV", str(tmp_path / "no_manifest.csv"))
+    monkeypatch.setattr(pipeline, "RPEAK_CACHE_DIR", str(tmp_path / "rpeaks"))
+    monkeypatch.setattr(pipeline, "N_WORKERS", 1)
+    metrics.configure(str(tmp_path / "metrics.jsonl"), "test")
+    cache = StageCache(str(tmp_path / "stages"))
+
+    record_ids = [f"a{i:04d}" for i in range(6)]
+    for i, record_id in enumerate(record_ids):
+        write_record(str(raw_dir), record_id, i)
+    write_labels(labels_csv, record_ids)
+
+    report = run(cache)
+    assert [row["status"] for row in report] == ["ran", "ran", "ran"]
+    old = {split: segments(report, split) for split in pipeline.SPLITS}
+    assert sum(len(items) for _, items in old.values()) > 0
+    mat = os.path.join(report[0]["out_dir"], "mat", "a0000.mat")
+    converted_at = os.stat(mat).st_mtime_ns
+
+    # One new record: every stage runs again, but in the same directories
+    write_record(str(raw_dir), "a0006", 6)
+    write_labels(labels_csv, record_ids + ["a0006"])
+
+    report = run(cache)
+    assert [row["status"] for row in report] == ["updated", "updated", "updated"]
+    assert os.stat(mat).st_mtime_ns == converted_at
+    for split in pipeline.SPLITS:
+        out_dir, items = segments(report, split)
+        old_dir, old_items = old[split]
+        assert out_dir == old_dir
+        new_ids = set(items) - set(old_items)
+        assert all(k.startswith("a0006_") for k in new_ids)
+        for k, (ecg, pcg) in old_items.items():
+            assert np.array_equal(items[k][0], ecg) and np.array_equal(items[k][1], pcg)
+    assert all(row["status"] == "cached" for row in run(cache))
+
+    # An edited record can't be appended: convert starts over, and the
+    # segments go to fresh workspaces
+    write_record(str(raw_dir), "a0002", 2, heart_rate=90)
+    report = run(cache)
+    assert [row["status"] for row in report] == ["updated", "ran", "ran"]
+    assert all(segments(report, split)[0] != old[split][0] for split in pipeline.SPLITS)
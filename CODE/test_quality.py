@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from quality import screen_windows
+
+FS = 2000
+WINDOW = FS            # 1 s windows
+N_WINDOWS = 8
+
+
+def record(seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(N_WINDOWS * WINDOW) / FS
+    ecg = np.sin(2 * np.pi * 1.2 * t) + 0.05 * rng.standard_normal(len(t))
+    pcg = 0.5 * rng.standard_normal(len(t))
+    return ecg, pcg
+
+
+def windows():
+    return [(i * WINDOW, (i + 1) * WINDOW, i * WINDOW + WINDOW // 2) for i in range(N_WINDOWS)]
+
+
+def damage(signal, i, how):
+    w = slice(i * WINDOW, (i + 1) * WINDOW)
+    if how == "nan":
+        signal[i * WINDOW + 100] = np.nan
+    elif how == "flat":
+        signal[w] = 0.3
+    elif how == "clip":
+        # 5% of the window at a rail well above the rest of the record
+        signal[i * WINDOW:i * WINDOW + WINDOW // 20] = 10.0
+    elif how == "energy":
+        signal[w] *= 1e-3
+
+
+def test_clean_record_passes():
+    ecg, pcg = record()
+    keep, scores = screen_windows(ecg, pcg, FS, windows())
+    assert keep.all() and (scores["reason"] == "").all()
+
+
+@pytest.mark.parametrize("channel", ["ecg", "pcg"])
+@pytest.mark.parametrize("check", ["nan", "flat", "clip", "energy"])
+def test_damaged_window_is_rejected_for_its_reason(channel, check):
+    ecg, pcg = record()
+    damage(ecg if channel == "ecg" else pcg, 3, check)
+
+    keep, scores = screen_windows(ecg, pcg, FS, windows())
+
+    assert list(np.flatnonzero(~keep)) == [3]
+    assert f"{channel}_{check}" in scores["reason"][3].split(";")
+    assert not scores["reason"][3].startswith("ecg" if channel == "pcg" else "pcg")
+
+
+def test_short_flat_stretch_is_kept():
+    ecg, pcg = record()
+    ecg[3 * WINDOW:3 * WINDOW + int(0.4 * FS)] = 0.0
+
+    keep, _ = screen_windows(ecg, pcg, FS, windows())
+    assert keep.all()
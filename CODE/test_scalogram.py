@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+import pywt
+
+from scalogram import ECG_WAVELET, ECG_SCALES, PCG_WAVELET, PCG_SCALES, cwt_batch
+
+# Same tolerance the engine was accepted with (max error / max |CWT|)
+TOLERANCE = 1e-4
+FS = 2000
+
+
+@pytest.mark.parametrize("wavelet, scales", [(ECG_WAVELET, ECG_SCALES), (PCG_WAVELET, PCG_SCALES)], ids=["ecg", "pcg"])
+def test_cwt_batch_matches_pywt(wavelet, scales):
+    signals = np.random.default_rng(0).standard_normal((3, FS))
+
+    reference = np.stack([
+        np.abs(pywt.cwt(s, scales, wavelet, sampling_period=1.0 / FS)[0]) for s in signals
+    ])
+    result = cwt_batch(signals, scales, wavelet)
+
+    assert result.shape == reference.shape
+    assert np.max(np.abs(result - reference)) / np.max(reference) < TOLERANCE
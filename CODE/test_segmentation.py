@@ -0,0 +1,47 @@
+import numpy as np
+import neurokit2 as nk
+import pytest
+
+from segmentation import append_segments, detect_rpeaks, segment_windows
+from signal_store import SignalStore, SignalStoreWriter
+
+FS = 2000
+DURATION = 20
+
+
+def record(seed=0):
+    ecg = nk.ecg_simulate(duration=DURATION, sampling_rate=FS, heart_rate=70, random_state=seed)
+    pcg = np.random.default_rng(seed).standard_normal(len(ecg))
+    return ecg, pcg
+
+
+@pytest.mark.parametrize("damage, reason", [(np.nan, "pcg_nan"), (0.0, "pcg_flat")], ids=["nan", "flatline"])
+def test_rejected_window_never_reaches_the_store(tmp_path, damage, reason):
+    ecg, pcg = record()
+    windows = segment_windows(detect_rpeaks(ecg, FS), len(ecg), FS)
+    assert len(windows) >= 3
+
+    # Damage the PCG of the second window only
+    start, end, _ = windows[1]
+    pcg[start:end] = damage
+
+    with SignalStoreWriter(str(tmp_path / "records")) as writer:
+        writer.add("r000", ecg, pcg, FS, label=1)
+    records = SignalStore(str(tmp_path / "records"))
+
+    index, _, rejected, n_new = append_segments(
+        records, str(tmp_path / "segments"), rpeak_cache=str(tmp_path / "rpeaks"),
+    )
+    store = SignalStore(str(tmp_path / "segments"))
+
+    assert rejected["segment_id"].tolist() == ["r000_seg001"]
+    assert reason in rejected["reason"].iloc[0].split(";")
+    assert "r000_seg001" not in store
+    assert store.ids == index["segment_id"].tolist()
+    assert n_new == len(windows) - 1
+    assert not any(np.isnan(store.pcg(k)).any() for k in store.ids)
+
+    # A later run neither re-screens the record nor writes the window
+    _, _, _, n_new = append_segments(records, str(tmp_path / "segments"), rpeak_cache=str(tmp_path / "rpeaks"))
+    assert n_new == 0
+    assert "r000_seg001" not in SignalStore(str(tmp_path / "segments"))
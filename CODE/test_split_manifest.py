@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from split_manifest import assign, fold_of, kfold, split_of, update_manifest
+
+N_FOLDS = 5
+
+
+def labels(record_ids):
+    return pd.DataFrame({"record": record_ids, "label": [1 if i % 2 else -1 for i in range(len(record_ids))]})
+
+
+def folds(manifest):
+    return {k: val for k, _, val in kfold(manifest)}
+
+
+def test_assignment_depends_only_on_the_record_id():
+    record_ids = [f"a{i:04d}" for i in range(2000)]
+    splits = [split_of(r, 0.3) for r in record_ids]
+
+    assert splits == [split_of(r, 0.3) for r in reversed(record_ids)][::-1]
+    assert abs(splits.count("test") / len(splits) - 0.3) < 0.03
+    assert {fold_of(r, N_FOLDS) for r in record_ids} == set(range(N_FOLDS))
+    assert [split_of(r, 0.3, salt="other") for r in record_ids] != splits
+
+
+def test_update_keeps_existing_rows_and_hashes_new_ones(tmp_path):
+    old_ids = [f"a{i:04d}" for i in range(40)]
+    manifest = assign(labels(old_ids), str(tmp_path), 0.3, N_FOLDS)
+    # A pinned row the hash would put elsewhere
+    manifest.loc[0, ["split", "fold"]] = ["test" if manifest.loc[0, "split"] == "train" else "train", 0]
+
+    new_ids = [f"b{i:04d}" for i in range(20)]
+    # Even with another salt, rows already in the manifest stay where they are
+    updated, added = update_manifest(manifest, labels(old_ids + new_ids), str(tmp_path), 0.3, N_FOLDS, salt="other")
+
+    assert added == new_ids
+    assert updated["record"].is_monotonic_increasing
+    kept = updated.set_index("record").loc[old_ids, ["split", "fold"]]
+    assert kept.equals(manifest.set_index("record")[["split", "fold"]])
+    fresh = updated.set_index("record").loc[new_ids]
+    assert list(fresh["split"]) == [split_of(r, 0.3, "other") for r in new_ids]
+    assert (fresh.loc[fresh["split"] == "test", "fold"] == -1).all()
+
+
+def test_kfold_partitions_train_records_and_is_stable(tmp_path):
+    old_ids = [f"a{i:04d}" for i in range(60)]
+    manifest = assign(labels(old_ids), str(tmp_path), 0.3, N_FOLDS)
+    train_ids = set(manifest.loc[manifest["split"] == "train", "record"])
+
+    splits = list(kfold(manifest))
+    assert len(splits) == N_FOLDS
+    for _, train, val in splits:
+        assert not set(train) & set(val) and set(train) | set(val) == train_ids
+    assert sorted(np.concatenate([val for _, _, val in splits])) == sorted(train_ids)
+
+    # New records join folds without moving the old ones
+    updated, _ = update_manifest(manifest, labels(old_ids + [f"b{i:04d}" for i in range(30)]), str(tmp_path), 0.3, N_FOLDS)
+    before, after = folds(manifest), folds(updated)
+    assert all([r for r in after[k] if r in train_ids] == before[k] for k in range(N_FOLDS))
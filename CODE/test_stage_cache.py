@@ -0,0 +1,106 @@
+import os
+
+from stage_cache import Stage, StageCache, plan, run_stages, status
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_keys_follow_params_sources_and_upstream(tmp_path):
+    source = str(tmp_path / "source.csv")
+    write(source, "a,b\n1,2\n")
+
+    def stages(a_param, b_param):
+        return [Stage("a", None, params={"x": a_param}, sources=[source]), Stage("b", None, ["a"], {"y": b_param})]
+
+    keys = plan(stages(1, 1))
+    assert plan(stages(1, 1)) == keys
+
+    # A parameter re-keys its stage and everything downstream, nothing upstream
+    changed = plan(stages(1, 2))
+    assert changed["a"] == keys["a"] and changed["b"] != keys["b"]
+    changed = plan(stages(2, 1))
+    assert changed["a"] != keys["a"] and changed["b"] != keys["b"]
+
+    # So does the content of a source
+    write(source, "a,b\n1,3\n")
+    changed = plan(stages(1, 1))
+    assert changed["a"] != keys["a"] and changed["b"] != keys["b"]
+
+
+def test_changed_source_reruns_only_what_depends_on_it(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    source = str(tmp_path / "source.txt")
+    write(source, "v1")
+    calls = []
+
+    def step(name):
+        def fn(ctx):
+            calls.append(name)
+            write(os.path.join(ctx.out_dir, "out.txt"), name)
+        return fn
+
+    stages = [
+        Stage("other", step("other")),
+        Stage("a", step("a"), sources=[source]),
+        Stage("b", step("b"), ["a", "other"]),
+    ]
+
+    assert [row["status"] for row in run_stages(stages, cache)] == ["ran", "ran", "ran"]
+    assert [row["status"] for row in run_stages(stages, cache)] == ["cached", "cached", "cached"]
+
+    write(source, "v2")
+    assert not any(row["done"] for row in status(stages, cache) if row["stage"] != "other")
+    report = run_stages(stages, cache)
+    assert [row["status"] for row in report] == ["cached", "ran", "ran"]
+    assert calls == ["other", "a", "b", "a", "b"]
+
+    # The previous outputs stay in the cache under their old keys
+    assert len(os.listdir(os.path.join(cache.root, "a"))) == 2
+
+
+def test_incremental_stage_extends_its_workspace(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+
+    def collect(ctx):
+        # Copies the files it has not seen yet; starts over if one it copied was removed
+        have = set(os.listdir(ctx.out_dir)) - {"workspace.json", "stage.json"}
+        if have - set(os.listdir(inbox)):
+            ctx.reset()
+            have = set()
+        for name in sorted(set(os.listdir(inbox)) - have):
+            write(os.path.join(ctx.out_dir, name), (inbox / name).read_text())
+
+    def count(ctx):
+        files = [f for f in os.listdir(ctx.inputs["collect"]) if f.endswith(".txt")]
+        write(os.path.join(ctx.out_dir, "count.txt"), str(len(files)))
+
+    stages = [
+        Stage("collect", collect, sources=[(str(inbox), (".txt",))], incremental=True),
+        Stage("count", count, ["collect"], incremental=True),
+    ]
+
+    write(str(inbox / "r1.txt"), "1")
+    first = {row["stage"]: row for row in run_stages(stages, cache)}
+    marker = os.path.join(first["collect"]["out_dir"], "r1.txt")
+    written_at = os.stat(marker).st_mtime_ns
+
+    # New data: new keys, same workspaces, earlier outputs untouched
+    write(str(inbox / "r2.txt"), "2")
+    second = {row["stage"]: row for row in run_stages(stages, cache)}
+    assert [row["status"] for row in second.values()] == ["updated", "updated"]
+    assert all(second[s]["out_dir"] == first[s]["out_dir"] and second[s]["key"] != first[s]["key"] for s in second)
+    assert os.stat(marker).st_mtime_ns == written_at
+    with open(os.path.join(second["count"]["out_dir"], "count.txt"), encoding="utf-8") as f:
+        assert f.read() == "2"
+
+    # A removal resets collect, and count follows into a fresh workspace
+    os.remove(inbox / "r1.txt")
+    third = {row["stage"]: row for row in run_stages(stages, cache)}
+    assert third["collect"]["status"] == "updated" and third["count"]["status"] == "ran"
+    assert third["count"]["out_dir"] != first["count"]["out_dir"]
+    assert sorted(f for f in os.listdir(third["collect"]["out_dir"]) if f.endswith(".txt")) == ["r2.txt"]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from streaming import RingBuffer
+
+CAPACITY = 100
+
+
+def stream(sizes, n_channels=2):
+    """Chunks of the given sizes over a (n_channels, total) ramp."""
+    data = np.arange(n_channels * sum(sizes), dtype=np.float32).reshape(n_channels, -1)
+    bounds = np.cumsum([0] + list(sizes))
+    return data, [data[:, a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+@pytest.mark.parametrize("sizes", [[30] * 10, [7, 93, 1, 64, 35], [250], [10, 250, 3]], ids=["even", "wrap", "large", "mixed"])
+def test_buffer_holds_the_newest_samples(sizes):
+    data, chunks = stream(sizes)
+    buffer = RingBuffer(CAPACITY, n_channels=2)
+
+    for chunk in chunks:
+        buffer.append(chunk)
+        assert np.array_equal(buffer.get(buffer.start, buffer.end), data[:, buffer.start:buffer.end])
+
+    assert buffer.end == data.shape[1] and buffer.start == data.shape[1] - CAPACITY
+    assert np.array_equal(buffer.get(buffer.end - 10, buffer.end), data[:, -10:])
+
+
+def test_indices_before_zero_read_as_zeros():
+    data, chunks = stream([20], n_channels=1)
+    buffer = RingBuffer(CAPACITY)
+    buffer.append(chunks[0][0])
+
+    out = buffer.get(-5, 10)
+    assert np.array_equal(out[0, :5], np.zeros(5)) and np.array_equal(out[0, 5:], data[0, :10])
+
+
+def test_samples_outside_the_buffer_raise():
+    _, chunks = stream([150], n_channels=1)
+    buffer = RingBuffer(CAPACITY)
+    buffer.append(chunks[0])
+
+    with pytest.raises(IndexError):
+        buffer.get(40, 60)
+    with pytest.raises(IndexError):
+        buffer.get(140, 151)
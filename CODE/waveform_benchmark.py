@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+import shutil
+
+import numpy as np
+import pandas as pd
+import torch
+
+import metrics
+from ablation import AblationRunner
+from augmentation import AUG_TYPES, augmented_loader
+from evaluation import record_of
+from inference import benchmark_cpu
+from scalogram_dataset import CachedScalogramDataset, ScalogramTransform, batch_loader
+from scalogram_store import build_scalogram_store
+from signal_store import SignalStore, DATASET_DIR
+from split_manifest import fold_of
+from waveform_dataset import SegmentWaveformDataset, WaveformTransform
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+WORK_DIR = os.path.join(DATASET_DIR, "BENCHMARK", "raw_vs_scalogram")
+
+CONFIG = {
+    "epochs": 50,
+    "patience": 5,
+    "lr": 1e-4,
+    "batch_size": 16,
+    "val_fold": 0,          # train records in this split_manifest fold validate
+    "cwt": "full",          # scalogram side, see scalogram.scalogram_cwt
+    "seed": 42,
+}
+
+# approach -> model variant (models.VARIANTS)
+APPROACHES = {
+    "scalogram_2d": "fusion",
+    "waveform_1d": "fusion_1d",
+}
+
+
+# ============================================================
+# HEAD-TO-HEAD
+# ============================================================
+# Both approaches train the same fusion head on the same segments with
+# the same split, optimiser, on-the-fly augmentation and early stopping
+# (AblationRunner); only the input differs. The clock starts at the
+# segment stores, so the scalogram side pays for CWT + image rendering
+# (every training batch, plus the val/test stores), the waveform side
+# for nothing but reading the memory map.
+
+
+def write_split_csvs(train_store, test_store, out_dir, val_fold=CONFIG["val_fold"]):
+    """
+    train / val / test label CSVs (id, label). Validation: the original
+    (non-augmented) segments of the train records in val_fold; train
+    excludes every item of those records, as in the notebook, and keeps
+    only original segments (augmented_loader draws the variants).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    train_index = SignalStore(train_store).index
+    is_val = np.array([fold_of(record_of(i)) == val_fold for i in train_index["id"]])
+    is_orig = ~train_index["id"].str.endswith(tuple("_" + a for a in AUG_TYPES[1:])).to_numpy()
+
+    paths = {}
+    for name, rows in [
+        ("train", train_index[~is_val & is_orig]),
+        ("val", train_index[is_val & is_orig]),
+        ("test", SignalStore(test_store).index),
+    ]:
+        paths[name] = os.path.join(out_dir, f"{name}_labels.csv")
+        rows[["id", "label"]].to_csv(paths[name], index=False)
+    return paths
+
+
+def train_ids(csvs):
+    return pd.read_csv(csvs["train"], dtype={"id": str})["id"].tolist()
+
+
+def scalogram_datasets(train_store, test_store, csvs, work_dir, cwt=CONFIG["cwt"], batch_size=CONFIG["batch_size"]):
+    """Augmented train loader (CWT per batch) + val / test on scalogram stores."""
+    # From scratch every time: a resumed store would hide the CWT cost
+    shutil.rmtree(os.path.join(work_dir, "STORE"), ignore_errors=True)
+    val_ids = pd.read_csv(csvs["val"], dtype={"id": str})["id"].tolist()
+    for split, store, ids in [("train", train_store, val_ids), ("test", test_store, None)]:
+        build_scalogram_store(SignalStore(store), os.path.join(work_dir, "STORE", split), ids=ids, cwt=cwt)
+    return {
+        "train": augmented_loader(SignalStore(train_store), train_ids(csvs), ScalogramTransform(cwt=cwt), batch_size),
+        **{
+            name: CachedScalogramDataset(store=os.path.join(work_dir, "STORE", split), label_csv=csvs[name])
+            for name, split in [("val", "train"), ("test", "test")]
+        },
+    }
+
+
+def waveform_datasets(train_store, test_store, csvs, batch_size=CONFIG["batch_size"]):
+    return {
+        "train": augmented_loader(SignalStore(train_store), train_ids(csvs), WaveformTransform(), batch_size),
+        **{
+            name: SegmentWaveformDataset(store, label_csv=csvs[name])
+            for name, store in [("val", train_store), ("test", test_store)]
+        },
+    }
+
+
+def run_approach(approach, train_store, test_store, csvs, work_dir, config=CONFIG):
+    """Preprocess, train, test and time one approach; returns its report row."""
+    variant = APPROACHES[approach]
+    torch.manual_seed(config["seed"])
+
+    t0 = time.perf_counter()
+    if approach == "scalogram_2d":
+        datasets = scalogram_datasets(
+            train_store, test_store, csvs, os.path.join(work_dir, approach), config["cwt"], config["batch_size"],
+        )
+    else:
+        datasets = waveform_datasets(train_store, test_store, csvs, config["batch_size"])
+    preprocess_s = time.perf_counter() - t0
+
+    labels = datasets["train"].dataset.labels
+    pos_weight = float((labels == 0).sum() / max(int((labels == 1).sum()), 1))
+    runner = AblationRunner(
+        variants=[variant], device="cpu", pos_weight=pos_weight, lr=config["lr"],
+        model_dir=os.path.join(work_dir, approach),
+    )
+
+    t0 = time.perf_counter()
+    runner.fit(
+        datasets["train"],
+        batch_loader(datasets["val"], batch_size=config["batch_size"]),
+        epochs=config["epochs"], patience=config["patience"], resume=False,
+    )
+    train_s = time.perf_counter() - t0
+
+    runner.load_best()
+    test = runner.test(batch_loader(datasets["test"], batch_size=config["batch_size"]))[variant]
+
+    model = runner.models[variant].float().eval().to(memory_format=torch.contiguous_format)
+    with torch.inference_mode():
+        latency = benchmark_cpu(model, variant)
+
+    return {
+        "approach": approach,
+        "variant": variant,
+        "preprocess_s": preprocess_s,
+        "train_s": train_s,
+        "total_s": preprocess_s + train_s,
+        "epochs_run": len(runner.history[variant]),
+        "val_auc": runner.best_auc[variant],
+        "test_auc": test["AUC"],
+        "test_f1": test["F1"],
+        "test_accuracy": test["Accuracy"],
+        "parameters": sum(p.numel() for p in model.parameters()),
+        **latency,
+    }
+
+
+def print_report(rows):
+    print(
+        f"{'approach':14s} {'prep s':>8s} {'train s':>9s} {'total s':>9s} {'epochs':>7s} "
+        f"{'test AUC':>9s} {'ms/pair':>8s} {'pairs/s':>8s} {'params':>9s}"
+    )
+    for r in rows:
+        print(
+            f"{r['approach']:14s} {r['preprocess_s']:8.1f} {r['train_s']:9.1f} {r['total_s']:9.1f} "
+            f"{r['epochs_run']:7d} {r['test_auc']:9.4f} {r['ms_per_pair']:8.2f} {r['pairs_per_s']:8.1f} "
+            f"{r['parameters']:9d}"
+        )
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python waveform_benchmark.py <train_signal_store> <test_signal_store> [work_dir] [epochs]")
+        print("       e.g. SIGNAL_STORE/train_segments SIGNAL_STORE/test_segments")
+        sys.exit(1)
+
+    train_store, test_store = sys.argv[1:3]
+    work_dir = sys.argv[3] if len(sys.argv) > 3 else WORK_DIR
+    config = dict(CONFIG)
+    if len(sys.argv) > 4:
+        config["epochs"] = int(sys.argv[4])
+
+    csvs = write_split_csvs(train_store, test_store, work_dir, config["val_fold"])
+
+    rows = []
+    for approach in APPROACHES:
+        print(f"\n[{approach}]")
+        rows.append(run_approach(approach, train_store, test_store, csvs, work_dir, config))
+        metrics.emit("benchmark", "raw_vs_scalogram", **rows[-1], cwt=config["cwt"])
+
+    print("\n✅ Raw waveform vs scalogram (CPU)")
+    print_report(rows)
+    speedup = rows[0]["total_s"] / max(rows[1]["total_s"], 1e-9)
+    print(
+        f"\nWaveform model: {speedup:.1f}× less preprocessing + training time, "
+        f"test AUC {rows[1]['test_auc'] - rows[0]['test_auc']:+.4f} vs scalograms"
+    )
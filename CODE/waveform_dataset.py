@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset
+
+from signal_store import SignalStore
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+# Per-segment z-score, the waveform analogue of the per-image min-max
+# scaling of the scalograms: amplitude differences between recordings
+# (gain, stethoscope placement) don't reach the model
+NORMALISE = True
+EPS = 1e-6
+
+
+def zscore(x, eps=EPS):
+    """(…, samples) -> zero mean, unit std along the last axis."""
+    x = x - x.mean(axis=-1, keepdims=True)
+    return x / (x.std(axis=-1, keepdims=True) + eps)
+
+
+class SegmentWaveformDataset(Dataset):
+    """
+    ECG/PCG segments of a signal store (segment or augmented store, see
+    signal_store.py) as (1, samples) float32 tensors, labels mapped
+    {-1,+1} → {0,1}. Input of the 1D models (models.DualBranchECGPCG1D).
+
+    Same interface as CachedScalogramDataset: label_csv selects a subset
+    (without it every item of the store, with the labels in its index),
+    modalities limits what is read, and a list of indices returns the
+    whole batch at once (use scalogram_dataset.batch_loader). Samples
+    are read straight from the memory map; nothing is precomputed.
+    """
+
+    modalities = ("ecg", "pcg")
+
+    def __init__(self, store, label_csv=None, normalise=NORMALISE):
+        self.store_path = store
+        self.normalise = normalise
+        self._store = None
+
+        if label_csv is not None:
+            df = pd.read_csv(label_csv)
+        else:
+            df = self.store.index[["id", "label"]]
+        file_col = [c for c in df.columns if c != "label"][0]
+
+        self.names = df[file_col].astype(str).tolist()
+        self.labels = torch.from_numpy((df["label"].to_numpy(dtype=np.float32) + 1) / 2)
+
+        lengths = {len(self.store.ecg(name)) for name in self.names}
+        if len(lengths) > 1:
+            raise ValueError(f"Segments of different lengths in {store}: {sorted(lengths)}")
+        self.n_samples = lengths.pop() if lengths else 0
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def store(self):
+        # Opened on first use, so each DataLoader worker maps the files itself
+        if self._store is None:
+            self._store = SignalStore(self.store_path)
+        return self._store
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_store"] = None
+        return state
+
+    def _signals(self, modality, idx):
+        read = getattr(self.store, modality)
+        if np.ndim(idx) == 0:
+            x = np.array(read(self.names[idx]))[None]
+        else:
+            x = np.stack([read(self.names[i]) for i in idx])[:, None]
+        if self.normalise:
+            x = zscore(x)
+        return torch.from_numpy(x.astype(np.float32, copy=False))
+
+    def __getitem__(self, idx):
+        ecg = self._signals("ecg", idx) if "ecg" in self.modalities else torch.empty(0)
+        pcg = self._signals("pcg", idx) if "pcg" in self.modalities else torch.empty(0)
+        return ecg, pcg, self.labels[idx]
+
+
+class WaveformTransform:
+    """
+    AugmentCollate transform: an augmented (batch, samples) ECG/PCG pair
+    -> (batch, 1, samples) float32, scaled as SegmentWaveformDataset does.
+    """
+
+    def __init__(self, normalise=NORMALISE):
+        self.normalise = normalise
+
+    def __call__(self, ecg, pcg):
+        ecg, pcg = ecg[:, None], pcg[:, None]
+        if self.normalise:
+            ecg, pcg = zscore(ecg), zscore(pcg)
+        return ecg.astype(np.float32, copy=False), pcg.astype(np.float32, copy=False)